@@ -1,4 +1,4 @@
-from typing import Type
+from typing import List, Type, Union
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
 from neuralhydrology.datasetzoo.camelsaus import CamelsAUS
@@ -19,7 +19,7 @@ from neuralhydrology.datasetzoo.datasetregistry import DatasetRegistry
 def get_dataset(cfg: Config,
                 is_train: bool,
                 period: str,
-                basin: str = None,
+                basin: Union[str, List[str]] = None,
                 additional_features: list = [],
                 id_to_int: dict = {},
                 scaler: dict = {}) -> BaseDataset:
@@ -42,9 +42,9 @@ def get_dataset(cfg: Config,
         if one-hot encoding is used.
     period : {'train', 'validation', 'test'}
         Defines the period for which the data will be loaded
-    basin : str, optional
-        If passed, the data for only this basin will be loaded. Otherwise the basin(s) is(are) read from the appropriate
-        basin file, corresponding to the `period`.
+    basin : Union[str, List[str]], optional
+        If passed, the data for only this basin (or list of basins) will be loaded. Otherwise the basin(s) is(are) read
+        from the appropriate basin file, corresponding to the `period`.
     additional_features : List[Dict[str, pd.DataFrame]], optional
         List of dictionaries, mapping from a basin id to a pandas DataFrame. This DataFrame will be added to the data
         loaded from the dataset and all columns are available as 'dynamic_inputs', 'evolving_attributes' and
@@ -4,7 +4,8 @@ import re
 import sys
 import warnings
 from collections import defaultdict
-from typing import Dict, List, Union
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -12,18 +13,25 @@ import torch
 import xarray
 from numba import NumbaPendingDeprecationWarning, njit, prange
 from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
 from ruamel.yaml import YAML
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, Sampler
 from tqdm import tqdm
 
-from neuralhydrology.datautils import utils
+from neuralhydrology.datautils import datasetcache, pet, utils
+from neuralhydrology.datautils.basinstore import BasinStore
+from neuralhydrology.datautils.streamingstats import P2Quantile, RunningMoments
 from neuralhydrology.modelzoo.cfe_modules import dcfe_utils
 from neuralhydrology.utils import samplingutils
 from neuralhydrology.utils.config import Config
 from neuralhydrology.utils.errors import NoEvaluationDataError, NoTrainDataError
+from neuralhydrology.utils.lrucache import LRUCache, get_nbytes
 
 LOGGER = logging.getLogger(__name__)
 
+# data types in which the inputs of a data set can be held in memory (config argument `storage_dtype`)
+STORAGE_DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+
 
 class BaseDataset(Dataset):
     """Base data set class to load and preprocess data.
@@ -42,9 +50,9 @@ class BaseDataset(Dataset):
         if one-hot encoding is used.
     period : {'train', 'validation', 'test'}
         Defines the period for which the data will be loaded
-    basin : str, optional
-        If passed, the data for only this basin will be loaded. Otherwise, the basin(s) is(are) read from the
-        appropriate basin file, corresponding to the `period`.
+    basin : Union[str, List[str]], optional
+        If passed, the data for only this basin (or list of basins) will be loaded. Otherwise, the basin(s) is(are) read
+        from the appropriate basin file, corresponding to the `period`.
     additional_features : List[Dict[str, pd.DataFrame]], optional
         List of dictionaries, mapping from a basin id to a pandas DataFrame. This DataFrame will be added to the data
         loaded from the dataset and all columns are available as 'dynamic_inputs', 'evolving_attributes' and
@@ -62,7 +70,7 @@ class BaseDataset(Dataset):
         cfg: Config,
         is_train: bool,
         period: str,
-        basin: str = None,
+        basin: Union[str, List[str]] = None,
         additional_features: List[Dict[str, pd.DataFrame]] = [],
         id_to_int: Dict[str, int] = {},
         scaler: Dict[str, Union[pd.Series, xarray.DataArray]] = {},
@@ -99,6 +107,8 @@ class BaseDataset(Dataset):
 
         if basin is None:
             self.basins = utils.load_basin_file(getattr(cfg, f"{period}_basin_file"))
+        elif isinstance(basin, list):
+            self.basins = basin
         else:
             self.basins = [basin]
         self.additional_features = additional_features
@@ -110,6 +120,12 @@ class BaseDataset(Dataset):
         else:
             self._compute_scaler = False
 
+        if cfg.storage_dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage_dtype {cfg.storage_dtype}. Use one of {list(STORAGE_DTYPES.keys())}.")
+        self._storage_dtype = STORAGE_DTYPES[cfg.storage_dtype]
+        # largest absolute difference between the normalized inputs and their values in the storage data type
+        self.max_quantization_error = 0.0
+
         # check and extract frequency information from config
         self.frequencies = []
         self.seq_len = None
@@ -119,13 +135,37 @@ class BaseDataset(Dataset):
         # during training we log data processing with progress bars, but not during validation/testing
         self._disable_pbar = cfg.verbose == 0 or not self.is_train
 
-        # initialize class attributes that are filled in the data loading functions
+        # initialize class attributes that are filled in the data loading functions. After loading, all time series
+        # are stored as one array per frequency, in which the basins are stacked along the time dimension. Together
+        # with the array-based lookup table, this avoids (millions of) small Python objects that would be copied into
+        # each data loader worker process upon access.
         self._x_d = {}
+        self._x_d_columns = {}
         self._x_s = {}
         self._attributes = {}
         self._y = {}
         self._per_basin_target_stds = {}
         self._dates = {}
+        self._basin_offsets = {}
+        self._sample_basins = np.array([], dtype=str)
+        self._lookup_basins = np.array([], dtype=np.int64)
+        self._lookup_indices = np.zeros((0, 0), dtype=np.int64)
+        self._basin_int_ids = None
+        # time steps that were added with `append_data`, one dict of arrays per frequency and segment. Samples with a
+        # segment number > 0 in `_lookup_segments` index into `_segments[segment - 1]` instead of the stacked arrays.
+        self._segments = []
+        self._lookup_segments = None
+        # folder of the data set in the prepared-data-set cache, to which appended segments are written
+        self._cache_dir = None
+        # only used if the data is loaded lazily
+        self._basin_store = None
+        self._basin_cache = None
+        self._basin_nbytes = None
+        # data pointers of the arrays that are memory-mapped from the prepared-data-set cache (see `_attach_cache`)
+        self._mapped_data_ptrs = set()
+        self._feature_normalization = {}
+        # latitude and elevation of the basins, only loaded if a PET input is derived (see `_add_derived_pet`)
+        self._pet_attributes = None
         self.start_and_end_dates = {}
         self.num_samples = 0
         self.period_starts = {}  # needed for restoring date index during evaluation
@@ -152,10 +192,69 @@ class BaseDataset(Dataset):
         return self.num_samples
 
     def __getitem__(self, item: int) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
-        basin, indices = self.lookup_table[item]
+        return self._get_sample(item, self.seq_len)
+
+    def get_sequence(self, item: int, seq_length: int) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
+        """Return a sample whose input sequence is longer than the configured `seq_length`.
+
+        The sequence ends at the last time step of sample `item`. Only supported for data sets with a single frequency.
+
+        Parameters
+        ----------
+        item : int
+            Index of the sample that defines the end of the sequence.
+        seq_length : int
+            Length of the input sequence.
+
+        Returns
+        -------
+        dict[str, torch.Tensor | dict[str, torch.Tensor]]
+            The sample, in the same format as returned by indexing the data set.
+        """
+        if len(self.frequencies) > 1:
+            raise ValueError("Sequences of arbitrary length are only supported for a single frequency.")
+        return self._get_sample(item, [seq_length])
+
+    def get_contiguous_samples(self, indices: np.ndarray) -> List[np.ndarray]:
+        """Split samples into runs of samples of the same basin that end on directly consecutive time steps.
+
+        Within a run, the input sequences of the samples overlap without gaps, such that the inputs of the whole run can
+        be passed to a model as one sequence (see `get_sequence`). Only supported for data sets with a single frequency.
+
+        Parameters
+        ----------
+        indices : np.ndarray
+            Sample indices, ordered by basin and time.
+
+        Returns
+        -------
+        List[np.ndarray]
+            The sample indices, split into contiguous runs.
+        """
+        if len(self.frequencies) > 1:
+            raise ValueError("Contiguous samples are only supported for a single frequency.")
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return []
+        basins = self._lookup_basins[indices]
+        positions = self._lookup_indices[indices, 0]
+        breaks = (np.diff(basins) != 0) | (np.diff(positions) != 1)
+        if self._lookup_segments is not None:
+            # appended segments only repeat the history that the input sequences of their first samples need
+            breaks |= np.diff(self._lookup_segments[indices]) != 0
+        breaks = np.flatnonzero(breaks) + 1
+        return np.split(indices, breaks)
+
+    def _get_sample(self, item: int, seq_lens: List[int]) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
+        """Return sample `item` with input sequences of the given lengths (one per frequency)."""
+        basin_idx = int(self._lookup_basins[item])
+        segment = 0 if self._lookup_segments is None else int(self._lookup_segments[item])
 
         sample = {}
-        for freq, seq_len, idx in zip(self.frequencies, self.seq_len, indices):
+        for i, (freq, seq_len) in enumerate(zip(self.frequencies, seq_lens)):
+            # all indices below are relative to the first time step of the basin in the (stacked) arrays
+            idx = int(self._lookup_indices[item, i])
+            x_d, x_s, y, dates, offset, basin_end = self._get_basin_arrays(basin_idx, freq, segment)
             # if there's just one frequency, don't use suffixes.
             freq_suffix = "" if len(self.frequencies) == 1 else f"_{freq}"
             # slice until idx + 1 because slice-end is excluding
@@ -169,42 +268,36 @@ class BaseDataset(Dataset):
             else:
                 hindcast_end_idx = None
                 forecast_start_idx = None
+            # translate the basin-relative indices into positions in the stacked arrays
+            hindcast_start_idx += offset
+            global_end_idx += offset
+            hindcast_end_idx = basin_end if hindcast_end_idx is None else hindcast_end_idx + offset
+            forecast_start_idx = offset if forecast_start_idx is None else forecast_start_idx + offset
             x_d_key = f"x_d{freq_suffix}"
             sample[x_d_key] = {}
             sample[f"{x_d_key}_hindcast"] = {}
             sample[f"{x_d_key}_forecast"] = {}
-            for k, v in self._x_d[basin][freq].items():
+            for j, k in enumerate(self._x_d_columns[freq]):
                 if k in self.cfg.hindcast_inputs_flattened:
-                    sample[f"{x_d_key}_hindcast"][k] = v[hindcast_start_idx:hindcast_end_idx]
+                    sample[f"{x_d_key}_hindcast"][k] = x_d[hindcast_start_idx:hindcast_end_idx, j:j + 1]
                 if k in self.cfg.forecast_inputs_flattened:
-                    sample[f"{x_d_key}_forecast"][k] = v[forecast_start_idx:global_end_idx]
+                    sample[f"{x_d_key}_forecast"][k] = x_d[forecast_start_idx:global_end_idx, j:j + 1]
                 if not self.cfg.hindcast_inputs_flattened:
-                    sample[x_d_key][k] = v[hindcast_start_idx:global_end_idx]
-
-            if self.is_train and (self.cfg.nan_step_probability or self.cfg.nan_sequence_probability):
-                if self.cfg.hindcast_inputs_flattened:
-                    sample[f"{x_d_key}_hindcast"] = self._add_nan_streaks(
-                        sample[f"{x_d_key}_hindcast"], groups=self.cfg.hindcast_inputs
-                    )
-                    sample[f"{x_d_key}_forecast"] = self._add_nan_streaks(
-                        sample[f"{x_d_key}_forecast"], groups=self.cfg.forecast_inputs
-                    )
-                else:
-                    sample[x_d_key] = self._add_nan_streaks(sample[x_d_key], groups=self.cfg.dynamic_inputs)
-            sample[f"y{freq_suffix}"] = self._y[basin][freq][hindcast_start_idx:global_end_idx]
-            sample[f"date{freq_suffix}"] = self._dates[basin][freq][hindcast_start_idx:global_end_idx]
+                    sample[x_d_key][k] = x_d[hindcast_start_idx:global_end_idx, j:j + 1]
+            sample[f"y{freq_suffix}"] = y[hindcast_start_idx:global_end_idx]
+            sample[f"date{freq_suffix}"] = dates[hindcast_start_idx:global_end_idx]
 
             # grabbing "static_conceptual_params" item in the dictionary
             # Since RHS is a panda df, need to use .loc
             if self.cfg.model == "hybrid_model":
-                sample["static_conceptual_params"] = self.static_conceptual_params.loc[basin]
+                sample["static_conceptual_params"] = self.static_conceptual_params.loc[str(self._sample_basins[basin_idx])]
 
             # check for static inputs
             static_inputs = []
-            if self._attributes:
-                static_inputs.append(self._attributes[basin])
-            if self._x_s:
-                static_inputs.append(self._x_s[basin][freq][idx])
+            if self._attributes is not None:
+                static_inputs.append(self._attributes[basin_idx])
+            if x_s is not None:
+                static_inputs.append(x_s[offset + idx])
             if static_inputs:
                 sample[f"x_s{freq_suffix}"] = torch.cat(static_inputs, dim=-1)
 
@@ -212,37 +305,268 @@ class BaseDataset(Dataset):
                 sample[f"x_d{freq_suffix}"]["hindcast_counter"] = self.hindcast_counter
                 sample[f"x_d{freq_suffix}"]["forecast_counter"] = self.forecast_counter
 
-        if self._per_basin_target_stds:
-            sample["per_basin_target_stds"] = self._per_basin_target_stds[basin]
-        if self.id_to_int:
-            sample["x_one_hot"] = torch.nn.functional.one_hot(
-                torch.tensor(self.id_to_int[basin]), num_classes=len(self.id_to_int)
-            ).to(torch.float32)
+        if self._per_basin_target_stds is not None:
+            sample["per_basin_target_stds"] = self._per_basin_target_stds[basin_idx]
+        if self._basin_int_ids is not None:
+            # the models one-hot encode the basin id on the device, or look up the weights of the basin directly
+            sample["x_basin_id"] = self._basin_int_ids[basin_idx]
 
         return sample
 
-    def _add_nan_streaks(self, x_d: dict[str, torch.Tensor], groups: list[list[str]]) -> dict[str, torch.Tensor]:
-        """Samples NaN streaks for each feature group."""
-        if not groups or not isinstance(groups[0], list):
-            raise ValueError("For dropout streaks, dynamic_inputs must be a list of lists.")
-        seq_length = x_d[groups[0][0]].shape[0]
-        drop_masks = np.zeros((len(groups), seq_length, 1), dtype=bool)
-        drop_sequences = np.random.choice(
-            [True, False], p=[self.cfg.nan_sequence_probability, 1 - self.cfg.nan_sequence_probability], size=len(groups)
-        )
-        if drop_sequences.all():
-            # Don't allow all sequences to be dropped out.
-            drop_sequences[np.random.choice(len(groups))] = False
-        for i in range(len(groups)):
-            drop_steps = np.random.choice(
-                [True, False], p=[self.cfg.nan_step_probability, 1 - self.cfg.nan_step_probability], size=(seq_length, 1)
-            )
-            drop_masks[i] = drop_sequences[i] | drop_steps
-        drop_masks = torch.from_numpy(drop_masks)
-        for i, group in enumerate(groups):
-            for feature in group:
-                x_d[feature] = torch.where(drop_masks[i], torch.nan, x_d[feature])
-        return x_d
+    def _get_basin_arrays(
+        self,
+        basin_idx: int,
+        freq: str,
+        segment: int = 0
+    ) -> Tuple[torch.Tensor, Union[torch.Tensor, None], torch.Tensor, np.ndarray, int, int]:
+        """Return the arrays (x_d, x_s, y, dates) that contain the data of one basin, and start and end of the basin.
+
+        With `segment` > 0, the arrays of the corresponding segment of appended time steps are returned.
+        """
+        if segment > 0:
+            segment_data = self._segments[segment - 1][freq]
+            offsets = segment_data["offsets"]
+            return (segment_data["x_d"], segment_data.get("x_s"), segment_data["y"], segment_data["dates"],
+                    int(offsets[basin_idx]), int(offsets[basin_idx + 1]))
+        if self._basin_cache is not None:
+            basin_data = self._basin_cache[basin_idx][freq]
+            return (basin_data["x_d"], basin_data.get("x_s"), basin_data["y"], basin_data["dates"], 0,
+                    len(basin_data["dates"]))
+        return (self._x_d[freq], self._x_s.get(freq), self._y[freq], self._dates[freq],
+                int(self._basin_offsets[freq][basin_idx]), int(self._basin_offsets[freq][basin_idx + 1]))
+
+    def get_sampler(self) -> Union[Sampler, None]:
+        """Return the sampler to use for training with this data set.
+
+        Returns
+        -------
+        Union[Sampler, None]
+            If the data set is loaded lazily, a `BasinGroupedSampler` that keeps the hit rate of the basin cache high.
+            Otherwise None, i.e., the default (random) sampling is used.
+        """
+        if self._basin_cache is None:
+            return None
+        return BasinGroupedSampler(sample_basins=self._lookup_basins,
+                                   basin_nbytes=self._basin_nbytes,
+                                   max_group_nbytes=self._basin_cache.max_bytes)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the data of this data set in bytes, i.e., the memory that is released when it is deleted.
+
+        Arrays that are memory-mapped from the prepared-data-set cache are not counted, because their pages are backed
+        by the cache files and shared between all data sets that attach to the same cache entry. If the data set is
+        loaded lazily, the size of the basin cache is counted.
+        """
+        arrays = [*self._x_d.values(), *self._x_s.values(), *self._y.values(), *self._dates.values()]
+        arrays += [*self._basin_offsets.values(), self._lookup_basins, self._lookup_indices, self._lookup_segments]
+        for segment in self._segments:
+            for segment_data in segment.values():
+                arrays += list(segment_data.values())
+        arrays += [self._attributes, self._per_basin_target_stds, self._basin_int_ids]
+        nbytes = sum(
+            get_nbytes(values)
+            for values in arrays
+            if isinstance(values, (np.ndarray, torch.Tensor)) and _get_data_ptr(values) not in self._mapped_data_ptrs)
+        if self._basin_cache is not None:
+            nbytes += self._basin_cache.nbytes
+        return nbytes
+
+    def get_sample_basins(self) -> Tuple[List[str], np.ndarray]:
+        """Return the basin of each sample.
+
+        Returns
+        -------
+        Tuple[List[str], np.ndarray]
+            The ids of all basins with samples and, for each sample, the index of its basin in this list.
+        """
+        return self._sample_basins.tolist(), self._lookup_basins
+
+    def append_data(self, new_data: Dict[str, pd.DataFrame]):
+        """Append new time steps to the prepared time series of the data set, e.g., for operational forecasting.
+
+        The new time steps are normalized with the (frozen) scaler of the data set and only the samples that end in the
+        new time steps are validated and added to the lookup table. The historical data is neither re-normalized nor
+        re-validated, and it is not copied: the new time steps are stored in a new segment, together with the last time
+        steps of each basin that the input sequences of the new samples reach back into. If the data set uses the
+        prepared-data-set cache, the segment is appended to its cache entry (see `datasetcache.write_segment`), such
+        that every data set that attaches to this entry later on includes the appended time steps. Like the scaler, the
+        per-basin target standard deviations (NSE loss) are not updated.
+
+        Parameters
+        ----------
+        new_data : Dict[str, pd.DataFrame]
+            Mapping from basin id to a time-indexed DataFrame with the new time steps of the basin in the native
+            frequency of the data. The new time steps have to directly follow the last time step of the basin in the
+            data set and have to cover full time steps of the lowest frequency in `use_frequencies`. Each DataFrame
+            has to contain all features of the data set as they are returned by `_load_basin_data` (including
+            additional features and lagged features). Duplicated features are created, and missing targets are added
+            if the data set is not used for training.
+
+        Raises
+        ------
+        ValueError
+            If the data set is loaded lazily or stored in a compact data type, if a basin has no samples in the data
+            set, or if the new time steps do not directly follow the existing time steps of a basin.
+        RuntimeError
+            If another run appended time steps to the same cache entry since this data set attached to it.
+        """
+        if self._basin_cache is not None:
+            raise ValueError("Appending data is not supported for lazily loaded data sets.")
+        if self._storage_dtype != torch.float32:
+            raise ValueError("Appending data is only supported if the data set is stored as float32.")
+
+        keep_cols = self._get_keep_cols()
+        center, scale = self.scaler["xarray_feature_center"], self.scaler["xarray_feature_scale"]
+        basin_indices = {basin: i for i, basin in enumerate(self._sample_basins.tolist())}
+        lowest_freq = utils.sort_frequencies(self.frequencies)[0]
+        frequency_factors = [int(utils.get_frequency_factor(lowest_freq, freq)) for freq in self.frequencies]
+        # number of lowest-frequency steps of the history that a new sample can reach back into
+        n_context = max(int(np.ceil(seq_len / factor)) for seq_len, factor in zip(self.seq_len, frequency_factors))
+        # autoregressive inputs are not validated, and they are always the last columns of the dynamic inputs
+        n_validated_x_d = {freq: len(columns) - len(self.cfg.autoregressive_inputs)
+                           for freq, columns in self._x_d_columns.items()}
+
+        # history and new time steps of each basin in the new segment
+        segment_parts = defaultdict(dict)
+        new_lookup_basins, new_lookup_indices = [], []
+        for basin, df in new_data.items():
+            if basin not in basin_indices:
+                raise ValueError(f"Basin {basin} does not have any samples in the data set.")
+            basin_idx = basin_indices[basin]
+            if len(df) == 0:
+                continue
+
+            if not self.is_train:
+                df = self._add_missing_targets(df)
+            df = self._duplicate_features(df)
+            missing_columns = [col for col in keep_cols if col not in df.columns]
+            if missing_columns:
+                raise KeyError(f"The following features are missing in the new data of basin {basin}: "
+                               f"{missing_columns}")
+            df = df[keep_cols].astype(np.float32)
+            for feature in keep_cols:
+                df[feature] = (df[feature].values - center[feature].values) / scale[feature].values
+
+            # the history of the basin ends in the last segment that contains time steps of the basin
+            last_segment = self._get_last_segment(basin_idx)
+            frequency_maps = []
+            for freq, factor in zip(self.frequencies, frequency_factors):
+                resampled_dates, resampled_values = self._resample(df.index, df.values, freq)
+                df_resampled = pd.DataFrame(resampled_values, index=resampled_dates, columns=df.columns)
+                x_d, x_s, y, dates, offset, basin_end = self._get_basin_arrays(basin_idx, freq, last_segment)
+                expected_start = pd.Timestamp(dates[basin_end - 1]) + to_offset(freq)
+                if df_resampled.index[0] != expected_start:
+                    raise ValueError(f"The new data of basin {basin} has to start at {expected_start} at frequency "
+                                     f"{freq}, but starts at {df_resampled.index[0]}.")
+                if len(df_resampled) % factor != 0:
+                    raise ValueError(f"The new data of basin {basin} has {len(df_resampled)} time steps at frequency "
+                                     f"{freq}, which is not a multiple of {factor} (the number of time steps in one "
+                                     f"time step of the lowest frequency {lowest_freq}).")
+                n_new_samples = len(df_resampled) // factor
+
+                # the segment starts with the last time steps of the history that the new samples reach back into
+                n_history = min(n_context, (basin_end - offset) // factor) * factor
+                history = slice(basin_end - n_history, basin_end)
+                segment_parts[freq][basin_idx] = {
+                    "x_d": np.concatenate([x_d.numpy()[history], df_resampled[self._x_d_columns[freq]].values]),
+                    "y": np.concatenate([y.numpy()[history], df_resampled[self.cfg.target_variables].values]),
+                    "dates": np.concatenate([dates[history], df_resampled.index.to_numpy()])
+                }
+                if self.cfg.evolving_attributes:
+                    segment_parts[freq][basin_idx]["x_s"] = np.concatenate(
+                        [x_s.numpy()[history], df_resampled[self.cfg.evolving_attributes].values])
+                frequency_maps.append(np.arange(len(segment_parts[freq][basin_idx]["y"]) // factor) * factor +
+                                      (factor - 1))
+
+            # the new samples are validated together with the last time steps of the history
+            parts = [segment_parts[freq][basin_idx] for freq in self.frequencies]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=NumbaPendingDeprecationWarning)
+                flag = _validate_samples(
+                    x_d=[part["x_d"][:, :n_validated_x_d[freq]] for part, freq in zip(parts, self.frequencies)]
+                    if self.is_train else None,
+                    x_s=[part["x_s"] for part in parts] if self.is_train and self.cfg.evolving_attributes else None,
+                    y=[part["y"] for part in parts] if self.is_train else None,
+                    frequency_maps=frequency_maps,
+                    seq_length=self.seq_len,
+                    predict_last_n=self._predict_last_n)
+            # only samples that end in the new time steps are added
+            n_history_samples = len(frequency_maps[0]) - n_new_samples
+            valid_samples = np.argwhere(flag[n_history_samples:] == 1).flatten() + n_history_samples
+            new_lookup_basins.append(np.full(len(valid_samples), basin_idx, dtype=np.int64))
+            new_lookup_indices.append(
+                np.stack([frequency_maps[i][valid_samples] for i in range(len(self.frequencies))],
+                         axis=1).astype(np.int64))
+
+        if not new_lookup_basins:
+            return
+
+        # stack the parts of all basins, with empty slices for basins without new time steps
+        arrays = {
+            "lookup_basins": np.concatenate(new_lookup_basins),
+            "lookup_indices": np.concatenate(new_lookup_indices, axis=0)
+        }
+        for freq in self.frequencies:
+            basin_parts = [segment_parts[freq][i] for i in sorted(segment_parts[freq].keys())]
+            for key in basin_parts[0].keys():
+                array = np.concatenate([part[key] for part in basin_parts], axis=0)
+                arrays[f"{key}_{freq}"] = array if key == "dates" else array.astype(np.float32)
+            basin_lengths = [len(segment_parts[freq][i]["dates"]) if i in segment_parts[freq] else 0
+                             for i in range(len(self._sample_basins))]
+            arrays[f"offsets_{freq}"] = np.concatenate([[0], np.cumsum(basin_lengths)]).astype(np.int64)
+
+        if self._cache_dir is not None:
+            # written before the data set is changed, such that it remains consistent with the cache entry on failure
+            datasetcache.write_segment(self._cache_dir, len(self._segments), arrays)
+        self._add_segments([arrays])
+
+        if self.cfg.shared_memory_dataset:
+            # the existing tensors are shared already or memory-mapped from the cache entry, and sharing them again
+            # would copy the whole history
+            for segment_data in self._segments[-1].values():
+                for values in segment_data.values():
+                    if isinstance(values, torch.Tensor):
+                        values.share_memory_()
+
+    def _get_last_segment(self, basin_idx: int) -> int:
+        """Return the number of the last segment that contains time steps of a basin (0 for the stacked arrays)."""
+        for segment in range(len(self._segments), 0, -1):
+            offsets = self._segments[segment - 1][self.frequencies[0]]["offsets"]
+            if offsets[basin_idx + 1] > offsets[basin_idx]:
+                return segment
+        return 0
+
+    def _add_segments(self, segments: List[Dict[str, np.ndarray]]):
+        """Add segments of appended time steps (see `append_data`) and merge their samples into the lookup table."""
+        lookup_basins, lookup_indices = [self._lookup_basins], [self._lookup_indices]
+        if self._lookup_segments is None:
+            lookup_segments = [np.zeros(len(self._lookup_basins), dtype=np.int64)]
+        else:
+            lookup_segments = [self._lookup_segments]
+        for arrays in segments:
+            segment = {}
+            for freq in self.frequencies:
+                segment[freq] = {
+                    "x_d": torch.from_numpy(arrays[f"x_d_{freq}"]),
+                    "y": torch.from_numpy(arrays[f"y_{freq}"]),
+                    "dates": arrays[f"dates_{freq}"],
+                    "offsets": arrays[f"offsets_{freq}"]
+                }
+                if f"x_s_{freq}" in arrays:
+                    segment[freq]["x_s"] = torch.from_numpy(arrays[f"x_s_{freq}"])
+            self._segments.append(segment)
+            lookup_basins.append(arrays["lookup_basins"])
+            lookup_indices.append(arrays["lookup_indices"])
+            lookup_segments.append(np.full(len(arrays["lookup_basins"]), len(self._segments), dtype=np.int64))
+
+        # the lookup table stays sorted by basin, with the samples of each basin in temporal order
+        lookup_basins = np.concatenate(lookup_basins)
+        order = np.argsort(lookup_basins, kind="stable")
+        self._lookup_basins = lookup_basins[order]
+        self._lookup_indices = np.concatenate(lookup_indices, axis=0)[order]
+        self._lookup_segments = np.concatenate(lookup_segments)[order]
+        self.num_samples = len(self._lookup_basins)
 
     def _load_basin_data(self, basin: str) -> pd.DataFrame:
         """This function has to return the data for the specified basin as a time-indexed pandas DataFrame"""
@@ -340,6 +664,28 @@ class BaseDataset(Dataset):
 
         return df
 
+    def _add_derived_pet(self, df: pd.DataFrame, basin: str) -> pd.DataFrame:
+        derived_pet = self.cfg.derived_pet
+        missing_keys = [key for key in ["t_min", "t_max", "s_rad", "lat", "elev"] if key not in derived_pet]
+        if missing_keys:
+            raise ValueError(f"The derived_pet argument is missing the keys {missing_keys}.")
+        method = derived_pet.get("method", "priestley_taylor")
+        if method not in pet.PET_FORMULATIONS:
+            raise ValueError(f"Unknown PET method {method}. Use one of {list(pet.PET_FORMULATIONS.keys())}.")
+
+        if self._pet_attributes is None:
+            self._pet_attributes = self._load_attributes()[[derived_pet["lat"], derived_pet["elev"]]]
+        lat, elev = self._pet_attributes.loc[basin].values.astype(np.float64)
+
+        values = pet.PET_FORMULATIONS[method](t_min=df[derived_pet["t_min"]].values[np.newaxis],
+                                              t_max=df[derived_pet["t_max"]].values[np.newaxis],
+                                              s_rad=df[derived_pet["s_rad"]].values[np.newaxis],
+                                              lat=np.array([lat]),
+                                              elev=np.array([elev]),
+                                              doy=df.index.dayofyear.values)
+        df[derived_pet.get("name", "PET(mm/d)")] = values[0]
+        return df
+
     def _check_autoregressive_inputs(self):
         # The dataset requires that AR inputs be lagged features, however in general when constructing the dataset
         # we do not care whether these are lagged targets, specifically. The requirement that AR inputs be lagged
@@ -361,156 +707,17 @@ class BaseDataset(Dataset):
         if (self.cfg.train_data_file is None) or (not self.is_train):
             data_list = []
 
-            # list of columns to keep, everything else will be removed to reduce memory footprint
-            keep_cols = (
-                self.cfg.target_variables + self.cfg.evolving_attributes + self.cfg.mass_inputs + self.cfg.autoregressive_inputs
-            )
-
-            if isinstance(self.cfg.dynamic_inputs, list):
-                keep_cols += self.cfg.dynamic_inputs_flattened
-            else:
-                # keep all frequencies' dynamic inputs
-                keep_cols += [i for inputs in self.cfg.dynamic_inputs.values() for i in inputs]
-
-            # Keep the dynamic_conceptual_inputs
-            keep_cols += self.cfg.dynamic_conceptual_inputs
-
-            # make sure that even inputs that are used in multiple frequencies occur only once in the df
-            keep_cols = list(sorted(set(keep_cols)))
+            keep_cols = self._get_keep_cols()
 
             if not self._disable_pbar:
                 LOGGER.info("Loading basin data into xarray data set.")
             for basin in tqdm(self.basins, disable=self._disable_pbar, file=sys.stdout):
-                df = self._load_basin_data(basin)
-
-                # add columns from dataframes passed as additional data files
-                df = pd.concat([df, *[d[basin] for d in self.additional_features]], axis=1)
-
-                # if target variables are missing for basin, add empty column to still allow predictions to be made
-                if not self.is_train:
-                    df = self._add_missing_targets(df)
-
-                # check if any feature should be duplicated
-                df = self._duplicate_features(df)
-
-                # check if a shifted copy of a feature should be added
-                df = self._add_lagged_features(df)
-
-                # remove unnecessary columns
-                try:
-                    df = df[keep_cols]
-                except KeyError:
-                    not_available_columns = [x for x in keep_cols if x not in df.columns]
-                    msg = [
-                        f"The following features are not available in the data: {not_available_columns}. ",
-                        f"These are the available features: {df.columns.tolist()}",
-                    ]
-                    raise KeyError("".join(msg))
-
-                # remove random portions of the timeseries of dynamic features
-                for holdout_variable, holdout_dict in self.cfg.random_holdout_from_dynamic_features.items():
-                    df[holdout_variable] = samplingutils.bernoulli_subseries_sampler(
-                        data=df[holdout_variable].values,
-                        missing_fraction=holdout_dict["missing_fraction"],
-                        mean_missing_length=holdout_dict["mean_missing_length"],
-                    )
-
-                # Make end_date the last second of the specified day, such that the
-                # dataset will include all hours of the last day, not just 00:00.
-                start_dates = self.start_and_end_dates[basin]["start_dates"]
-                end_dates = [date + pd.Timedelta(days=1, seconds=-1) for date in self.start_and_end_dates[basin]["end_dates"]]
-
-                native_frequency = utils.infer_frequency(df.index)
-                if not self.frequencies:
-                    self.frequencies = [native_frequency]  # use df's native resolution by default
-
-                # Assert that the used frequencies are lower or equal than the native frequency. There may be cases
-                # where our logic cannot determine whether this is the case, because pandas might return an exotic
-                # native frequency. In this case, all we can do is print a warning and let the user check themselves.
-                try:
-                    freq_vs_native = [utils.compare_frequencies(freq, native_frequency) for freq in self.frequencies]
-                except ValueError:
-                    LOGGER.warning(
-                        "Cannot compare provided frequencies with native frequency. "
-                        "Make sure the frequencies are not higher than the native frequency."
-                    )
-                    freq_vs_native = []
-                if any(comparison > 1 for comparison in freq_vs_native):
-                    raise ValueError(f"Frequency is higher than native data frequency {native_frequency}.")
-
-                # used to get the maximum warmup-offset across all frequencies. We don't use to_timedelta because it
-                # does not support all frequency strings. We can't calculate the maximum offset here, because to
-                # compare offsets, they need to be anchored to a specific date (here, the start date).
-                offsets = [
-                    (self.seq_len[i] - self._predict_last_n[i]) * to_offset(freq) for i, freq in enumerate(self.frequencies)
-                ]
-
-                basin_data_list = []
-                # create xarray data set for each period slice of the specific basin
-                for i, (start_date, end_date) in enumerate(zip(start_dates, end_dates)):
-                    # if the start date is not aligned with the frequency, the resulting datetime indices will be off
-                    if not all(to_offset(freq).is_on_offset(start_date) for freq in self.frequencies):
-                        misaligned = [freq for freq in self.frequencies if not to_offset(freq).is_on_offset(start_date)]
-                        raise ValueError(f"start date {start_date} is not aligned with frequencies {misaligned}.")
-                    # add warmup period, so that we can make prediction at the first time step specified by period.
-                    # offsets has the warmup offset needed for each frequency; the overall warmup starts with the
-                    # earliest date, i.e., the largest offset across all frequencies.
-                    warmup_start_date = min(start_date - offset for offset in offsets)
-                    df_sub = df[warmup_start_date:end_date]
-
-                    # make sure the df covers the full date range from warmup_start_date to end_date, filling any gaps
-                    # with NaNs. This may increase runtime, but is a very robust way to make sure dates and predictions
-                    # keep in sync. In training, the introduced NaNs will be discarded, so this only affects evaluation.
-                    full_range = pd.date_range(start=warmup_start_date, end=end_date, freq=native_frequency)
-                    df_sub = df_sub.reindex(pd.DatetimeIndex(full_range, name=df_sub.index.name))
-
-                    # as double check, set all targets before period start to NaN
-                    df_sub.loc[df_sub.index < start_date, self.cfg.target_variables] = np.nan
-
-                    basin_data_list.append(df_sub)
-
-                if not basin_data_list:
-                    # Skip basin in case no start and end dates where defined.
+                df = self._load_basin_dataframe(basin, keep_cols)
+                if df is None:
                     continue
 
-                # In case of multiple time slices per basin, stack the time slices in the time dimension.
-                df = pd.concat(basin_data_list, axis=0)
-
-                # Because of overlaps between warmup period of one slice and training period of another slice, there can
-                # be duplicated indices. The next block of code creates two subset dataframes. First, a subset with all
-                # non-duplicated indices. Second, a subset with duplicated indices, of which we keep the rows, where the
-                # target value is not NaN (because we remove the target variable during warmup periods but want to keep
-                # them if they are target in another temporal slice).
-                df_non_duplicated = df[~df.index.duplicated(keep=False)]
-                df_duplicated = df[df.index.duplicated(keep=False)]
-
-                filtered_duplicates = []
-                for _, grp in df_duplicated.groupby("date"):
-                    mask = ~grp[self.cfg.target_variables].isna().any(axis=1)
-                    if not mask.any():
-                        # In case all duplicates have a NaN value for the targets, pick the first. This can happen, if
-                        # the day itself has a missing observation.
-                        filtered_duplicates.append(grp.head(1))
-                    else:
-                        # If at least one duplicate has values in the target columns, take the first of these rows.
-                        filtered_duplicates.append(grp[mask].head(1))
-
-                if filtered_duplicates:
-                    # Combine the filtered duplicates with the non-duplicates.
-                    df_filtered_duplicates = pd.concat(filtered_duplicates, axis=0)
-                    df = pd.concat([df_non_duplicated, df_filtered_duplicates], axis=0)
-                else:
-                    # Else, if no duplicates existed, continue with only the non-duplicate df.
-                    df = df_non_duplicated
-
-                # Sort by DatetimeIndex and reindex to fill gaps with NaNs.
-                df = df.sort_index(axis=0, ascending=True)
-                df = df.reindex(
-                    pd.DatetimeIndex(data=pd.date_range(df.index[0], df.index[-1], freq=native_frequency), name=df.index.name)
-                )
-
                 # Convert to xarray Dataset and add basin string as additional coordinate
-                xr = xarray.Dataset.from_dataframe(df.astype(np.float32))
+                xr = xarray.Dataset.from_dataframe(df)
                 xr = xr.assign_coords({"basin": basin})
                 data_list.append(xr)
 
@@ -537,6 +744,198 @@ class BaseDataset(Dataset):
 
         return xr
 
+    def _get_keep_cols(self) -> List[str]:
+        # list of columns to keep, everything else will be removed to reduce memory footprint
+        keep_cols = (
+            self.cfg.target_variables + self.cfg.evolving_attributes + self.cfg.mass_inputs + self.cfg.autoregressive_inputs
+        )
+
+        if isinstance(self.cfg.dynamic_inputs, list):
+            keep_cols += self.cfg.dynamic_inputs_flattened
+        else:
+            # keep all frequencies' dynamic inputs
+            keep_cols += [i for inputs in self.cfg.dynamic_inputs.values() for i in inputs]
+
+        # Keep the dynamic_conceptual_inputs
+        keep_cols += self.cfg.dynamic_conceptual_inputs
+
+        # make sure that even inputs that are used in multiple frequencies occur only once in the df
+        keep_cols = list(sorted(set(keep_cols)))
+        return keep_cols
+
+    def _get_warmup_offsets(self) -> List[pd.DateOffset]:
+        # used to get the maximum warmup-offset across all frequencies. We don't use to_timedelta because it
+        # does not support all frequency strings. We can't calculate the maximum offset here, because to
+        # compare offsets, they need to be anchored to a specific date (here, the start date).
+        return [
+            (self.seq_len[i] - self._predict_last_n[i]) * to_offset(freq) for i, freq in enumerate(self.frequencies)
+        ]
+
+    def _get_required_columns(self) -> List[str]:
+        """Return the columns of the basin data that are needed to create all features of the data set.
+
+        Data set classes can use this list to read only the needed columns in `_load_basin_data`. The list can contain
+        columns that are not part of the basin data (e.g., columns from additional features), which have to be ignored.
+        """
+        columns = set(self._get_keep_cols())
+        columns.update(self.cfg.duplicate_features.keys())
+        columns.update(self.cfg.lagged_features.keys())
+        if self.cfg.derived_pet:
+            columns.update(self.cfg.derived_pet[key] for key in ["t_min", "t_max", "s_rad"])
+        return sorted(columns)
+
+    def _get_required_date_range(self, basin: str) -> Tuple[Union[pd.Timestamp, None], Union[pd.Timestamp, None]]:
+        """Return the first and last date (including warmup) of the basin data that are needed for the data set.
+
+        Data set classes can use this range to read only the needed time steps in `_load_basin_data`. Returns
+        (None, None) if the range is not known before the data is loaded, i.e., if the frequencies are inferred from the
+        data, or if lagged features need the time steps before the warmup period.
+        """
+        if not self.frequencies or self.cfg.lagged_features:
+            return None, None
+        start_dates = self.start_and_end_dates[basin]["start_dates"]
+        end_dates = self.start_and_end_dates[basin]["end_dates"]
+        if not start_dates:
+            return None, None
+        offsets = self._get_warmup_offsets()
+        start_date = min(date - offset for date in start_dates for offset in offsets)
+        end_date = max(end_dates) + pd.Timedelta(days=1, seconds=-1)
+        return start_date, end_date
+
+    def _load_basin_dataframe(self, basin: str, keep_cols: List[str]) -> Union[pd.DataFrame, None]:
+        """Load and preprocess the time series of one basin, including warmup periods, as float32 DataFrame.
+
+        Returns None if no period is defined for the basin.
+        """
+        df = self._load_basin_data(basin)
+
+        # add columns from dataframes passed as additional data files
+        df = pd.concat([df, *[d[basin] for d in self.additional_features]], axis=1)
+
+        # check if a PET time series should be derived from the other columns
+        if self.cfg.derived_pet:
+            df = self._add_derived_pet(df, basin)
+
+        # if target variables are missing for basin, add empty column to still allow predictions to be made
+        if not self.is_train:
+            df = self._add_missing_targets(df)
+
+        # check if any feature should be duplicated
+        df = self._duplicate_features(df)
+
+        # check if a shifted copy of a feature should be added
+        df = self._add_lagged_features(df)
+
+        # remove unnecessary columns
+        try:
+            df = df[keep_cols]
+        except KeyError:
+            not_available_columns = [x for x in keep_cols if x not in df.columns]
+            msg = [
+                f"The following features are not available in the data: {not_available_columns}. ",
+                f"These are the available features: {df.columns.tolist()}",
+            ]
+            raise KeyError("".join(msg))
+
+        # remove random portions of the timeseries of dynamic features
+        for holdout_variable, holdout_dict in self.cfg.random_holdout_from_dynamic_features.items():
+            df[holdout_variable] = samplingutils.bernoulli_subseries_sampler(
+                data=df[holdout_variable].values,
+                missing_fraction=holdout_dict["missing_fraction"],
+                mean_missing_length=holdout_dict["mean_missing_length"],
+            )
+
+        # Make end_date the last second of the specified day, such that the
+        # dataset will include all hours of the last day, not just 00:00.
+        start_dates = self.start_and_end_dates[basin]["start_dates"]
+        end_dates = [date + pd.Timedelta(days=1, seconds=-1) for date in self.start_and_end_dates[basin]["end_dates"]]
+
+        native_frequency = utils.infer_frequency(df.index)
+        if not self.frequencies:
+            self.frequencies = [native_frequency]  # use df's native resolution by default
+
+        # Assert that the used frequencies are lower or equal than the native frequency. There may be cases
+        # where our logic cannot determine whether this is the case, because pandas might return an exotic
+        # native frequency. In this case, all we can do is print a warning and let the user check themselves.
+        try:
+            freq_vs_native = [utils.compare_frequencies(freq, native_frequency) for freq in self.frequencies]
+        except ValueError:
+            LOGGER.warning(
+                "Cannot compare provided frequencies with native frequency. "
+                "Make sure the frequencies are not higher than the native frequency."
+            )
+            freq_vs_native = []
+        if any(comparison > 1 for comparison in freq_vs_native):
+            raise ValueError(f"Frequency is higher than native data frequency {native_frequency}.")
+
+        offsets = self._get_warmup_offsets()
+
+        basin_data_list = []
+        # create xarray data set for each period slice of the specific basin
+        for i, (start_date, end_date) in enumerate(zip(start_dates, end_dates)):
+            # if the start date is not aligned with the frequency, the resulting datetime indices will be off
+            if not all(to_offset(freq).is_on_offset(start_date) for freq in self.frequencies):
+                misaligned = [freq for freq in self.frequencies if not to_offset(freq).is_on_offset(start_date)]
+                raise ValueError(f"start date {start_date} is not aligned with frequencies {misaligned}.")
+            # add warmup period, so that we can make prediction at the first time step specified by period.
+            # offsets has the warmup offset needed for each frequency; the overall warmup starts with the
+            # earliest date, i.e., the largest offset across all frequencies.
+            warmup_start_date = min(start_date - offset for offset in offsets)
+            df_sub = df[warmup_start_date:end_date]
+
+            # make sure the df covers the full date range from warmup_start_date to end_date, filling any gaps
+            # with NaNs. This may increase runtime, but is a very robust way to make sure dates and predictions
+            # keep in sync. In training, the introduced NaNs will be discarded, so this only affects evaluation.
+            full_range = pd.date_range(start=warmup_start_date, end=end_date, freq=native_frequency)
+            df_sub = df_sub.reindex(pd.DatetimeIndex(full_range, name=df_sub.index.name))
+
+            # as double check, set all targets before period start to NaN
+            df_sub.loc[df_sub.index < start_date, self.cfg.target_variables] = np.nan
+
+            basin_data_list.append(df_sub)
+
+        if not basin_data_list:
+            # Skip basin in case no start and end dates where defined.
+            return None
+
+        # In case of multiple time slices per basin, stack the time slices in the time dimension.
+        df = pd.concat(basin_data_list, axis=0)
+
+        # Because of overlaps between warmup period of one slice and training period of another slice, there can
+        # be duplicated indices. The next block of code creates two subset dataframes. First, a subset with all
+        # non-duplicated indices. Second, a subset with duplicated indices, of which we keep the rows, where the
+        # target value is not NaN (because we remove the target variable during warmup periods but want to keep
+        # them if they are target in another temporal slice).
+        df_non_duplicated = df[~df.index.duplicated(keep=False)]
+        df_duplicated = df[df.index.duplicated(keep=False)]
+
+        filtered_duplicates = []
+        for _, grp in df_duplicated.groupby("date"):
+            mask = ~grp[self.cfg.target_variables].isna().any(axis=1)
+            if not mask.any():
+                # In case all duplicates have a NaN value for the targets, pick the first. This can happen, if
+                # the day itself has a missing observation.
+                filtered_duplicates.append(grp.head(1))
+            else:
+                # If at least one duplicate has values in the target columns, take the first of these rows.
+                filtered_duplicates.append(grp[mask].head(1))
+
+        if filtered_duplicates:
+            # Combine the filtered duplicates with the non-duplicates.
+            df_filtered_duplicates = pd.concat(filtered_duplicates, axis=0)
+            df = pd.concat([df_non_duplicated, df_filtered_duplicates], axis=0)
+        else:
+            # Else, if no duplicates existed, continue with only the non-duplicate df.
+            df = df_non_duplicated
+
+        # Sort by DatetimeIndex and reindex to fill gaps with NaNs.
+        df = df.sort_index(axis=0, ascending=True)
+        df = df.reindex(
+            pd.DatetimeIndex(data=pd.date_range(df.index[0], df.index[-1], freq=native_frequency), name=df.index.name)
+        )
+
+        return df.astype(np.float32)
+
     def _save_xarray_dataset(self, xr: xarray.Dataset):
         """Store newly created train data set to disk"""
         file_path = self.cfg.train_dir / "train_data.p"
@@ -551,17 +950,19 @@ class BaseDataset(Dataset):
         basin_coordinates = xr["basin"].values.tolist()
         if not self._disable_pbar:
             LOGGER.info("Calculating target variable stds per basin")
+        # array of shape [basins, targets, time steps], to compute the stds of all basins at once
+        obs = xr[self.cfg.target_variables].to_array().transpose("basin", "variable", ...).values
+        valid_counts = np.sum(~np.isnan(obs), axis=(1, 2))
+        with warnings.catch_warnings():
+            # basins with all-NaN targets are handled below
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            stds = torch.from_numpy(np.nanstd(obs, axis=2)[:, np.newaxis, :].astype(np.float32))
+        stds[valid_counts <= 1] = np.nan
         nan_basins = []
-        for basin in tqdm(self.basins, file=sys.stdout, disable=self._disable_pbar):
-            obs = xr.sel(basin=basin)[self.cfg.target_variables].to_array().values
-            if np.sum(~np.isnan(obs)) > 1:
-                # calculate std for each target
-                per_basin_target_stds = torch.tensor(np.expand_dims(np.nanstd(obs, axis=1), 0), dtype=torch.float32)
-            else:
+        for i, basin in enumerate(basin_coordinates):
+            if valid_counts[i] <= 1:
                 nan_basins.append(basin)
-                per_basin_target_stds = torch.full((1, obs.shape[0]), np.nan, dtype=torch.float32)
-
-            self._per_basin_target_stds[basin] = per_basin_target_stds
+            self._per_basin_target_stds[basin] = stds[i]
 
         if len(nan_basins) > 0:
             LOGGER.warning(
@@ -569,135 +970,298 @@ class BaseDataset(Dataset):
                 f"{', '.join(nan_basins)}. NSE loss values for this basin will be NaN."
             )
 
+    @staticmethod
+    def _get_target_stds(obs: np.ndarray) -> torch.Tensor:
+        """Return the std of each target (shape [1, targets]) from observations of shape [targets, time steps]."""
+        if np.sum(~np.isnan(obs)) > 1:
+            # calculate std for each target
+            return torch.tensor(np.expand_dims(np.nanstd(obs, axis=1), 0), dtype=torch.float32)
+        return torch.full((1, obs.shape[0]), np.nan, dtype=torch.float32)
+
     def _create_lookup_table(self, xr: xarray.Dataset):
-        lookup = []
+        lookup_basins, lookup_indices = [], []
+        # per-basin arrays of each frequency, which are stacked along the time dimension after the loop
+        stacked_x_d, stacked_x_s = defaultdict(list), defaultdict(list)
+        stacked_y, stacked_dates = defaultdict(list), defaultdict(list)
+        sample_basins = []
         if not self._disable_pbar:
             LOGGER.info("Create lookup table and convert to pytorch tensor")
 
         # list to collect basins ids of basins without a single training sample
         basins_without_samples = []
         basin_coordinates = xr["basin"].values.tolist()
-        for basin in tqdm(basin_coordinates, file=sys.stdout, disable=self._disable_pbar):
-            # store data of each frequency as numpy array of shape [time steps, features] and dates as numpy array of
-            # shape (time steps,)
-            x_d, x_s, y, dates = {}, {}, {}, {}
-
-            # keys: frequencies, values: array mapping each lowest-frequency
-            # sample to its corresponding sample in this frequency
-            frequency_maps = {}
-            lowest_freq = utils.sort_frequencies(self.frequencies)[0]
-
-            # converting from xarray to pandas DataFrame because resampling is much faster in pandas.
-            df_native = xr.sel(basin=basin).to_dataframe()
-            for freq in self.frequencies:
-                # make sure that possible mass inputs are sorted to the beginning of the dynamic feature list
-                if isinstance(self.cfg.dynamic_inputs, list):
-                    dynamic_cols = self.cfg.mass_inputs + self.cfg.dynamic_inputs_flattened
-                else:
-                    dynamic_cols = self.cfg.mass_inputs + self.cfg.dynamic_inputs[freq]
+        # arrays of shape [basins, time steps] per feature, which are sliced per basin without conversion to pandas
+        values = {feature: xr[feature].transpose("basin", "date").values for feature in xr.data_vars}
+        native_dates = pd.DatetimeIndex(xr["date"].values)
+        for i, basin in enumerate(tqdm(basin_coordinates, file=sys.stdout, disable=self._disable_pbar)):
+            basin_values = {feature: feature_values[i] for feature, feature_values in values.items()}
+            x_d, x_s, y, dates, valid_indices = self._prepare_basin_samples(basin, native_dates, basin_values)
+
+            # only store data if this basin has at least one valid sample in the given period
+            if len(valid_indices) > 0:
+                # store pointer to basin and the sample's index in each frequency
+                lookup_basins.append(np.full(len(valid_indices), len(sample_basins), dtype=np.int64))
+                lookup_indices.append(valid_indices)
+                sample_basins.append(basin)
+                for freq in self.frequencies:
+                    stacked_x_d[freq].append(x_d[freq])
+                    stacked_y[freq].append(y[freq])
+                    if x_s:
+                        stacked_x_s[freq].append(x_s[freq])
+                    stacked_dates[freq].append(dates[freq])
+            else:
+                basins_without_samples.append(basin)
 
-                # add the dynamic_conceptual columns
-                dynamic_cols += self.cfg.dynamic_conceptual_inputs
+        self._set_lookup_table(sample_basins, lookup_basins, lookup_indices, basins_without_samples)
 
-                df_resampled = (
-                    df_native[
-                        dynamic_cols + self.cfg.target_variables + self.cfg.evolving_attributes + self.cfg.autoregressive_inputs
-                    ]
-                    .resample(freq)
-                    .mean()
-                )
+        for freq in self.frequencies:
+            self._basin_offsets[freq] = np.concatenate([[0], np.cumsum([len(d) for d in stacked_dates[freq]])])
+            self._x_d[freq] = torch.from_numpy(np.concatenate(stacked_x_d.pop(freq), axis=0))
+            self._y[freq] = torch.from_numpy(np.concatenate(stacked_y.pop(freq), axis=0))
+            if stacked_x_s:
+                self._x_s[freq] = torch.from_numpy(np.concatenate(stacked_x_s.pop(freq), axis=0))
+            self._dates[freq] = np.concatenate(stacked_dates.pop(freq), axis=0)
 
-                # pull all of the data that needs to be validated
-                x_d[freq] = {col: df_resampled[[col]].values for col in dynamic_cols}
-                y[freq] = df_resampled[self.cfg.target_variables].values
-                if self.cfg.evolving_attributes:
-                    x_s[freq] = df_resampled[self.cfg.evolving_attributes].values
-
-                # Add dates of the (resampled) data to the dates dict
-                dates[freq] = df_resampled.index.to_numpy()
-
-                # number of frequency steps in one lowest-frequency step
-                frequency_factor = int(utils.get_frequency_factor(lowest_freq, freq))
-                # array position i is the last entry of this frequency that belongs to the lowest-frequency sample i.
-                if len(df_resampled) % frequency_factor != 0:
-                    raise ValueError(
-                        f"The length of the dataframe at frequency {freq} is {len(df_resampled)} "
-                        f"(including warmup), which is not a multiple of {frequency_factor} (i.e., the "
-                        f"factor between the lowest frequency {lowest_freq} and the frequency {freq}. "
-                        f"To fix this, adjust the {self.period} start or end date such that the period "
-                        f"(including warmup) has a length that is divisible by {frequency_factor}."
-                    )
-                frequency_maps[freq] = np.arange(len(df_resampled) // frequency_factor) * frequency_factor + (
-                    frequency_factor - 1
-                )
+        self._stack_basin_attributes()
 
-            # store first date of sequence to be able to restore dates during inference
-            if not self.is_train:
-                self.period_starts[basin] = pd.to_datetime(xr.sel(basin=basin)["date"].values[0])
+    def _set_lookup_table(self, sample_basins: List[str], lookup_basins: List[np.ndarray],
+                          lookup_indices: List[np.ndarray], basins_without_samples: List[str]):
+        if basins_without_samples:
+            LOGGER.info(f"These basins do not have a single valid sample in the {self.period} period: {basins_without_samples}")
 
-            # we can ignore the deprecation warning about lists because we don't use the passed lists
-            # after the _validate_samples call. The alternative numba.typed.Lists is still experimental.
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=NumbaPendingDeprecationWarning)
+        if not sample_basins:
+            if self.is_train:
+                raise NoTrainDataError
+            else:
+                raise NoEvaluationDataError
 
-                # checks inputs and outputs for each sequence. valid: flag = 1, invalid: flag = 0
-                # manually unroll the dicts into lists to make sure the order of frequencies is consistent.
-                # during inference, we want all samples with sufficient history (even if input is NaN), so
-                # we pass x_d, x_s, y as None.
-                if self.is_train:
-                    x_d_validate = [np.concatenate([v for v in x_d[freq].values()], axis=-1) for freq in self.frequencies]
-                else:
-                    x_d_validate = None
-                flag = _validate_samples(
-                    x_d=x_d_validate,
-                    x_s=[x_s[freq] for freq in self.frequencies] if self.is_train and x_s else None,
-                    y=[y[freq] for freq in self.frequencies] if self.is_train else None,
-                    frequency_maps=[frequency_maps[freq] for freq in self.frequencies],
-                    seq_length=self.seq_len,
-                    predict_last_n=self._predict_last_n,
-                )
+        self._lookup_basins = np.concatenate(lookup_basins)
+        self._lookup_indices = np.concatenate(lookup_indices, axis=0).astype(np.int64)
+        self.num_samples = len(self._lookup_basins)
+        self._sample_basins = np.array(sample_basins, dtype=str)
 
-            # Concatenate autoregressive columns to dynamic inputs *after* validation, so as to not remove
-            # samples with missing autoregressive inputs.
-            # AR inputs must go at the end of the df/array (this is assumed by the AR model).
-            if self.cfg.autoregressive_inputs:
-                if len(self.frequencies) > 1:
-                    # We'd need to store the df_resampled for each frequency separately to make this work.
-                    raise ValueError("Autoregressive inputs are not supported for datasets with multiple frequencies.")
-                x_d[self.frequencies[0]].update({col: df_resampled[[col]].values for col in self.cfg.autoregressive_inputs})
-
-            valid_samples = np.argwhere(flag == 1)
-            for f in valid_samples:
-                # store pointer to basin and the sample's index in each frequency
-                lookup.append((basin, [frequency_maps[freq][int(f)] for freq in self.frequencies]))
+    def _prepare_basin_samples(
+        self, basin: str, native_dates: pd.DatetimeIndex, values: Dict[str, np.ndarray]
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, np.ndarray], np.ndarray]:
+        """Resample the time series of one basin to all frequencies and determine the valid samples.
 
-            # only store data if this basin has at least one valid sample in the given period
-            if valid_samples.size > 0:
-                if self.cfg.forecast_inputs_flattened and not self.cfg.hindcast_inputs_flattened:
-                    raise ValueError("Hindcast inputs must be provided if forecast inputs are provided.")
-                self._x_d[basin] = {
-                    freq: {k: torch.from_numpy(v.astype(np.float32)) for k, v in _x_d.items()} for freq, _x_d in x_d.items()
-                }
-                self._y[basin] = {freq: torch.from_numpy(_y.astype(np.float32)) for freq, _y in y.items()}
-                if x_s:
-                    self._x_s[basin] = {freq: torch.from_numpy(_x_s.astype(np.float32)) for freq, _x_s in x_s.items()}
-                self._dates[basin] = dates
+        `values` maps each feature to its time series (at `native_dates`) in the native frequency. Returns the dynamic
+        inputs (columns as in `self._x_d_columns`), evolving attributes, targets and dates of each frequency as float32
+        arrays of shape [time steps, features] (dates: [time steps]), and an array of shape [valid samples, frequencies]
+        that holds the index of the last time step of each valid sample in each frequency.
+        """
+        # store data of each frequency as numpy array of shape [time steps, features] and dates as numpy array of
+        # shape (time steps,)
+        x_d, x_s, y, dates = {}, {}, {}, {}
+
+        # keys: frequencies, values: array mapping each lowest-frequency
+        # sample to its corresponding sample in this frequency
+        frequency_maps = {}
+        lowest_freq = utils.sort_frequencies(self.frequencies)[0]
+
+        for freq in self.frequencies:
+            # make sure that possible mass inputs are sorted to the beginning of the dynamic feature list
+            if isinstance(self.cfg.dynamic_inputs, list):
+                dynamic_cols = self.cfg.mass_inputs + self.cfg.dynamic_inputs_flattened
             else:
-                basins_without_samples.append(basin)
+                dynamic_cols = self.cfg.mass_inputs + self.cfg.dynamic_inputs[freq]
+
+            # add the dynamic_conceptual columns
+            dynamic_cols += self.cfg.dynamic_conceptual_inputs
+
+            resampled_cols = list(dict.fromkeys(dynamic_cols + self.cfg.target_variables +
+                                                self.cfg.evolving_attributes + self.cfg.autoregressive_inputs))
+            resampled_dates, resampled_values = self._resample(
+                native_dates, np.stack([values[col] for col in resampled_cols], axis=1), freq)
+            col_indices = {col: i for i, col in enumerate(resampled_cols)}
+
+            # pull all of the data that needs to be validated
+            x_d[freq] = {col: resampled_values[:, col_indices[col]:col_indices[col] + 1] for col in dynamic_cols}
+            y[freq] = resampled_values[:, [col_indices[col] for col in self.cfg.target_variables]]
+            if self.cfg.evolving_attributes:
+                x_s[freq] = resampled_values[:, [col_indices[col] for col in self.cfg.evolving_attributes]]
+
+            # Add dates of the (resampled) data to the dates dict
+            dates[freq] = resampled_dates.to_numpy()
+
+            # number of frequency steps in one lowest-frequency step
+            frequency_factor = int(utils.get_frequency_factor(lowest_freq, freq))
+            # array position i is the last entry of this frequency that belongs to the lowest-frequency sample i.
+            if len(resampled_dates) % frequency_factor != 0:
+                raise ValueError(
+                    f"The length of the dataframe at frequency {freq} is {len(resampled_dates)} "
+                    f"(including warmup), which is not a multiple of {frequency_factor} (i.e., the "
+                    f"factor between the lowest frequency {lowest_freq} and the frequency {freq}. "
+                    f"To fix this, adjust the {self.period} start or end date such that the period "
+                    f"(including warmup) has a length that is divisible by {frequency_factor}."
+                )
+            frequency_maps[freq] = np.arange(len(resampled_dates) // frequency_factor) * frequency_factor + (
+                frequency_factor - 1
+            )
 
-        if basins_without_samples:
-            LOGGER.info(f"These basins do not have a single valid sample in the {self.period} period: {basins_without_samples}")
-        self.lookup_table = {i: elem for i, elem in enumerate(lookup)}
-        self.num_samples = len(self.lookup_table)
+        # store first date of sequence to be able to restore dates during inference
+        if not self.is_train:
+            self.period_starts[basin] = pd.to_datetime(native_dates[0])
+
+        # we can ignore the deprecation warning about lists because we don't use the passed lists
+        # after the _validate_samples call. The alternative numba.typed.Lists is still experimental.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=NumbaPendingDeprecationWarning)
 
-        if self.num_samples == 0:
+            # checks inputs and outputs for each sequence. valid: flag = 1, invalid: flag = 0
+            # manually unroll the dicts into lists to make sure the order of frequencies is consistent.
+            # during inference, we want all samples with sufficient history (even if input is NaN), so
+            # we pass x_d, x_s, y as None.
             if self.is_train:
-                raise NoTrainDataError
+                x_d_validate = [np.concatenate([v for v in x_d[freq].values()], axis=-1) for freq in self.frequencies]
             else:
-                raise NoEvaluationDataError
+                x_d_validate = None
+            flag = _validate_samples(
+                x_d=x_d_validate,
+                x_s=[x_s[freq] for freq in self.frequencies] if self.is_train and x_s else None,
+                y=[y[freq] for freq in self.frequencies] if self.is_train else None,
+                frequency_maps=[frequency_maps[freq] for freq in self.frequencies],
+                seq_length=self.seq_len,
+                predict_last_n=self._predict_last_n,
+            )
+
+        # Concatenate autoregressive columns to dynamic inputs *after* validation, so as to not remove
+        # samples with missing autoregressive inputs.
+        # AR inputs must go at the end of the df/array (this is assumed by the AR model).
+        if self.cfg.autoregressive_inputs:
+            if len(self.frequencies) > 1:
+                # We'd need to store the df_resampled for each frequency separately to make this work.
+                raise ValueError("Autoregressive inputs are not supported for datasets with multiple frequencies.")
+            x_d[self.frequencies[0]].update({
+                col: resampled_values[:, col_indices[col]:col_indices[col] + 1]
+                for col in self.cfg.autoregressive_inputs
+            })
+
+        valid_samples = np.argwhere(flag == 1).flatten()
+        if valid_samples.size > 0 and self.cfg.forecast_inputs_flattened and not self.cfg.hindcast_inputs_flattened:
+            raise ValueError("Hindcast inputs must be provided if forecast inputs are provided.")
+        valid_indices = np.stack([frequency_maps[freq][valid_samples] for freq in self.frequencies], axis=1)
+
+        for freq in self.frequencies:
+            self._x_d_columns[freq] = list(x_d[freq].keys())
+            x_d[freq] = np.concatenate(list(x_d[freq].values()), axis=1).astype(np.float32)
+            y[freq] = y[freq].astype(np.float32)
+            if x_s:
+                x_s[freq] = x_s[freq].astype(np.float32)
+
+        return x_d, x_s, y, dates, valid_indices.astype(np.int64)
+
+    @staticmethod
+    def _resample(dates: pd.DatetimeIndex, values: np.ndarray, freq: str) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """Resample time series of shape [time steps, features] to `freq` by averaging (ignoring NaNs).
+
+        If the dates are regular and start at the beginning of a period of `freq`, the periods are blocks of equal
+        length and the time series are averaged with a reshape. Otherwise, pandas resampling is used.
+        """
+        offset = to_offset(freq)
+        if len(dates) > 1 and isinstance(offset, Tick):
+            step, period = dates[1] - dates[0], pd.Timedelta(offset)
+            factor = period // step
+            is_regular = dates[-1] - dates[0] == step * (len(dates) - 1)
+            # pandas resampling starts the periods at midnight of the first day
+            is_aligned = (dates[0] - dates[0].normalize()) % period == pd.Timedelta(0)
+            is_divisible = factor > 0 and period % step == pd.Timedelta(0) and len(dates) % factor == 0
+            if is_regular and is_aligned and is_divisible:
+                if factor == 1:
+                    return dates, values
+                blocks = values.reshape(len(dates) // factor, factor, values.shape[1])
+                # NaN-aware Kahan summation in the precision of the data, which gives the same result as pandas
+                total = np.zeros_like(blocks[:, 0])
+                compensation = np.zeros_like(total)
+                count = np.zeros(total.shape, dtype=np.int64)
+                for i in range(factor):
+                    valid = ~np.isnan(blocks[:, i])
+                    y = np.where(valid, blocks[:, i], 0) - compensation
+                    t = total + y
+                    compensation = np.where(valid, (t - total) - y, compensation)
+                    total = np.where(valid, t, total)
+                    count += valid
+                with np.errstate(invalid="ignore"):
+                    # periods without any valid value are NaN
+                    return dates[::factor], (total / count).astype(values.dtype)
+        df_resampled = pd.DataFrame(values, index=dates).resample(freq).mean()
+        return df_resampled.index, df_resampled.values
+
+    def _stack_basin_attributes(self):
+        """Replace the per-basin dictionaries of static data by tensors indexed by the position in `_sample_basins`."""
+        basins = self._sample_basins.tolist()
+        if self._attributes:
+            self._attributes = torch.stack([self._attributes[basin] for basin in basins], dim=0)
+        else:
+            self._attributes = None
+        if self._per_basin_target_stds:
+            self._per_basin_target_stds = torch.stack([self._per_basin_target_stds[basin] for basin in basins], dim=0)
+        else:
+            self._per_basin_target_stds = None
+        self._set_basin_int_ids()
+
+    def _set_basin_int_ids(self):
+        if self.id_to_int:
+            self._basin_int_ids = torch.tensor([self.id_to_int[basin] for basin in self._sample_basins.tolist()],
+                                               dtype=torch.int64)
+
+    def _compact_storage(self):
+        """Convert the inputs to the storage data type and the dates to int32 offsets (see `utils.encode_dates`).
+
+        The quantization error of the normalized inputs is stored in `max_quantization_error` (and logged during
+        training). Targets are kept as float32.
+        """
+        if self._attributes is not None:
+            self._attributes = self._quantize(self._attributes)
+        for freq in self._x_d.keys():
+            self._x_d[freq] = self._quantize(self._x_d[freq])
+            self._dates[freq] = utils.encode_dates(self._dates[freq])
+            if freq in self._x_s:
+                self._x_s[freq] = self._quantize(self._x_s[freq])
+        for segment in self._segments:
+            for segment_data in segment.values():
+                segment_data["x_d"] = self._quantize(segment_data["x_d"])
+                segment_data["dates"] = utils.encode_dates(segment_data["dates"])
+                if "x_s" in segment_data:
+                    segment_data["x_s"] = self._quantize(segment_data["x_s"])
+
+        if self.is_train and self._basin_cache is None:
+            LOGGER.info(f"Stored the inputs as {self.cfg.storage_dtype}. Maximum quantization error of the normalized "
+                        f"inputs: {self.max_quantization_error:.3g}")
+
+    def _quantize(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Convert a float32 tensor to the storage data type and update `max_quantization_error`."""
+        if self._storage_dtype == torch.float32:
+            return tensor
+        compact = tensor.to(self._storage_dtype)
+        if tensor.numel() > 0:
+            error = torch.nan_to_num((compact.to(torch.float32) - tensor).abs(), nan=0.0).max().item()
+            self.max_quantization_error = max(self.max_quantization_error, error)
+        return compact
+
+    def _share_memory(self):
+        """Move all data tensors into shared memory.
+
+        Data loader worker processes then map the same physical memory, regardless of the multiprocessing start method,
+        instead of receiving a private copy of the data.
+        """
+        tensors = [*self._x_d.values(), *self._x_s.values(), *self._y.values()]
+        for segment in self._segments:
+            for segment_data in segment.values():
+                tensors += [values for values in segment_data.values() if isinstance(values, torch.Tensor)]
+        if self._attributes is not None:
+            tensors.append(self._attributes)
+        if self._per_basin_target_stds is not None:
+            tensors.append(self._per_basin_target_stds)
+        if self._basin_int_ids is not None:
+            tensors.append(self._basin_int_ids)
+        for tensor in tensors:
+            tensor.share_memory_()
 
     def _load_hydroatlas_attributes(self):
-        df = utils.load_hydroatlas_attributes(self.cfg.data_dir, basins=self.basins)
+        df = utils.load_hydroatlas_attributes(self.cfg.data_dir,
+                                              basins=self.basins,
+                                              cache_dir=self.cfg.dataset_cache_dir)
 
         # remove all attributes not defined in the config
         drop_cols = [c for c in df.columns if c not in self.cfg.hydroatlas_attributes]
@@ -760,33 +1324,302 @@ class BaseDataset(Dataset):
                 df = (df - self.scaler["attribute_means"]) / self.scaler["attribute_stds"]
 
             # preprocess each basin feature vector as pytorch tensor
-            for basin in self.basins:
-                attributes = df.loc[df.index == basin].values.flatten()
-                self._attributes[basin] = torch.from_numpy(attributes.astype(np.float32))
+            values = df.values.astype(np.float32)
+            basins = set(self.basins)
+            for basin, attributes in zip(df.index, values):
+                if basin in basins:
+                    self._attributes[basin] = torch.from_numpy(attributes)
 
     def _load_data(self):
+        cache_dir = self._get_cache_dir()
+        self._cache_dir = cache_dir
+        if cache_dir is not None and datasetcache.is_cached(cache_dir):
+            if not self._disable_pbar:
+                LOGGER.info(f"Attaching to prepared data set in {cache_dir}")
+            self._attach_cache(cache_dir)
+            attached = True
+        else:
+            self._prepare_data(cache_dir)
+            attached = False
+
+        if self._storage_dtype != torch.float32:
+            # lazily loaded basins are converted to the storage data type when they are loaded
+            self._compact_storage()
+        if self._basin_cache is None:
+            # memory-mapped cache entries are shared between processes anyway, unless they were converted
+            if self.cfg.shared_memory_dataset and (not attached or self._storage_dtype != torch.float32):
+                self._share_memory()
+
+    def _prepare_data(self, cache_dir: Union[Path, None]):
+        """Load, normalize and validate the data set, and store it in the cache if `cache_dir` is not None."""
         # load attributes first to sanity-check those features before doing the compute expensive time series loading
         self._load_combined_attributes()
 
-        xr = self._load_or_create_xarray_dataset()
+        tmp_dir = None
+        if self.cfg.lazy_loading and self.is_train:
+            if cache_dir is not None:
+                # the basin store is prepared as part of the cache entry
+                tmp_dir = datasetcache.create_tmp_dir(cache_dir)
+                store = BasinStore(tmp_dir / "basin_data")
+            else:
+                store = BasinStore(self.cfg.lazy_loading_dir or self.cfg.train_dir / "basin_data")
+            self._load_data_lazily(store)
+        else:
+            xr = self._load_or_create_xarray_dataset()
 
-        if self.cfg.loss.lower() in ["nse", "weightednse"]:
-            # get the std of the discharge for each basin, which is needed for the (weighted) NSE loss.
-            self._calculate_per_basin_std(xr)
+            if self.cfg.loss.lower() in ["nse", "weightednse"]:
+                # get the std of the discharge for each basin, which is needed for the (weighted) NSE loss.
+                self._calculate_per_basin_std(xr)
 
+            if self._compute_scaler:
+                # get feature-wise center and scale values for the feature normalization
+                self._setup_normalization(xr)
+
+            # performs normalization
+            xr = self._normalize_inplace(xr)
+
+            self._create_lookup_table(xr)
+
+        if cache_dir is not None:
+            self._write_cache(cache_dir, tmp_dir)
+
+    def _get_cache_dir(self) -> Union[Path, None]:
+        """Return the folder of this data set in the prepared-data-set cache, or None if the cache is not used."""
+        if self.cfg.dataset_cache_dir is None:
+            return None
+        if self.additional_features and not self.cfg.additional_feature_files:
+            # features that are passed in memory can't be fingerprinted cheaply
+            return None
+        cfg = self.cfg.as_dict()
+        files = [self.cfg.data_dir, getattr(self.cfg, f"per_basin_{self.period}_periods_file")]
+        files += self.cfg.additional_feature_files + [cfg.get("rating_curve_file")]
+        if self.is_train:
+            files.append(self.cfg.train_data_file)
+        key_data = {
+            "version": datasetcache.CACHE_VERSION,
+            "dataset_class": f"{type(self).__module__}.{type(self).__qualname__}",
+            "period": self.period,
+            "is_train": self.is_train,
+            "config": {key: cfg.get(key) for key in datasetcache.DATA_CONFIG_KEYS},
+            "dates": [cfg.get(f"{self.period}_start_date"), cfg.get(f"{self.period}_end_date")],
+            "lazy_loading": self.cfg.lazy_loading and self.is_train,
+            "per_basin_target_stds": self.cfg.loss.lower() in ["nse", "weightednse"],
+            "train_data_file": self.cfg.train_data_file if self.is_train else None,
+            "basins": [str(basin) for basin in self.basins],
+            # a passed scaler (evaluation, finetuning) determines the normalization of the cached data
+            "scaler": None if self._compute_scaler else {key: value.to_dict() for key, value in self.scaler.items()},
+            # the cache directory may be inside the data directory, but its content must not change the key
+            "files": datasetcache.get_files_fingerprint(files, exclude=[self.cfg.dataset_cache_dir]),
+        }
+        return self.cfg.dataset_cache_dir / datasetcache.get_cache_key(key_data)
+
+    def _write_cache(self, cache_dir: Path, tmp_dir: Path = None):
+        """Store the prepared data set in the cache and, if loaded lazily, re-attach the basin store from there."""
+        arrays = {
+            "sample_basins": self._sample_basins,
+            "lookup_basins": self._lookup_basins,
+            "lookup_indices": self._lookup_indices,
+        }
+        if self._attributes is not None:
+            arrays["attributes"] = self._attributes.numpy()
+        if self._per_basin_target_stds is not None:
+            arrays["per_basin_target_stds"] = self._per_basin_target_stds.numpy()
+        if self._basin_store is None:
+            for freq in self.frequencies:
+                arrays[f"x_d_{freq}"] = self._x_d[freq].numpy()
+                arrays[f"y_{freq}"] = self._y[freq].numpy()
+                arrays[f"dates_{freq}"] = self._dates[freq]
+                arrays[f"offsets_{freq}"] = self._basin_offsets[freq]
+                if freq in self._x_s:
+                    arrays[f"x_s_{freq}"] = self._x_s[freq].numpy()
+        meta = {
+            "frequencies": self.frequencies,
+            "x_d_columns": self._x_d_columns,
+            "period_starts": self.period_starts,
+            "scaler": dict(self.scaler),
+            "lazy_loading": self._basin_store is not None,
+        }
+        datasetcache.write_cache(cache_dir, arrays, meta, tmp_dir=tmp_dir)
+        if self._basin_store is not None:
+            self._basin_store = BasinStore(cache_dir / "basin_data")
+
+    def _attach_cache(self, cache_dir: Path):
+        """Attach to a prepared data set in the cache, without reading the (memory-mapped) data into memory."""
+        arrays, meta = datasetcache.read_cache(cache_dir)
+        self._mapped_data_ptrs = {_get_data_ptr(values) for values in arrays.values() if values.size > 0}
+        self.frequencies = meta["frequencies"]
+        self._x_d_columns = meta["x_d_columns"]
+        self.period_starts = meta["period_starts"]
         if self._compute_scaler:
-            # get feature-wise center and scale values for the feature normalization
-            self._setup_normalization(xr)
+            self.scaler.update(meta["scaler"])
+
+        self._sample_basins = np.asarray(arrays["sample_basins"])
+        self._lookup_basins = arrays["lookup_basins"]
+        self._lookup_indices = arrays["lookup_indices"]
+        self.num_samples = len(self._lookup_basins)
+        self._attributes = torch.from_numpy(arrays["attributes"]) if "attributes" in arrays else None
+        if "per_basin_target_stds" in arrays:
+            self._per_basin_target_stds = torch.from_numpy(arrays["per_basin_target_stds"])
+        else:
+            self._per_basin_target_stds = None
+        self._set_basin_int_ids()
+
+        if meta["lazy_loading"]:
+            self._setup_basin_cache(BasinStore(cache_dir / "basin_data"))
+        else:
+            for freq in self.frequencies:
+                self._x_d[freq] = torch.from_numpy(arrays[f"x_d_{freq}"])
+                self._y[freq] = torch.from_numpy(arrays[f"y_{freq}"])
+                self._dates[freq] = arrays[f"dates_{freq}"]
+                self._basin_offsets[freq] = arrays[f"offsets_{freq}"]
+                if f"x_s_{freq}" in arrays:
+                    self._x_s[freq] = torch.from_numpy(arrays[f"x_s_{freq}"])
+
+            segments = datasetcache.read_segments(cache_dir)
+            if segments:
+                self._mapped_data_ptrs |= {
+                    _get_data_ptr(values) for arrays in segments for values in arrays.values() if values.size > 0
+                }
+                self._add_segments(segments)
+
+    def _load_data_lazily(self, store: BasinStore):
+        """Prepare the data basin by basin in a `BasinStore` and set up the on-demand loading of the basin arrays.
+
+        Only the data of a single basin is held in memory at any time during the preparation. The per-basin arrays are
+        stored without normalization, which is applied when a basin is loaded into the basin cache.
+        """
+        if self.cfg.train_data_file is not None:
+            raise ValueError("Lazy loading cannot be combined with a train_data_file.")
+
+        keep_cols = self._get_keep_cols()
+        moments, medians = self._init_feature_statistics(keep_cols)
+        compute_target_stds = self.cfg.loss.lower() in ["nse", "weightednse"]
+        nan_basins = []
+
+        if not self._disable_pbar:
+            LOGGER.info(f"Preparing basin data in {store.root}")
+        written_basins = []
+        for basin in tqdm(self.basins, file=sys.stdout, disable=self._disable_pbar):
+            df = self._load_basin_dataframe(basin, keep_cols)
+            if df is None:
+                continue
+
+            if self._compute_scaler:
+                for feature in keep_cols:
+                    moments[feature].update(df[feature].values)
+                    if feature in medians:
+                        medians[feature].update(df[feature].values)
+
+            x_d, x_s, y, dates, valid_indices = self._prepare_basin_samples(
+                basin, df.index, {col: df[col].values for col in df.columns})
+            if compute_target_stds:
+                self._per_basin_target_stds[basin] = self._get_target_stds(df[self.cfg.target_variables].values.T)
+                if torch.isnan(self._per_basin_target_stds[basin]).all():
+                    nan_basins.append(basin)
+
+            arrays = {}
+            for freq in self.frequencies:
+                arrays[f"x_d_{freq}"] = x_d[freq]
+                arrays[f"y_{freq}"] = y[freq]
+                arrays[f"dates_{freq}"] = dates[freq]
+                if x_s:
+                    arrays[f"x_s_{freq}"] = x_s[freq]
+            store.write_basin(basin, arrays, valid_indices)
+            written_basins.append(basin)
 
-        # performs normalization
-        xr = (xr - self.scaler["xarray_feature_center"]) / self.scaler["xarray_feature_scale"]
+        if nan_basins:
+            LOGGER.warning(
+                "The following basins had not enough valid target values to calculate a standard deviation: "
+                f"{', '.join(nan_basins)}. NSE loss values for this basin will be NaN."
+            )
 
-        self._create_lookup_table(xr)
+        if self._compute_scaler:
+            self._set_scaler_from_statistics(moments, medians)
+
+        self._attach_basin_store(store, written_basins)
+
+    def _attach_basin_store(self, store: BasinStore, basins: List[str]):
+        """Build the lookup table from the valid-index files of a `BasinStore` and set up the basin cache."""
+        lookup_basins, lookup_indices, sample_basins, basins_without_samples = [], [], [], []
+        for basin in basins:
+            valid_indices = store.read_valid_indices(basin)
+            if len(valid_indices) > 0:
+                lookup_basins.append(np.full(len(valid_indices), len(sample_basins), dtype=np.int64))
+                lookup_indices.append(valid_indices)
+                sample_basins.append(basin)
+            else:
+                basins_without_samples.append(basin)
+        self._set_lookup_table(sample_basins, lookup_basins, lookup_indices, basins_without_samples)
+        self._stack_basin_attributes()
+        self._setup_basin_cache(store)
+
+    def _setup_basin_cache(self, store: BasinStore):
+        """Set up the normalization and on-demand loading of the basin arrays of the sample basins from `store`."""
+        # center and scale of all stored columns, to normalize the basin arrays when they are loaded
+        center, scale = self.scaler["xarray_feature_center"], self.scaler["xarray_feature_scale"]
+        columns = {"y": self.cfg.target_variables, "x_s": self.cfg.evolving_attributes}
+        for freq in self.frequencies:
+            columns["x_d"] = self._x_d_columns[freq]
+            self._feature_normalization[freq] = {
+                key: (np.array([center[c].values for c in cols], dtype=np.float32),
+                      np.array([scale[c].values for c in cols], dtype=np.float32))
+                for key, cols in columns.items() if cols
+            }
+
+        self._basin_store = store
+        self._basin_nbytes = np.array(
+            [store.get_nbytes(basin, self._get_stored_array_names()) for basin in self._sample_basins.tolist()])
+        self._basin_cache = LRUCache(max_bytes=int(self.cfg.lazy_loading_cache_mb * 1024**2),
+                                     load_fn=self._load_basin_arrays)
+
+    def _get_stored_array_names(self) -> List[str]:
+        keys = ["x_d", "y", "dates"] + (["x_s"] if self.cfg.evolving_attributes else [])
+        return [f"{key}_{freq}" for freq in self.frequencies for key in keys]
+
+    def _load_basin_arrays(self, basin_idx: int) -> Dict[str, Dict[str, Union[torch.Tensor, np.ndarray]]]:
+        """Read the arrays of one basin from the basin store and normalize them."""
+        arrays = self._basin_store.read_basin(str(self._sample_basins[basin_idx]), self._get_stored_array_names())
+        basin_data = {}
+        for freq in self.frequencies:
+            basin_data[freq] = {"dates": arrays[f"dates_{freq}"]}
+            for key, (center, scale) in self._feature_normalization[freq].items():
+                basin_data[freq][key] = torch.from_numpy((arrays[f"{key}_{freq}"] - center) / scale)
+                if key != "y":
+                    basin_data[freq][key] = self._quantize(basin_data[freq][key])
+            if self._storage_dtype != torch.float32:
+                basin_data[freq]["dates"] = utils.encode_dates(basin_data[freq]["dates"])
+        return basin_data
 
     def _setup_normalization(self, xr: xarray.Dataset):
+        # compute all statistics in a single pass over the basins, without full-size temporary arrays
+        moments, medians = self._init_feature_statistics(list(xr.data_vars))
+        for feature in xr.data_vars:
+            for basin_values in self._iterate_basins(xr[feature]):
+                moments[feature].update(basin_values)
+                if feature in medians:
+                    medians[feature].update(basin_values)
+
+        self._set_scaler_from_statistics(moments, medians)
+
+    def _init_feature_statistics(self, features: List[str]) -> Tuple[Dict[str, RunningMoments], Dict[str, P2Quantile]]:
+        """Create the streaming estimators of the statistics that are needed for the feature normalization."""
+        # features for which a streaming estimate of the median is needed
+        median_features = [
+            feature for feature, feature_specs in self.cfg.custom_normalization.items()
+            if isinstance(feature_specs.get("centering"), str) and feature_specs["centering"].lower() == "median"
+        ]
+        moments = {feature: RunningMoments() for feature in features}
+        medians = {feature: P2Quantile(0.5) for feature in median_features if feature in features}
+        return moments, medians
+
+    def _set_scaler_from_statistics(self, moments: Dict[str, RunningMoments], medians: Dict[str, P2Quantile]):
+
+        def _to_dataset(values: Dict[str, float]) -> xarray.Dataset:
+            return xarray.Dataset({feature: ((), np.float32(value)) for feature, value in values.items()})
+
         # default center and scale values are feature mean and std
-        self.scaler["xarray_feature_scale"] = xr.std(skipna=True)
-        self.scaler["xarray_feature_center"] = xr.mean(skipna=True)
+        self.scaler["xarray_feature_scale"] = _to_dataset({f: m.std for f, m in moments.items()})
+        self.scaler["xarray_feature_center"] = _to_dataset({f: m.mean for f, m in moments.items()})
 
         # check for feature-wise custom normalization
         for feature, feature_specs in self.cfg.custom_normalization.items():
@@ -796,9 +1629,9 @@ class BaseDataset(Dataset):
                     if (val is None) or (val.lower() == "none"):
                         self.scaler["xarray_feature_center"][feature] = np.float32(0.0)
                     elif val.lower() == "median":
-                        self.scaler["xarray_feature_center"][feature] = xr[feature].median(skipna=True)
+                        self.scaler["xarray_feature_center"][feature] = np.float32(medians[feature].value)
                     elif val.lower() == "min":
-                        self.scaler["xarray_feature_center"][feature] = xr[feature].min(skipna=True)
+                        self.scaler["xarray_feature_center"][feature] = np.float32(moments[feature].min)
                     elif val.lower() == "mean":
                         # Do nothing, since this is the default
                         pass
@@ -810,7 +1643,8 @@ class BaseDataset(Dataset):
                     if (val is None) or (val.lower() == "none"):
                         self.scaler["xarray_feature_scale"][feature] = np.float32(1.0)
                     elif val == "minmax":
-                        self.scaler["xarray_feature_scale"][feature] = xr[feature].max(skipna=True) - xr[feature].min(skipna=True)
+                        self.scaler["xarray_feature_scale"][feature] = np.float32(moments[feature].max -
+                                                                                  moments[feature].min)
                     elif val == "std":
                         # Do nothing, since this is the default
                         pass
@@ -820,6 +1654,29 @@ class BaseDataset(Dataset):
                     # raise ValueError to point to the correct argument names
                     raise ValueError("Unknown dict key. Use 'centering' and/or 'scaling' for each feature.")
 
+    def _normalize_inplace(self, xr: xarray.Dataset) -> xarray.Dataset:
+        """Normalize all features with the scaler, overwriting the data of `xr` one basin at a time."""
+        center, scale = self.scaler["xarray_feature_center"], self.scaler["xarray_feature_scale"]
+        # features without center or scale are removed, as the xarray arithmetic would do.
+        xr = xr[[feature for feature in xr.data_vars if feature in center and feature in scale]]
+        for feature in list(xr.data_vars):
+            # cast once to the float32 data type of the data set (which also avoids truncating integer columns), and
+            # load lazily backed data, such that the values can be overwritten in place
+            xr[feature] = xr[feature].astype(np.float32, copy=False).load()
+            feature_center, feature_scale = center[feature].values, scale[feature].values
+            for basin_values in self._iterate_basins(xr[feature]):
+                basin_values[...] = (basin_values - feature_center) / feature_scale
+        return xr
+
+    @staticmethod
+    def _iterate_basins(da: xarray.DataArray):
+        """Yield writable views on the per-basin values of `da`."""
+        values = da.values
+        if "basin" not in da.dims:
+            yield values
+        else:
+            yield from np.moveaxis(values, da.get_axis_num("basin"), 0)
+
     def get_period_start(self, basin: str) -> pd.Timestamp:
         """Return the first date in the period for a given basin
 
@@ -883,6 +1740,49 @@ class BaseDataset(Dataset):
         return batch
 
 
+class BasinGroupedSampler(Sampler):
+    """Random sampler that yields the samples of groups of basins one group after another.
+
+    In each epoch, the basins are shuffled and split into groups whose arrays fit into the memory budget of the basin
+    cache. The samples of each group are shuffled and yielded before the samples of the next group, such that the basins
+    of a group are loaded from disk only once per epoch (and per data loader worker).
+
+    Parameters
+    ----------
+    sample_basins : np.ndarray
+        Array that contains for each sample the index of its basin.
+    basin_nbytes : np.ndarray
+        Size (in bytes) of the arrays of each basin.
+    max_group_nbytes : int
+        Memory budget of a group of basins in bytes. Each group contains at least one basin.
+    """
+
+    def __init__(self, sample_basins: np.ndarray, basin_nbytes: np.ndarray, max_group_nbytes: int):
+        self._basin_nbytes = basin_nbytes
+        self._max_group_nbytes = max_group_nbytes
+        self._num_samples = len(sample_basins)
+        order = np.argsort(sample_basins, kind="stable")
+        self._basin_samples = np.split(order, np.cumsum(np.bincount(sample_basins, minlength=len(basin_nbytes)))[:-1])
+
+    def __len__(self) -> int:
+        return self._num_samples
+
+    def __iter__(self):
+        group, group_nbytes = [], 0
+        for basin in torch.randperm(len(self._basin_nbytes)).tolist():
+            if group and group_nbytes + self._basin_nbytes[basin] > self._max_group_nbytes:
+                yield from self._shuffled_samples(group)
+                group, group_nbytes = [], 0
+            group.append(basin)
+            group_nbytes += self._basin_nbytes[basin]
+        if group:
+            yield from self._shuffled_samples(group)
+
+    def _shuffled_samples(self, basins: List[int]) -> List[int]:
+        samples = np.concatenate([self._basin_samples[basin] for basin in basins])
+        return samples[torch.randperm(len(samples)).numpy()].tolist()
+
+
 @njit()
 def _validate_samples(
     x_d: List[np.ndarray],
@@ -949,3 +1849,10 @@ def _validate_samples(
                     flag[j] = 0
 
     return flag
+
+
+def _get_data_ptr(values: Union[np.ndarray, torch.Tensor]) -> int:
+    """Return the address of the first element of an array or tensor."""
+    if isinstance(values, torch.Tensor):
+        return values.data_ptr()
+    return values.__array_interface__["data"][0]
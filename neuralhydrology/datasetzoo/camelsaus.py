@@ -7,6 +7,7 @@ import xarray
 from tqdm import tqdm
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -72,7 +73,7 @@ class CamelsAUS(BaseDataset):
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load static catchment attributes."""
-        return load_camels_aus_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_camels_aus_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
 def load_camels_aus_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
@@ -108,6 +109,7 @@ def load_camels_aus_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
     return df
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'CAMELS_AUS_Attributes&Indices_MasterTable.csv'])
 def load_camels_aus_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS-AUS attributes.
 
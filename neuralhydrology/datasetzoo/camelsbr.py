@@ -6,6 +6,7 @@ import xarray
 from tqdm import tqdm
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 _CAMELS_BR_TIMESERIES_SUBDIRS = [
@@ -84,7 +85,7 @@ class CamelsBR(BaseDataset):
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load static catchment attributes."""
-        return load_camels_br_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_camels_br_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
 def load_camels_br_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
@@ -120,6 +121,7 @@ def load_camels_br_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
     return df
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / '01_CAMELS_BR_attributes'])
 def load_camels_br_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS-BR attributes.
 
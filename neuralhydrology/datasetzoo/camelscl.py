@@ -8,6 +8,7 @@ import xarray
 from tqdm import tqdm
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -74,7 +75,7 @@ class CamelsCL(BaseDataset):
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load static catchment attributes."""
-        return load_camels_cl_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_camels_cl_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
 def load_camels_cl_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
@@ -110,6 +111,7 @@ def load_camels_cl_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
     return df
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / '1_CAMELScl_attributes.txt'])
 def load_camels_cl_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS CL attributes
 
@@ -5,6 +5,7 @@ import pandas as pd
 import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -65,9 +66,10 @@ class CamelsDE(BaseDataset):
         return load_camels_de_timeseries(data_dir=self.cfg.data_dir, basin=basin)
 
     def _load_attributes(self) -> pd.DataFrame:
-        return load_camels_de_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_camels_de_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'attributes'])
 def load_camels_de_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS DE attributes from the dataset provided by [#]_
 
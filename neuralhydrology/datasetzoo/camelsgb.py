@@ -5,6 +5,7 @@ import pandas as pd
 import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -67,9 +68,10 @@ class CamelsGB(BaseDataset):
         return df
 
     def _load_attributes(self) -> pd.DataFrame:
-        return load_camels_gb_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_camels_gb_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'attributes'])
 def load_camels_gb_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS GB attributes from the dataset provided by [#]_
 
@@ -8,6 +8,7 @@ from tqdm import tqdm
 import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 class CamelsIND(BaseDataset):
@@ -86,7 +87,9 @@ class CamelsIND(BaseDataset):
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load static catchment attributes."""
-        return load_camels_ind_attributes(data_dir=self.cfg.data_dir, basins=self.basins)
+        return load_camels_ind_attributes(data_dir=self.cfg.data_dir,
+                                          basins=self.basins,
+                                          cache_dir=self.cfg.dataset_cache_dir)
 
 
 def load_camels_ind_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
@@ -117,6 +120,7 @@ def load_camels_ind_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
     return df
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'attributes.csv'])
 def load_camels_ind_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS IND attributes
 
@@ -6,6 +6,7 @@ import pandas as pd
 import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -89,9 +90,10 @@ class CamelsUS(BaseDataset):
         return df
 
     def _load_attributes(self) -> pd.DataFrame:
-        return load_camels_us_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_camels_us_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'camels_attributes_v2.0'])
 def load_camels_us_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load CAMELS US attributes from the dataset provided by [#]_
 
@@ -5,6 +5,8 @@ import pandas as pd
 import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.columnarstore import has_columnar_timeseries, read_columnar_timeseries
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -62,19 +64,33 @@ class Caravan(BaseDataset):
                                       scaler=scaler)
 
     def _load_basin_data(self, basin: str) -> pd.DataFrame:
-        """Load timeseries data from netcdf files."""
-        return load_caravan_timeseries(data_dir=self.cfg.data_dir, basin=basin)
+        """Load timeseries data from netcdf files (or their columnar binary copy, if it exists)."""
+        columnar_dir = get_caravan_timeseries_path(self.cfg.data_dir, basin, "npy")
+        filetype = "npy" if has_columnar_timeseries(columnar_dir) else "netcdf"
+        start_date, end_date = self._get_required_date_range(basin)
+        return load_caravan_timeseries(data_dir=self.cfg.data_dir,
+                                       basin=basin,
+                                       filetype=filetype,
+                                       columns=self._get_required_columns(),
+                                       start_date=start_date,
+                                       end_date=end_date)
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load input and output data from text files."""
-        return load_caravan_attributes(data_dir=self.cfg.data_dir, basins=self.basins)
+        return load_caravan_attributes(data_dir=self.cfg.data_dir,
+                                       basins=self.basins,
+                                       cache_dir=self.cfg.dataset_cache_dir)
 
 
 def load_caravan_attributes(data_dir: Path,
                             basins: Optional[List[str]] = None,
-                            subdataset: Optional[str] = None) -> pd.DataFrame:
+                            subdataset: Optional[str] = None,
+                            cache_dir: Optional[Path] = None) -> pd.DataFrame:
     """Load the attributes of the Caravan dataset.
 
+    The attribute table of each sub-dataset is parsed only once per process (see
+    `datasetcache.cached_attribute_table`).
+
     Parameters
     ----------
     data_dir : Path
@@ -86,6 +102,9 @@ def load_caravan_attributes(data_dir: Path,
     subdataset : str, optional
         If passed, returns only the attributes of one sub-dataset. Otherwise, the attributes of all sub-datasets are 
         loaded.
+    cache_dir : Path, optional
+        If passed (e.g., the `dataset_cache_dir`), the attribute tables of the sub-datasets are also stored in this
+        folder and re-used by other processes.
 
     Raises
     ------
@@ -131,7 +150,7 @@ def load_caravan_attributes(data_dir: Path,
     # Load all required attribute files.
     dfs = []
     for subdataset_dir in subdataset_dirs:
-        dfs.append(_load_attribute_files_of_subdataset(subdataset_dir))
+        dfs.append(_load_subdataset_attributes(data_dir, subdataset_dir.name, cache_dir=cache_dir))
 
     # Merge all DataFrames along the basin index.
     df = pd.concat(dfs, axis=0)
@@ -145,51 +164,110 @@ def load_caravan_attributes(data_dir: Path,
     return df
 
 
-def load_caravan_timeseries(data_dir: Path, basin: str, filetype: str = "netcdf") -> pd.DataFrame:
+def load_caravan_timeseries(data_dir: Path,
+                            basin: str,
+                            filetype: str = "netcdf",
+                            columns: Optional[List[str]] = None,
+                            start_date: Optional[pd.Timestamp] = None,
+                            end_date: Optional[pd.Timestamp] = None) -> pd.DataFrame:
     """Loads the timeseries data of one basin from the Caravan dataset.
     
     Parameters
     ----------
     data_dir : Path
         Path to the root directory of Caravan that has to include a sub-directory called 'timeseries'. This 
-        sub-directory has to contain another sub-directory called either 'csv' or 'netcdf', depending on the choice 
-        of the filetype argument. By default, netCDF files are loaded from the 'netcdf' subdirectory.
+        sub-directory has to contain another sub-directory called either 'csv', 'netcdf' or 'npy', depending on the
+        choice of the filetype argument. By default, netCDF files are loaded from the 'netcdf' subdirectory.
     basin : str
         The Caravan gauge id string in the form of {subdataset_name}_{gauge_id}.
     filetype : str, optional
-        Can be either 'csv' or 'netcdf'. Depending on this value, this function will load the timeseries data from the
-        netcdf files (default) or csv files.
+        Can be either 'csv', 'netcdf' or 'npy'. Depending on this value, this function will load the timeseries data
+        from the netcdf files (default), csv files, or the columnar binary layout (see
+        `neuralhydrology.datautils.columnarstore`) that can be created with the ``nh-convert-timeseries`` command.
+    columns : List[str], optional
+        If passed, only these columns are loaded. Columns that do not exist in the data are ignored.
+    start_date : pd.Timestamp, optional
+        If passed, only time steps from this date on are loaded.
+    end_date : pd.Timestamp, optional
+        If passed, only time steps until this date (inclusive) are loaded.
 
     Raises
     ------
     ValueError
-        If filetype is not in ['csv', 'netcdf'].
+        If filetype is not in ['csv', 'netcdf', 'npy'].
     FileNotFoundError
         If no timeseries file exists for the basin.
     """
-    # Get the subdataset name from the basin string.
-    subdataset_name = basin.split('_')[0]
+    filepath = get_caravan_timeseries_path(data_dir, basin, filetype)
 
-    if filetype == "netcdf":
-        filepath = data_dir / "timeseries" / "netcdf" / subdataset_name / f"{basin}.nc"
-    elif filetype == "csv":
-        filepath = data_dir / "timeseries" / "csv" / subdataset_name / f"{basin}.csv"
-    else:
-        raise ValueError("filetype has to be either 'csv' or 'netcdf'.")
+    # Load timeseries data.
+    if filetype == "npy":
+        if not has_columnar_timeseries(filepath):
+            raise FileNotFoundError(f"No basin folder found at {filepath}.")
+        return read_columnar_timeseries(filepath, columns=columns, start_date=start_date, end_date=end_date)
 
     if not filepath.is_file():
         raise FileNotFoundError(f"No basin file found at {filepath}.")
 
-    # Load timeseries data.
     if filetype == "netcdf":
-        df = xarray.open_dataset(filepath).to_dataframe()
+        with xarray.open_dataset(filepath) as xr:
+            # select the variables before converting to a DataFrame, so that only the needed data is read from disk
+            if columns is not None:
+                xr = xr[[var for var in xr.data_vars if var in columns]]
+            if start_date is not None or end_date is not None:
+                xr = xr.sel(date=slice(start_date, end_date))
+            df = xr.to_dataframe()
     else:
-        df = pd.read_csv(filepath, parse_dates=['date'])
+        usecols = None if columns is None else lambda col: col == 'date' or col in columns
+        df = pd.read_csv(filepath, usecols=usecols, parse_dates=['date'])
         df = df.set_index('date')
+        if start_date is not None or end_date is not None:
+            df = df.loc[start_date:end_date]
 
     return df
 
 
+def get_caravan_timeseries_path(data_dir: Path, basin: str, filetype: str = "netcdf") -> Path:
+    """Return the path to the timeseries data of one basin from the Caravan dataset.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Path to the root directory of Caravan that has to include a sub-directory called 'timeseries'.
+    basin : str
+        The Caravan gauge id string in the form of {subdataset_name}_{gauge_id}.
+    filetype : str, optional
+        Can be either 'csv', 'netcdf' or 'npy'.
+
+    Returns
+    -------
+    Path
+        Path to the csv or netCDF file, or to the folder of the columnar binary layout of the basin.
+
+    Raises
+    ------
+    ValueError
+        If filetype is not in ['csv', 'netcdf', 'npy'].
+    """
+    # Get the subdataset name from the basin string.
+    subdataset_name = basin.split('_')[0]
+
+    if filetype == "netcdf":
+        return data_dir / "timeseries" / "netcdf" / subdataset_name / f"{basin}.nc"
+    elif filetype == "csv":
+        return data_dir / "timeseries" / "csv" / subdataset_name / f"{basin}.csv"
+    elif filetype == "npy":
+        return data_dir / "timeseries" / "npy" / subdataset_name / basin
+    else:
+        raise ValueError("filetype has to be either 'csv', 'netcdf' or 'npy'.")
+
+
+@cached_attribute_table(lambda data_dir, subdataset: [Path(data_dir) / 'attributes' / subdataset])
+def _load_subdataset_attributes(data_dir: Path, subdataset: str, basins: Optional[List[str]] = None) -> pd.DataFrame:
+    """Loads the attributes of all basins of one subdataset. `basins` is handled by `cached_attribute_table`."""
+    return _load_attribute_files_of_subdataset(Path(data_dir) / "attributes" / subdataset)
+
+
 def _load_attribute_files_of_subdataset(subdataset_dir: Path) -> pd.DataFrame:
     """Loads all attribute files for one subdataset and merges them into one DataFrame."""
     dfs = []
@@ -7,6 +7,8 @@ import pandas as pd
 import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datautils.columnarstore import has_columnar_timeseries, read_columnar_timeseries
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 
@@ -20,6 +22,11 @@ class GenericDataset(BaseDataset):
     be divided into groups of basins or groups of features (but not both, see `genericdataset.load_attributes` for
     more details).
 
+    Alternatively to the netCDF files, the time series can be stored in a columnar binary layout in a folder
+    'time_series_npy' (one subfolder per basin, see `neuralhydrology.datautils.columnarstore`), which can be created
+    once with the ``nh-convert-timeseries`` command. If this folder exists for a basin, only the needed columns and
+    time steps are read from it.
+
     Note: Invalid values have to be marked as NaN (e.g. using NumPy's np.nan) in the netCDF files and not something like
     -999 for invalid discharge measurements, which is often found in hydrology datasets. If missing values are not 
     marked as NaN's, the GenericDataset will not be able to identify these values as missing data points.
@@ -68,15 +75,21 @@ class GenericDataset(BaseDataset):
 
     def _load_basin_data(self, basin: str) -> pd.DataFrame:
         """Load input and output data. """
-        df = load_timeseries(data_dir=self.cfg.data_dir, basin=basin)
+        start_date, end_date = self._get_required_date_range(basin)
+        df = load_timeseries(data_dir=self.cfg.data_dir,
+                             basin=basin,
+                             columns=self._get_required_columns(),
+                             start_date=start_date,
+                             end_date=end_date)
 
         return df
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load static catchment attributes."""
-        return load_attributes(self.cfg.data_dir, basins=self.basins)
+        return load_attributes(self.cfg.data_dir, basins=self.basins, cache_dir=self.cfg.dataset_cache_dir)
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'attributes'])
 def load_attributes(data_dir: Path, basins: List[str] = None) -> pd.DataFrame:
     """Load static attributes.
 
@@ -152,22 +165,70 @@ def load_attributes(data_dir: Path, basins: List[str] = None) -> pd.DataFrame:
     return df
 
 
-def load_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
-    """Load time series data from netCDF files into pandas DataFrame.
+def load_timeseries(data_dir: Path,
+                    basin: str,
+                    columns: List[str] = None,
+                    start_date: pd.Timestamp = None,
+                    end_date: pd.Timestamp = None) -> pd.DataFrame:
+    """Load time series data from netCDF files (or their columnar binary copy) into pandas DataFrame.
 
     Parameters
     ----------
     data_dir : Path
         Path to the data directory. This folder must contain a folder called 'time_series' containing the time series
-        data for each basin as a single time-indexed netCDF file called '<basin_id>.nc/nc4'.
+        data for each basin as a single time-indexed netCDF file called '<basin_id>.nc/nc4', or a folder
+        'time_series_npy' with the time series of each basin in the columnar binary layout (see
+        `neuralhydrology.datautils.columnarstore`), which is preferred if it exists.
     basin : str
         The basin identifier.
+    columns : List[str], optional
+        If passed, only these columns are loaded. Columns that do not exist in the data are ignored.
+    start_date : pd.Timestamp, optional
+        If passed, only time steps from this date on are loaded.
+    end_date : pd.Timestamp, optional
+        If passed, only time steps until this date (inclusive) are loaded.
 
     Returns
     -------
     pd.DataFrame
         Time-indexed DataFrame containing the time series data as stored in the netCDF file.
 
+    Raises
+    ------
+    FileNotFoundError
+        If no netCDF file exists for the specified basin.
+    ValueError
+        If more than one netCDF file is found for the specified basin.
+    """
+    columnar_dir = data_dir / "time_series_npy" / basin
+    if has_columnar_timeseries(columnar_dir):
+        return read_columnar_timeseries(columnar_dir, columns=columns, start_date=start_date, end_date=end_date)
+
+    netcdf_file = get_timeseries_file(data_dir, basin)
+    with xarray.open_dataset(netcdf_file) as xr:
+        # select the variables before converting to a DataFrame, so that only the needed data is read from disk
+        if columns is not None:
+            xr = xr[[var for var in xr.data_vars if var in columns]]
+        if start_date is not None or end_date is not None:
+            xr = xr.sel(date=slice(start_date, end_date))
+        return xr.to_dataframe()
+
+
+def get_timeseries_file(data_dir: Path, basin: str) -> Path:
+    """Return the netCDF file of a basin.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Path to the data directory, which must contain a folder called 'time_series' with one netCDF file per basin.
+    basin : str
+        The basin identifier.
+
+    Returns
+    -------
+    Path
+        Path to the netCDF file '<basin_id>.nc/nc4' of the basin.
+
     Raises
     ------
     FileNotFoundError
@@ -176,13 +237,9 @@ def load_timeseries(data_dir: Path, basin: str) -> pd.DataFrame:
         If more than one netCDF file is found for the specified basin.
     """
     files_dir = data_dir / "time_series"
-    netcdf_files = list(files_dir.glob("*.nc4"))
-    netcdf_files.extend(files_dir.glob("*.nc"))
-    netcdf_file = [f for f in netcdf_files if f.stem == basin]
+    netcdf_file = [f for f in [files_dir / f"{basin}.nc4", files_dir / f"{basin}.nc"] if f.is_file()]
     if len(netcdf_file) == 0:
         raise FileNotFoundError(f"No netCDF file found for basin {basin} in {files_dir}")
     if len(netcdf_file) > 1:
         raise ValueError(f"Multiple netCDF files found for basin {basin} in {files_dir}")
-
-    xr = xarray.open_dataset(netcdf_file[0])
-    return xr.to_dataframe()
+    return netcdf_file[0]
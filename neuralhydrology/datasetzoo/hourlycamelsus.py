@@ -1,16 +1,23 @@
 import logging
+import os
 import pickle
+import sys
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
 import xarray
+from tqdm import tqdm
 
 from neuralhydrology.datasetzoo import camelsus
 from neuralhydrology.utils.config import Config
 
 LOGGER = logging.getLogger(__name__)
 
+# open netCDF files of the current process, see `get_hourly_us_netcdf`
+_NETCDF_HANDLES: Dict[Tuple[int, str], 'HourlyNetCDF'] = {}
+
 
 class HourlyCamelsUS(camelsus.CamelsUS):
     """Data set class providing hourly data for CAMELS US basins.
@@ -52,7 +59,6 @@ class HourlyCamelsUS(camelsus.CamelsUS):
                  additional_features: list = [],
                  id_to_int: dict = {},
                  scaler: dict = {}):
-        self._netcdf_datasets = {}  # if available, we remember the dataset to load faster
         self._warn_slow_loading = True
         super(HourlyCamelsUS, self).__init__(cfg=cfg,
                                              is_train=is_train,
@@ -68,9 +74,15 @@ class HourlyCamelsUS(camelsus.CamelsUS):
         dfs = []
         if not any(f.endswith('_hourly') for f in self.cfg.forcings):
             raise ValueError('Forcings include no hourly forcings set.')
+        required_columns = self._get_required_columns()
+        start_date, end_date = self._get_required_date_range(basin)
         for forcing in self.cfg.forcings:
             if forcing[-7:] == '_hourly':
-                df = self.load_hourly_data(basin, forcing)
+                # columns of this forcing product, before they are renamed below
+                columns = required_columns + [
+                    col[:-len(forcing) - 1] for col in required_columns if col.endswith(f"_{forcing}")
+                ]
+                df = self.load_hourly_data(basin, forcing, columns=columns, start_date=start_date, end_date=end_date)
             else:
                 # load daily CAMELS forcings and upsample to hourly
                 df, _ = camelsus.load_camels_us_forcings(self.cfg.data_dir, basin, forcing)
@@ -112,7 +124,9 @@ class HourlyCamelsUS(camelsus.CamelsUS):
 
         # convert discharge to 'synthetic' stage, if requested
         if 'synthetic_qobs_stage_meters' in self.cfg.target_variables:
-            attributes = camelsus.load_camels_us_attributes(data_dir=self.cfg.data_dir, basins=[basin])
+            attributes = camelsus.load_camels_us_attributes(data_dir=self.cfg.data_dir,
+                                                            basins=[basin],
+                                                            cache_dir=self.cfg.dataset_cache_dir)
             with open(self.cfg.rating_curve_file, 'rb') as f:
                 rating_curves = pickle.load(f)
             df['synthetic_qobs_stage_meters'] = np.nan
@@ -122,7 +136,12 @@ class HourlyCamelsUS(camelsus.CamelsUS):
 
         return df
 
-    def load_hourly_data(self, basin: str, forcings: str) -> pd.DataFrame:
+    def load_hourly_data(self,
+                         basin: str,
+                         forcings: str,
+                         columns: List[str] = None,
+                         start_date: pd.Timestamp = None,
+                         end_date: pd.Timestamp = None) -> pd.DataFrame:
         """Load a single set of hourly forcings and discharge. If available, loads from NetCDF, else from csv.
         
         Parameters
@@ -131,6 +150,12 @@ class HourlyCamelsUS(camelsus.CamelsUS):
             Identifier of the basin for which to load data.
         forcings : str
             Name of the forcings set to load.
+        columns : List[str], optional
+            If passed, only these columns (and all discharge columns) are read from the NetCDF file.
+        start_date : pd.Timestamp, optional
+            If passed, only time steps from this date on are read from the NetCDF file.
+        end_date : pd.Timestamp, optional
+            If passed, only time steps until this date (inclusive) are read from the NetCDF file.
 
         Returns
         -------
@@ -139,9 +164,10 @@ class HourlyCamelsUS(camelsus.CamelsUS):
         """
         fallback_csv = False
         try:
-            if forcings not in self._netcdf_datasets.keys():
-                self._netcdf_datasets[forcings] = load_hourly_us_netcdf(self.cfg.data_dir, forcings)
-            df = self._netcdf_datasets[forcings].sel(basin=basin).to_dataframe()
+            netcdf = get_hourly_us_netcdf(self.cfg.data_dir, forcings)
+            if columns is not None:
+                columns = columns + [var for var in netcdf.variables if 'qobs' in var.lower()]
+            df = netcdf.load_basin(basin, columns=columns, start_date=start_date, end_date=end_date)
         except FileNotFoundError:
             fallback_csv = True
             if self._warn_slow_loading:
@@ -293,8 +319,137 @@ def load_hourly_us_netcdf(data_dir: Path, forcings: str) -> xarray.Dataset:
     xarray.Dataset
         Dataset containing the combined discharge and forcing data of all basins (as stored in the netCDF)  
     """
+    return xarray.open_dataset(_get_hourly_us_netcdf_path(data_dir, forcings))
+
+
+def get_hourly_us_netcdf(data_dir: Path, forcings: str) -> 'HourlyNetCDF':
+    """Return a handle to the preprocessed hourly netCDF file, which is opened only once per process.
+
+    If the file was rechunked with `rechunk_hourly_us_netcdf`, the rechunked file is used.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Path to the CAMELS US directory. This folder must contain a folder called 'hourly', containing the netCDF file.
+    forcings : str
+        Name of the forcing product. Must match the ending of the netCDF file. E.g. 'nldas_hourly' for 
+        'usgs-streamflow-nldas_hourly.nc'
+
+    Returns
+    -------
+    HourlyNetCDF
+        Handle to the netCDF file.
+    """
+    netcdf_path = _get_hourly_us_netcdf_path(data_dir, forcings)
+    # netCDF handles must not be shared with forked (data loader) processes
+    key = (os.getpid(), str(netcdf_path.resolve()))
+    if key not in _NETCDF_HANDLES:
+        _NETCDF_HANDLES[key] = HourlyNetCDF(netcdf_path)
+    return _NETCDF_HANDLES[key]
+
+
+def rechunk_hourly_us_netcdf(data_dir: Path, forcings: str) -> Path:
+    """Store a copy of the preprocessed hourly netCDF file, in which the time series of each basin are contiguous.
+
+    In the original file, the data of one basin is spread over the chunks of all basins, so that reading one basin
+    decodes much more data than needed. The copy stores each variable in chunks of one basin and all time steps and is
+    used by `get_hourly_us_netcdf` once it exists. The variables are converted one at a time, i.e., one variable of all
+    basins has to fit into memory.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Path to the CAMELS US directory. This folder must contain a folder called 'hourly', containing the netCDF file.
+    forcings : str
+        Name of the forcing product. Must match the ending of the netCDF file. E.g. 'nldas_hourly' for 
+        'usgs-streamflow-nldas_hourly.nc'
+
+    Returns
+    -------
+    Path
+        Path to the rechunked netCDF file.
+    """
     netcdf_path = data_dir / 'hourly' / f'usgs-streamflow-{forcings}.nc'
     if not netcdf_path.is_file():
         raise FileNotFoundError(f'No NetCDF file for hourly streamflow and {forcings} at {netcdf_path}.')
+    rechunked_path = netcdf_path.with_name(f'usgs-streamflow-{forcings}-per-basin.nc')
+    tmp_path = rechunked_path.with_suffix('.nc.tmp')
+
+    with xarray.open_dataset(netcdf_path) as xr:
+        mode = 'w'
+        for var in tqdm(xr.data_vars, file=sys.stdout):
+            da = xr[var].load()
+            chunksizes = tuple(1 if dim == 'basin' else size for dim, size in zip(da.dims, da.shape))
+            da.to_dataset().to_netcdf(tmp_path, mode=mode, encoding={var: {'chunksizes': chunksizes, 'zlib': True}})
+            mode = 'a'
+    os.replace(tmp_path, rechunked_path)
+    return rechunked_path
+
+
+class HourlyNetCDF:
+    """Handle to a preprocessed hourly netCDF file that contains the data of all basins.
+
+    The handle keeps the file open and indexes its basins and dates, such that the data of a basin is read by position,
+    restricted to the requested variables and time range, instead of decoding the full file for each basin.
+
+    Parameters
+    ----------
+    netcdf_path : Path
+        Path to the netCDF file with the dimensions 'basin' and 'date'.
+    """
+
+    def __init__(self, netcdf_path: Path):
+        self.path = netcdf_path
+        self._xr = xarray.open_dataset(netcdf_path)
+        self.variables = list(self._xr.data_vars)
+        self._basin_indices = {str(basin): i for i, basin in enumerate(self._xr['basin'].values)}
+        self._dates = pd.DatetimeIndex(self._xr['date'].values)
+
+    def __contains__(self, basin: str) -> bool:
+        return basin in self._basin_indices
+
+    def load_basin(self,
+                   basin: str,
+                   columns: List[str] = None,
+                   start_date: pd.Timestamp = None,
+                   end_date: pd.Timestamp = None) -> pd.DataFrame:
+        """Read the data of one basin.
 
-    return xarray.open_dataset(netcdf_path)
\ No newline at end of file
+        Parameters
+        ----------
+        basin : str
+            8-digit USGS identifier of the basin.
+        columns : List[str], optional
+            If passed, only these variables are read. Columns that do not exist in the file are ignored.
+        start_date : pd.Timestamp, optional
+            If passed, only time steps from this date on are read.
+        end_date : pd.Timestamp, optional
+            If passed, only time steps until this date (inclusive) are read.
+
+        Returns
+        -------
+        pd.DataFrame
+            Time-indexed DataFrame with the data of the basin.
+
+        Raises
+        ------
+        KeyError
+            If the file does not contain data for the basin.
+        """
+        if basin not in self._basin_indices:
+            raise KeyError(f'No data for basin {basin} in {self.path}.')
+        start = 0 if start_date is None else self._dates.searchsorted(start_date, side='left')
+        end = len(self._dates) if end_date is None else self._dates.searchsorted(end_date, side='right')
+        variables = self.variables if columns is None else [var for var in self.variables if var in columns]
+        xr = self._xr[variables].isel(basin=self._basin_indices[basin], date=slice(start, end))
+        return xr.to_dataframe()
+
+
+def _get_hourly_us_netcdf_path(data_dir: Path, forcings: str) -> Path:
+    netcdf_path = data_dir / 'hourly' / f'usgs-streamflow-{forcings}.nc'
+    rechunked_path = netcdf_path.with_name(f'usgs-streamflow-{forcings}-per-basin.nc')
+    if rechunked_path.is_file():
+        return rechunked_path
+    if not netcdf_path.is_file():
+        raise FileNotFoundError(f'No NetCDF file for hourly streamflow and {forcings} at {netcdf_path}.')
+    return netcdf_path
\ No newline at end of file
@@ -7,6 +7,7 @@ import xarray
 
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
 from neuralhydrology.datautils import utils
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
 from neuralhydrology.utils.config import Config
 
 _SUBDATASET_TO_DIRECTORY = {
@@ -129,7 +130,10 @@ class LamaH(BaseDataset):
 
     def _load_attributes(self) -> pd.DataFrame:
         """Load static catchment attributes."""
-        return load_lamah_attributes(self.cfg.data_dir, sub_dataset=self.cfg.dataset, basins=self.basins)
+        return load_lamah_attributes(self.cfg.data_dir,
+                                     sub_dataset=self.cfg.dataset,
+                                     basins=self.basins,
+                                     cache_dir=self.cfg.dataset_cache_dir)
 
 
 def load_lamah_forcing(data_dir: Path, basin: str, sub_dataset: str, temporal_resolution: str = '1D') -> pd.DataFrame:
@@ -221,6 +225,10 @@ def load_lamah_discharge(data_dir: Path,
     return df
 
 
+@cached_attribute_table(lambda data_dir, sub_dataset: [
+    Path(data_dir) / _SUBDATASET_TO_DIRECTORY[sub_dataset] / "1_attributes",
+    Path(data_dir) / "D_gauges" / "1_attributes"
+])
 def load_lamah_attributes(data_dir: Path, sub_dataset: str, basins: List[str] = []) -> pd.DataFrame:
     """Load LamaH catchment attributes.
 
@@ -91,7 +91,9 @@ class TemplateDataset(BaseDataset):
         """Load dataset attributes
         
         This function is used to load basin attribute data (e.g. CAMELS catchments attributes) as a basin-indexed 
-        dataframe with features in columns.
+        dataframe with features in columns. Since a data set is created for each basin during evaluation, the loading
+        function should be decorated with `datasetcache.cached_attribute_table`, such that the attribute files are read
+        only once per process.
         
         Returns
         -------
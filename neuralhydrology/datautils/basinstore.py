@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+class BasinStore:
+    """On-disk store of prepared per-basin arrays.
+
+    Each basin is stored in its own folder, with one ``.npy`` file per array and a file ``valid_indices.npy``, which
+    contains the indices of all valid samples of the basin (one column per frequency). The valid indices allow to build
+    the lookup table of a data set without reading the (much larger) time series of all basins.
+
+    Parameters
+    ----------
+    root : Path
+        Root directory of the store. Is created if it does not exist.
+    """
+
+    valid_indices_file = "valid_indices.npy"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def write_basin(self, basin: str, arrays: Dict[str, np.ndarray], valid_indices: np.ndarray):
+        """Write the arrays and valid sample indices of one basin to the store.
+
+        Parameters
+        ----------
+        basin : str
+            Basin id.
+        arrays : Dict[str, np.ndarray]
+            Dictionary of arrays to store, keys have to be valid file names.
+        valid_indices : np.ndarray
+            Array of shape [valid samples, frequencies] with the index of the last time step of each valid sample.
+        """
+        basin_dir = self._basin_dir(basin)
+        basin_dir.mkdir(parents=True, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(basin_dir / f"{name}.npy", array, allow_pickle=False)
+        np.save(basin_dir / self.valid_indices_file, valid_indices.astype(np.int64), allow_pickle=False)
+
+    def read_basin(self, basin: str, names: List[str], mmap: bool = False) -> Dict[str, np.ndarray]:
+        """Read arrays of one basin from the store.
+
+        Parameters
+        ----------
+        basin : str
+            Basin id.
+        names : List[str]
+            Names of the arrays to read.
+        mmap : bool, optional
+            If True, the arrays are memory-mapped (read-only) instead of loaded into memory.
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            Dictionary mapping the array names to the arrays.
+        """
+        basin_dir = self._basin_dir(basin)
+        return {name: np.load(basin_dir / f"{name}.npy", mmap_mode="r" if mmap else None) for name in names}
+
+    def read_valid_indices(self, basin: str) -> np.ndarray:
+        """Read the indices of the valid samples of one basin.
+
+        Parameters
+        ----------
+        basin : str
+            Basin id.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape [valid samples, frequencies].
+        """
+        return np.load(self._basin_dir(basin) / self.valid_indices_file)
+
+    def get_nbytes(self, basin: str, names: List[str]) -> int:
+        """Return the size of the arrays of one basin (in bytes) without reading them.
+
+        Parameters
+        ----------
+        basin : str
+            Basin id.
+        names : List[str]
+            Names of the arrays to consider.
+
+        Returns
+        -------
+        int
+            Total size of the arrays in bytes.
+        """
+        arrays = self.read_basin(basin, names, mmap=True)
+        return sum(array.nbytes for array in arrays.values())
+
+    def _basin_dir(self, basin: str) -> Path:
+        return self.root / str(basin)
@@ -1,8 +1,9 @@
 import logging
+import multiprocessing
 import pickle
 import sys
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import numpy as np
 import pandas as pd
@@ -20,13 +21,15 @@ def calculate_camels_us_dyn_climate_indices(data_dir: Path,
                                          window_length: int,
                                          forcings: str,
                                          variable_names: Dict[str, str] = None,
-                                         output_file: Path = None) -> Dict[str, pd.DataFrame]:
+                                         output_file: Path = None,
+                                         num_workers: int = 1) -> Dict[str, pd.DataFrame]:
     """Calculate dynamic climate indices for the CAMELS US dataset.
     
     Compared to the long-term static climate indices included in the CAMELS US data set, this function computes the same
     climate indices by a moving window approach over the entire data set. That is, for each time step, the climate 
     indices are re-computed from the last `window_length` time steps. The resulting dictionary of DataFrames can be
-    used with the `additional_feature_files` argument.
+    used with the `additional_feature_files` argument. The rolling statistics are updated incrementally when the
+    window moves forward, and the basins can be processed in parallel processes.
     Unlike in CAMELS, the '_freq' indices will be fractions, not number of days. To compare the values to the ones in
     CAMELS, they need to be multiplied by 365.25.
     
@@ -45,7 +48,10 @@ def calculate_camels_us_dyn_climate_indices(data_dir: Path,
         If provided, this must be a dictionary that maps the keys 'prcp', 'tmin', 'tmax', 'srad' to the forcings'
         respective variable names.
     output_file : Path, optional
-        If specified, stores the resulting dictionary of DataFrames to this location as a pickle dump.
+        If specified, stores the resulting dictionary of DataFrames to this location as a pickle dump, which can be
+        passed to the `additional_feature_files` argument.
+    num_workers : int, optional
+        Number of processes that compute the climate indices of different basins in parallel. Default: 1.
 
     Returns
     -------
@@ -54,7 +60,6 @@ def calculate_camels_us_dyn_climate_indices(data_dir: Path,
         DataFrame are computed from the `window_length` previous time steps (including the given day).
     """
     camels_attributes = load_camels_us_attributes(data_dir=data_dir, basins=basins)
-    additional_features = {}
 
     if variable_names is None:
         if forcings.startswith('nldas'):
@@ -64,28 +69,18 @@ def calculate_camels_us_dyn_climate_indices(data_dir: Path,
         else:
             raise ValueError(f'No predefined variable mapping for {forcings} forcings. Provide one in variable_names.')
 
-    for basin in tqdm(basins, file=sys.stdout):
-        df, _ = load_camels_us_forcings(data_dir=data_dir, basin=basin, forcings=forcings)
-        lat = camels_attributes.loc[camels_attributes.index == basin, 'gauge_lat'].values
-        elev = camels_attributes.loc[camels_attributes.index == basin, 'elev_mean'].values
-        df["PET(mm/d)"] = pet.get_priestley_taylor_pet(t_min=df[variable_names['tmin']].values,
-                                                       t_max=df[variable_names['tmax']].values,
-                                                       s_rad=df[variable_names['srad']].values,
-                                                       lat=lat,
-                                                       elev=elev,
-                                                       doy=df.index.dayofyear.values)
-
-        clim_indices = calculate_dyn_climate_indices(df[variable_names['prcp']],
-                                                     df[variable_names['tmax']],
-                                                     df[variable_names['tmin']],
-                                                     df['PET(mm/d)'],
-                                                     window_length=window_length)
-
-        if np.any(clim_indices.isna()):
-            raise ValueError(f"NaN in new features of basin {basin}")
-
-        clim_indices = clim_indices.reindex(df.index)  # add NaN rows for the first window_length - 1 entries
-        additional_features[basin] = clim_indices
+    basin_args = [(data_dir, basin, forcings, variable_names,
+                   camels_attributes.loc[camels_attributes.index == basin, 'gauge_lat'].values,
+                   camels_attributes.loc[camels_attributes.index == basin, 'elev_mean'].values, window_length)
+                  for basin in basins]
+    if num_workers > 1:
+        with multiprocessing.Pool(num_workers) as pool:
+            results = list(
+                tqdm(pool.imap(_calculate_basin_dyn_climate_indices, basin_args), total=len(basins),
+                     file=sys.stdout))
+    else:
+        results = [_calculate_basin_dyn_climate_indices(args) for args in tqdm(basin_args, file=sys.stdout)]
+    additional_features = dict(zip(basins, results))
 
     if output_file is not None:
         with output_file.open("wb") as fp:
@@ -95,6 +90,29 @@ def calculate_camels_us_dyn_climate_indices(data_dir: Path,
     return additional_features
 
 
+def _calculate_basin_dyn_climate_indices(args: Tuple[Path, str, str, Dict[str, str], np.ndarray, np.ndarray, int]) \
+        -> pd.DataFrame:
+    data_dir, basin, forcings, variable_names, lat, elev, window_length = args
+    df, _ = load_camels_us_forcings(data_dir=data_dir, basin=basin, forcings=forcings)
+    df["PET(mm/d)"] = pet.get_priestley_taylor_pet(t_min=df[variable_names['tmin']].values,
+                                                   t_max=df[variable_names['tmax']].values,
+                                                   s_rad=df[variable_names['srad']].values,
+                                                   lat=lat,
+                                                   elev=elev,
+                                                   doy=df.index.dayofyear.values)
+
+    clim_indices = calculate_dyn_climate_indices(df[variable_names['prcp']],
+                                                 df[variable_names['tmax']],
+                                                 df[variable_names['tmin']],
+                                                 df['PET(mm/d)'],
+                                                 window_length=window_length)
+
+    if np.any(clim_indices.isna()):
+        raise ValueError(f"NaN in new features of basin {basin}")
+
+    return clim_indices.reindex(df.index)  # add NaN rows for the first window_length - 1 entries
+
+
 def calculate_dyn_climate_indices(precip: pd.Series,
                                   tmax: pd.Series,
                                   tmin: pd.Series,
@@ -105,7 +123,9 @@ def calculate_dyn_climate_indices(precip: pd.Series,
 
     Compared to the long-term static climate indices included in the CAMELS dataset, this function computes the same
     climate indices by a moving window approach over the entire dataset. That is, for each time step, the climate
-    indices are re-computed from the last `window_length` time steps.
+    indices are re-computed from the last `window_length` time steps. Instead of re-computing each window from scratch,
+    the window statistics are updated incrementally, such that the run time grows (almost) linearly with the length of
+    the time series. Climate indices of windows that contain NaN inputs are NaN.
 
     Parameters
     ----------
@@ -160,59 +180,110 @@ def calculate_dyn_climate_indices(precip: pd.Series,
 @njit
 def _numba_climate_indexes(features: np.ndarray, window_length: int) -> np.ndarray:
     # features shape is (#timesteps, 4), where 4 breaks down into: (prcp, tmax, tmin, pet)
+    # All window statistics are updated incrementally from prefix sums and prefix counts. Only the high precipitation
+    # indices need a Fenwick tree, because their threshold (5 * p_mean) moves with the window.
     n_samples = features.shape[0]
     window_length = min(n_samples, window_length)
-    new_features = np.zeros((n_samples - window_length + 1, 9))
+    new_features = np.full((n_samples - window_length + 1, 9), np.nan)
+
+    prcp = features[:, 0]
+    t_mean = (features[:, 1] + features[:, 2]) / 2
+    has_nan = np.zeros(n_samples, dtype=np.int64)
+    for t in range(n_samples):
+        for j in range(features.shape[1]):
+            if np.isnan(features[t, j]):
+                has_nan[t] = 1
+    values = np.where(has_nan[:, None] == 1, 0.0, features)
+    prcp_valid = values[:, 0]
+
+    # prefix sums of the window means and prefix counts of the fixed-threshold indicators. A run of low precipitation
+    # days starts at every low day whose predecessor is not low, so the number of runs in a window is the number of
+    # low days minus the number of low days (after the window start) that directly follow another low day.
+    low = prcp_valid < 1
+    low_pairs = np.zeros(n_samples, dtype=np.bool_)
+    low_pairs[1:] = low[1:] & low[:-1]
+    sums = np.zeros((n_samples + 1, 7))
+    sums[1:, 0] = np.cumsum(prcp_valid)
+    sums[1:, 1] = np.cumsum(values[:, 3])
+    sums[1:, 2] = np.cumsum(values[:, 1])
+    sums[1:, 3] = np.cumsum(values[:, 2])
+    sums[1:, 4] = np.cumsum(np.where(t_mean <= 0, prcp_valid, 0.0))
+    sums[1:, 5] = np.cumsum(low)
+    sums[1:, 6] = np.cumsum(low_pairs)
+    counts = np.zeros((n_samples + 1, 2), dtype=np.int64)
+    counts[1:, 0] = np.cumsum(has_nan)
+    counts[1:, 1] = np.cumsum(prcp_valid > 0)
+
+    # Analogously, a high precipitation day continues a run if its predecessor is also high, i.e., if the minimum of
+    # both days exceeds the threshold. The values and pairwise minima are counted in Fenwick trees over their ranks.
+    pair_min = np.empty(n_samples)
+    pair_min[0] = np.inf
+    pair_min[1:] = np.minimum(prcp_valid[1:], prcp_valid[:-1])
+    sorted_prcp = np.sort(prcp_valid)
+    sorted_pair_min = np.sort(pair_min)
+    prcp_ranks = np.searchsorted(sorted_prcp, prcp_valid)
+    pair_min_ranks = np.searchsorted(sorted_pair_min, pair_min)
+    prcp_tree = np.zeros(n_samples + 1, dtype=np.int64)
+    pair_min_tree = np.zeros(n_samples + 1, dtype=np.int64)
+    for t in range(window_length):
+        _fenwick_add(prcp_tree, prcp_ranks[t], 1)
+        if t > 0:
+            _fenwick_add(pair_min_tree, pair_min_ranks[t], 1)
 
     for i in range(new_features.shape[0]):
-        x = features[i:i + window_length]
-
-        p_mean = np.mean(x[:, 0])
-        pet_mean = np.mean(x[:, -1])
-        aridity = pet_mean / p_mean if p_mean > 0 else np.nan
-        t_mean = (np.mean(x[:, 1]) + np.mean(x[:, 2])) / 2
-
-        # fraction of precipitation falling as snow
-        if np.sum(x[:, 0]) > 0:
-            mean_temp = (x[:, 1] + x[:, 2]) / 2
-            frac_snow = np.sum(x[mean_temp <= 0, 0]) / np.sum(x[:, 0])
-        else:
-            frac_snow = 0.0
-
-        high_prec_freq = np.sum(x[:, 0] >= 5 * p_mean) / x.shape[0]
-        low_prec_freq = np.sum(x[:, 0] < 1) / x.shape[0]
-
-        idx = np.where(x[:, 0] < 1)[0]
-        groups = _split_list(idx)
-        low_prec_dur = np.mean(np.array([len(p) for p in groups]))
-
-        idx = np.where(x[:, 0] >= 5 * p_mean)[0]
-        groups = _split_list(idx)
-        high_prec_dur = np.mean(np.array([len(p) for p in groups]))
+        end = i + window_length
+        if i > 0:
+            _fenwick_add(prcp_tree, prcp_ranks[i - 1], -1)
+            _fenwick_add(prcp_tree, prcp_ranks[end - 1], 1)
+            _fenwick_add(pair_min_tree, pair_min_ranks[i], -1)
+            _fenwick_add(pair_min_tree, pair_min_ranks[end - 1], 1)
+        if counts[end, 0] > counts[i, 0]:
+            continue
+
+        window = sums[end] - sums[i]
+        any_prcp = counts[end, 1] > counts[i, 1]
+        p_mean = window[0] / window_length if any_prcp else 0.0
+        pet_mean = window[1] / window_length
+
+        # the incremental mean can differ from the window mean in the last digits, which matters only if a value is
+        # (almost) equal to the threshold. In this rare case, the mean is re-computed from the window.
+        threshold = 5 * p_mean
+        n_high = window_length - _fenwick_sum(prcp_tree, np.searchsorted(sorted_prcp, threshold))
+        if _fenwick_sum(prcp_tree, np.searchsorted(sorted_prcp, threshold * (1 + 1e-9))) \
+                > _fenwick_sum(prcp_tree, np.searchsorted(sorted_prcp, threshold * (1 - 1e-9))):
+            p_mean = np.mean(prcp_valid[i:end])
+            threshold = 5 * p_mean
+            n_high = window_length - _fenwick_sum(prcp_tree, np.searchsorted(sorted_prcp, threshold))
+        n_high_pairs = window_length - 1 - _fenwick_sum(pair_min_tree, np.searchsorted(sorted_pair_min, threshold))
+        n_low = window[5]
+        n_low_runs = n_low - window[6] + (1 if low_pairs[i] else 0)
 
         new_features[i, 0] = p_mean
         new_features[i, 1] = pet_mean
-        new_features[i, 2] = aridity
-        new_features[i, 3] = t_mean
-        new_features[i, 4] = frac_snow
-        new_features[i, 5] = high_prec_freq
-        new_features[i, 6] = high_prec_dur
-        new_features[i, 7] = low_prec_freq
-        new_features[i, 8] = low_prec_dur
+        new_features[i, 2] = pet_mean / p_mean if p_mean > 0 else np.nan
+        new_features[i, 3] = (window[2] + window[3]) / (2 * window_length)
+        new_features[i, 4] = window[4] / window[0] if any_prcp else 0.0
+        new_features[i, 5] = n_high / window_length
+        new_features[i, 6] = n_high / (n_high - n_high_pairs) if n_high > 0 else np.nan
+        new_features[i, 7] = n_low / window_length
+        new_features[i, 8] = n_low / n_low_runs if n_low > 0 else np.nan
 
     return new_features
 
 
 @njit
-def _split_list(a_list: List) -> List:
-    new_list = []
-    start = 0
-    for index, value in enumerate(a_list):
-        if index < len(a_list) - 1:
-            if a_list[index + 1] > value + 1:
-                end = index + 1
-                new_list.append(a_list[start:end])
-                start = end
-        else:
-            new_list.append(a_list[start:len(a_list)])
-    return new_list
+def _fenwick_add(tree: np.ndarray, rank: int, value: int):
+    rank += 1
+    while rank < tree.shape[0]:
+        tree[rank] += value
+        rank += rank & -rank
+
+
+@njit
+def _fenwick_sum(tree: np.ndarray, rank: int) -> int:
+    # number of entries with a rank smaller than `rank`
+    total = 0
+    while rank > 0:
+        total += tree[rank]
+        rank -= rank & -rank
+    return total
@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+COLUMNS_FILE = "columns.json"
+DATE_FILE = "date.npy"
+
+
+def write_columnar_timeseries(df: pd.DataFrame, basin_dir: Path):
+    """Store the time series of one basin in a columnar binary layout.
+
+    Each column is stored as a separate ``.npy`` file, together with the datetime index (``date.npy``) and a file
+    ``columns.json`` that maps the column names to the file names. Columns that are not numeric are skipped.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Time-indexed DataFrame of one basin.
+    basin_dir : Path
+        Folder in which the files of the basin are stored. Is created if it does not exist.
+    """
+    basin_dir.mkdir(parents=True, exist_ok=True)
+    columns = {}
+    for i, column in enumerate(df.columns):
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            continue
+        # column names can contain characters that are not allowed in file names
+        columns[column] = f"{i}.npy"
+        np.save(basin_dir / columns[column], df[column].to_numpy(), allow_pickle=False)
+    np.save(basin_dir / DATE_FILE, df.index.to_numpy(dtype="datetime64[ns]"), allow_pickle=False)
+    with (basin_dir / COLUMNS_FILE).open("w") as fp:
+        json.dump({"index_name": df.index.name, "columns": columns}, fp)
+
+
+def read_columnar_timeseries(basin_dir: Path,
+                             columns: List[str] = None,
+                             start_date: pd.Timestamp = None,
+                             end_date: pd.Timestamp = None) -> pd.DataFrame:
+    """Read the time series of one basin from the columnar binary layout.
+
+    Only the files of the requested columns are opened, and only the requested date range is read from them.
+
+    Parameters
+    ----------
+    basin_dir : Path
+        Folder that contains the files of the basin, as written by `write_columnar_timeseries`.
+    columns : List[str], optional
+        Columns to read. Requested columns that are not stored are ignored. By default, all columns are read.
+    start_date : pd.Timestamp, optional
+        First date to read (inclusive). By default, the time series is read from its beginning.
+    end_date : pd.Timestamp, optional
+        Last date to read (inclusive). By default, the time series is read until its end.
+
+    Returns
+    -------
+    pd.DataFrame
+        Time-indexed DataFrame with the requested columns and dates.
+    """
+    with (basin_dir / COLUMNS_FILE).open("r") as fp:
+        meta = json.load(fp)
+    stored_columns = meta["columns"]
+    if columns is not None:
+        stored_columns = {column: file for column, file in stored_columns.items() if column in columns}
+
+    dates = np.load(basin_dir / DATE_FILE, mmap_mode="r")
+    start = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(start_date, "ns"), side="left"))
+    end = len(dates) if end_date is None else int(np.searchsorted(dates, np.datetime64(end_date, "ns"), side="right"))
+
+    data = {column: np.load(basin_dir / file, mmap_mode="r")[start:end] for column, file in stored_columns.items()}
+    index = pd.DatetimeIndex(np.array(dates[start:end]), name=meta["index_name"])
+    return pd.DataFrame(data, index=index)
+
+
+def has_columnar_timeseries(basin_dir: Path) -> bool:
+    """Check if the time series of a basin is stored in the columnar binary layout.
+
+    Parameters
+    ----------
+    basin_dir : Path
+        Folder that would contain the files of the basin.
+
+    Returns
+    -------
+    bool
+        True, if the time series of the basin is stored in `basin_dir`.
+    """
+    return (basin_dir / COLUMNS_FILE).is_file()
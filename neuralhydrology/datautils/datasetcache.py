@@ -0,0 +1,312 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# increase whenever the content or layout of the cached data changes, to invalidate existing caches
+CACHE_VERSION = 1
+
+# config arguments that affect the content of a prepared data set
+DATA_CONFIG_KEYS = [
+    "additional_feature_files", "autoregressive_inputs", "custom_normalization", "data_dir", "dataset",
+    "derived_pet", "duplicate_features", "dynamic_conceptual_inputs", "dynamic_inputs", "evolving_attributes",
+    "forcings", "forecast_inputs", "forecast_overlap", "forecast_seq_length", "hindcast_inputs",
+    "hydroatlas_attributes", "lagged_features", "mass_inputs", "predict_last_n", "random_holdout_from_dynamic_features",
+    "rating_curve_file", "seq_length", "static_attributes", "target_variables", "timestep_counter", "use_frequencies"
+]
+
+META_FILE = "meta.p"
+# folder of a cache entry that holds the segments of time steps that were appended to the prepared data set
+SEGMENTS_DIR = "segments"
+
+# attribute tables of all basins that were loaded in this process, see `cached_attribute_table`
+_ATTRIBUTE_TABLES = {}
+
+
+def get_cache_key(key_data: Dict[str, Any]) -> str:
+    """Return a hash that identifies a prepared data set.
+
+    Parameters
+    ----------
+    key_data : Dict[str, Any]
+        Everything that affects the content of the prepared data set, e.g., config arguments, basin ids, and file
+        fingerprints. Must be JSON-serializable after converting non-standard types with `str`.
+
+    Returns
+    -------
+    str
+        Hex digest of the SHA-256 hash of `key_data`.
+    """
+    serialized = json.dumps(key_data, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def get_files_fingerprint(paths: List[Path], exclude: List[Path] = None) -> str:
+    """Return a hash of the path, modification time and size of all files at the passed paths.
+
+    Directories are searched recursively and paths that do not exist (or are None) are ignored. The fingerprint of
+    the same paths is computed only once per process, because large data directories can contain many thousand files.
+
+    Parameters
+    ----------
+    paths : List[Path]
+        Files or directories.
+    exclude : List[Path], optional
+        Directories whose files are not part of the fingerprint, e.g., a data set cache inside the data directory, whose
+        content changes whenever a cache entry is written.
+
+    Returns
+    -------
+    str
+        Hex digest of the SHA-256 hash of the sorted (path, modification time in ns, size in bytes) of all files.
+    """
+    exclude = tuple(str(Path(path).resolve()) for path in exclude or [] if path is not None)
+    return _get_files_fingerprint(tuple(str(path) for path in paths if path is not None), exclude)
+
+
+@functools.lru_cache(maxsize=64)
+def _get_files_fingerprint(paths: Tuple[str], exclude: Tuple[str]) -> str:
+    fingerprint = []
+    for path in map(Path, paths):
+        if path.is_file():
+            files = [path]
+        elif path.is_dir():
+            files = []
+            for root, dirs, file_names in os.walk(path):
+                # skip excluded directories without listing their content
+                dirs[:] = [d for d in dirs if str((Path(root) / d).resolve()) not in exclude]
+                files += [Path(root) / name for name in file_names if (Path(root) / name).is_file()]
+        else:
+            continue
+        for file in files:
+            stat = file.stat()
+            fingerprint.append((str(file), stat.st_mtime_ns, stat.st_size))
+    return get_cache_key({"files": sorted(fingerprint)})
+
+
+def create_tmp_dir(cache_dir: Path) -> Path:
+    """Create a temporary folder next to a cache entry, in which the entry can be prepared.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Folder of the cache entry.
+
+    Returns
+    -------
+    Path
+        Path of the new (empty) temporary folder.
+    """
+    tmp_dir = cache_dir.parent / f".{cache_dir.name}.{uuid.uuid4().hex}"
+    tmp_dir.mkdir(parents=True)
+    return tmp_dir
+
+
+def write_cache(cache_dir: Path, arrays: Dict[str, np.ndarray], meta: Dict[str, Any], tmp_dir: Path = None):
+    """Write a prepared data set to the cache.
+
+    The data is first written to a temporary folder that is renamed to `cache_dir` once all files are written. Thus,
+    runs that use the same cache concurrently never see incomplete cache entries.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Folder of the cache entry.
+    arrays : Dict[str, np.ndarray]
+        Arrays of the prepared data set, stored as one ``.npy`` file per array.
+    meta : Dict[str, Any]
+        Further (small) objects of the prepared data set, which are pickled.
+    tmp_dir : Path, optional
+        Temporary folder created with `create_tmp_dir` that already contains further files of the cache entry. If None,
+        a new temporary folder is created.
+    """
+    if tmp_dir is None:
+        tmp_dir = create_tmp_dir(cache_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", array, allow_pickle=False)
+        with (tmp_dir / META_FILE).open("wb") as fp:
+            pickle.dump(meta, fp)
+        os.rename(tmp_dir, cache_dir)
+    except OSError:
+        # another run created the same cache entry in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not is_cached(cache_dir):
+            raise
+
+
+def read_cache(cache_dir: Path) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Attach to a prepared data set in the cache.
+
+    The arrays are memory-mapped copy-on-write, i.e., the cache files are never modified and the pages of the arrays are
+    shared between all processes that read the same cache entry.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Folder of the cache entry.
+
+    Returns
+    -------
+    Tuple[Dict[str, np.ndarray], Dict[str, Any]]
+        The memory-mapped arrays and the meta data of the prepared data set.
+    """
+    arrays = {f.stem: np.load(f, mmap_mode="c") for f in cache_dir.glob("*.npy")}
+    with (cache_dir / META_FILE).open("rb") as fp:
+        meta = pickle.load(fp)
+    return arrays, meta
+
+
+def write_segment(cache_dir: Path, index: int, arrays: Dict[str, np.ndarray]):
+    """Append a segment of new time steps to a cache entry.
+
+    The segments of a cache entry are numbered consecutively. Like cache entries, a segment is first written to a
+    temporary folder that is renamed once all files are written, so the existing files of the entry are never modified.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Folder of the cache entry.
+    index : int
+        Number of the segment, i.e., the number of segments that the data set attached to when it was appended.
+    arrays : Dict[str, np.ndarray]
+        Arrays of the segment, stored as one ``.npy`` file per array.
+
+    Raises
+    ------
+    RuntimeError
+        If the cache entry already has a segment with this number, i.e., another run appended to it in the meantime.
+    """
+    segment_dir = cache_dir / SEGMENTS_DIR / f"{index:06d}"
+    if segment_dir.exists():
+        raise RuntimeError(f"Segment {index} of the cache entry {cache_dir} was appended by another run.")
+    tmp_dir = create_tmp_dir(segment_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", array, allow_pickle=False)
+        os.rename(tmp_dir, segment_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if segment_dir.exists():
+            raise RuntimeError(f"Segment {index} of the cache entry {cache_dir} was appended by another run.")
+        raise
+
+
+def read_segments(cache_dir: Path) -> List[Dict[str, np.ndarray]]:
+    """Attach to the segments of time steps that were appended to a cache entry.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Folder of the cache entry.
+
+    Returns
+    -------
+    List[Dict[str, np.ndarray]]
+        The memory-mapped arrays of each segment, in the order in which the segments were appended.
+    """
+    segments_dir = cache_dir / SEGMENTS_DIR
+    if not segments_dir.is_dir():
+        return []
+    # temporary folders of segments that are being written start with a dot
+    segment_dirs = sorted(d for d in segments_dir.iterdir() if d.name.isdigit())
+    return [{f.stem: np.load(f, mmap_mode="c") for f in segment_dir.glob("*.npy")} for segment_dir in segment_dirs]
+
+
+def is_cached(cache_dir: Path) -> bool:
+    """Check if a (complete) cache entry exists.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Folder of the cache entry.
+
+    Returns
+    -------
+    bool
+        True, if the cache entry exists.
+    """
+    return (cache_dir / META_FILE).is_file()
+
+
+def cached_attribute_table(get_source_paths: Callable[..., List[Path]], drop_missing_basins: bool = False) -> Callable:
+    """Decorator to load the attribute table of a data set only once and to subset it to the requested basins.
+
+    The decorated function has to accept a `basins` argument and return a basin-indexed DataFrame. It is called without
+    `basins`, i.e., for all basins, once per process and set of arguments. The attribute table is stored in memory,
+    keyed by the fingerprint of the attribute files, and later calls only select the rows of the requested basins.
+    The decorated function gets an additional keyword argument `cache_dir`. If it is passed (e.g., the
+    `dataset_cache_dir`), the attribute table is also stored in its 'attributes' folder and re-used by other processes.
+
+    Parameters
+    ----------
+    get_source_paths : Callable[..., List[Path]]
+        Returns the attribute files or folders, given the arguments of the decorated function except `basins`.
+    drop_missing_basins : bool, optional
+        If True, requested basins that are missing in the attribute table are ignored, and the rows of the table are
+        returned in their original order. By default, a ValueError is raised if any requested basin is missing.
+
+    Returns
+    -------
+    Callable
+        The decorator.
+    """
+
+    def decorator(load_function: Callable[..., pd.DataFrame]) -> Callable[..., pd.DataFrame]:
+        signature = inspect.signature(load_function)
+
+        @functools.wraps(load_function)
+        def wrapper(*args, cache_dir: Path = None, **kwargs) -> pd.DataFrame:
+            bound_arguments = signature.bind(*args, **kwargs)
+            bound_arguments.apply_defaults()
+            arguments = bound_arguments.arguments
+            basins = arguments.pop("basins", None)
+            key = get_cache_key({
+                "version": CACHE_VERSION,
+                "function": f"{load_function.__module__}.{load_function.__qualname__}",
+                "arguments": arguments,
+                "files": get_files_fingerprint(get_source_paths(**arguments), exclude=[cache_dir]),
+            })
+            if key not in _ATTRIBUTE_TABLES:
+                _ATTRIBUTE_TABLES[key] = _load_attribute_table(key, cache_dir, lambda: load_function(**arguments))
+            df = _ATTRIBUTE_TABLES[key]
+
+            if not basins:
+                return df.copy()
+            if drop_missing_basins:
+                return df[df.index.isin(basins)]
+            if len(pd.Index(basins).difference(df.index)) > 0:
+                raise ValueError('Some basins are missing static attributes.')
+            return df.loc[basins]
+
+        return wrapper
+
+    return decorator
+
+
+def _load_attribute_table(key: str, cache_dir: Path, load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    if cache_dir is None:
+        return load()
+    file_path = Path(cache_dir) / "attributes" / f"{key}.p"
+    if file_path.is_file():
+        with file_path.open("rb") as fp:
+            return pickle.load(fp)
+
+    df = load()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first, such that concurrent runs never read incomplete files
+    tmp_path = file_path.parent / f".{file_path.name}.{uuid.uuid4().hex}"
+    with tmp_path.open("wb") as fp:
+        pickle.dump(df, fp)
+    os.replace(tmp_path, file_path)
+    return df
+
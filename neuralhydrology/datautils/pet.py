@@ -77,6 +77,53 @@ def get_priestley_taylor_pet(t_min: np.ndarray, t_max: np.ndarray, s_rad: np.nda
     return pet
 
 
+def get_priestley_taylor_pet_batch(t_min: np.ndarray, t_max: np.ndarray, s_rad: np.ndarray, lat: np.ndarray,
+                                   elev: np.ndarray, doy: np.ndarray) -> np.ndarray:
+    """Calculate Priestley-Taylor potential evapotranspiration (PET) of multiple basins in a single pass.
+
+    Vectorized variant of `get_priestley_taylor_pet` for time series of shape [basin, time] with per-basin latitudes
+    and elevations. The result is identical to calling `get_priestley_taylor_pet` for each basin.
+
+    Parameters
+    ----------
+    t_min : np.ndarray
+        Daily min temperature (degree C) of shape [basin, time]
+    t_max : np.ndarray
+        Daily max temperature (degree C) of shape [basin, time]
+    s_rad : np.ndarray
+        Solar radiation (Wm-2) of shape [basin, time]
+    lat : np.ndarray
+        Latitude in degree of shape [basin]
+    elev : np.ndarray
+        Elevation in m of shape [basin]
+    doy : np.ndarray
+        Day of the year of shape [time], or [basin, time] if the basins have different dates
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape [basin, time] containing PET estimates in mm/day
+    """
+    shape = np.shape(t_min)
+    lat = np.broadcast_to(np.asarray(lat, dtype=np.float64)[:, np.newaxis], shape)
+    elev = np.broadcast_to(np.asarray(elev, dtype=np.float64)[:, np.newaxis], shape)
+    doy = np.broadcast_to(doy, shape)
+
+    # all equations are element-wise, so the flattened basins can be processed like a single long time series
+    pet = get_priestley_taylor_pet(t_min=np.ravel(t_min).astype(np.float64),
+                                   t_max=np.ravel(t_max).astype(np.float64),
+                                   s_rad=np.ravel(s_rad).astype(np.float64),
+                                   lat=lat.ravel(),
+                                   elev=elev.ravel(),
+                                   doy=doy.ravel().astype(np.float64))
+    return pet.reshape(shape)
+
+
+# PET formulations that can be used to derive a PET input during the data set creation (see the `derived_pet` config
+# argument). Each function accepts [basin, time] arrays of t_min, t_max, s_rad, per-basin lat and elev, and doy.
+PET_FORMULATIONS = {"priestley_taylor": get_priestley_taylor_pet_batch}
+
+
 @njit
 def _get_slope_svp_curve(t_mean: np.ndarray) -> np.ndarray:
     """Slope of saturation vapour pressure curve
@@ -0,0 +1,171 @@
+import numpy as np
+from numba import njit
+
+
+class RunningMoments:
+    """Streaming count, mean, (population) variance, min and max of a data stream.
+
+    The data is passed in chunks (e.g., the time series of one basin at a time). The moments of each chunk are computed
+    with a two-pass algorithm and merged into the running moments using the parallel variant of Welford's algorithm
+    (Chan et al., 1979 [#]_), which is numerically stable and does not require the full data stream in memory.
+    NaN values are ignored.
+
+    References
+    ----------
+    .. [#] Chan, T. F., Golub, G. H., and LeVeque, R. J.: Updating formulae and a pairwise algorithm for computing
+        sample variances. Technical Report STAN-CS-79-773, Department of Computer Science, Stanford University, 1979.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = np.inf
+        self._max = -np.inf
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values to the running moments.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Array of arbitrary shape. NaN values are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        mean = values.mean()
+        self._merge(values.size, mean, np.sum((values - mean)**2), values.min(), values.max())
+
+    def merge(self, other: 'RunningMoments'):
+        """Merge the moments of another data stream into this one.
+
+        Parameters
+        ----------
+        other : RunningMoments
+            Running moments of another (disjoint) part of the data.
+        """
+        if other.count > 0:
+            self._merge(other.count, other._mean, other._m2, other._min, other._max)
+
+    def _merge(self, count: int, mean: float, m2: float, min_value: float, max_value: float):
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+        self._min = min(self._min, min_value)
+        self._max = max(self._max, max_value)
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count > 0 else np.nan
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation (ddof=0), i.e., the same as `xarray.Dataset.std()`."""
+        return np.sqrt(self._m2 / self.count) if self.count > 0 else np.nan
+
+    @property
+    def min(self) -> float:
+        return self._min if self.count > 0 else np.nan
+
+    @property
+    def max(self) -> float:
+        return self._max if self.count > 0 else np.nan
+
+
+class P2Quantile:
+    """Streaming approximation of a quantile with the P² algorithm (Jain and Chlamtac, 1985 [#]_).
+
+    The algorithm keeps only five markers, independent of the length of the data stream. Until five (non-NaN) values
+    have been observed, the exact quantile of the observed values is returned.
+
+    Parameters
+    ----------
+    quantile : float, optional
+        The quantile to estimate, in (0, 1). Default is the median.
+
+    References
+    ----------
+    .. [#] Jain, R. and Chlamtac, I.: The P² algorithm for dynamic calculation of quantiles and histograms without
+        storing observations. Communications of the ACM, 1985, 28, 1076--1085, doi:10.1145/4372.4378
+    """
+
+    def __init__(self, quantile: float = 0.5):
+        if not 0 < quantile < 1:
+            raise ValueError("The quantile has to be in the open interval (0, 1).")
+        self.quantile = quantile
+        self.count = 0
+        # marker heights, actual positions, desired positions and increments of the desired positions
+        self._heights = np.zeros(5)
+        self._positions = np.arange(1, 6, dtype=np.float64)
+        self._desired = np.array([1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5])
+        self._increments = np.array([0, quantile / 2, quantile, (1 + quantile) / 2, 1])
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values to the quantile estimate.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Array of arbitrary shape. NaN values are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        # the first five values initialize the markers
+        n_init = min(5 - self.count, values.size) if self.count < 5 else 0
+        if n_init > 0:
+            self._heights[self.count:self.count + n_init] = values[:n_init]
+            self.count += n_init
+            if self.count == 5:
+                self._heights.sort()
+            values = values[n_init:]
+        if values.size > 0:
+            _p2_update(values, self._heights, self._positions, self._desired, self._increments)
+            self.count += values.size
+
+    @property
+    def value(self) -> float:
+        if self.count == 0:
+            return np.nan
+        if self.count < 5:
+            return float(np.quantile(self._heights[:self.count], self.quantile))
+        return float(self._heights[2])
+
+
+@njit
+def _p2_update(values: np.ndarray, heights: np.ndarray, positions: np.ndarray, desired: np.ndarray,
+               increments: np.ndarray):
+    for x in values:
+        # find the cell k that contains x and update the extreme markers if necessary
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+        positions[k + 1:] += 1
+        desired += increments
+
+        # adjust the heights of the three middle markers
+        for i in range(1, 4):
+            d = desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1.0 if d > 0 else -1.0
+                # piecewise-parabolic prediction
+                h = heights[i] + d / (positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + d) * (heights[i + 1] - heights[i]) /
+                    (positions[i + 1] - positions[i]) + (positions[i + 1] - positions[i] - d) *
+                    (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1]))
+                if not heights[i - 1] < h < heights[i + 1]:
+                    # fall back to linear prediction
+                    j = i + int(d)
+                    h = heights[i] + d * (heights[j] - heights[i]) / (positions[j] - positions[i])
+                heights[i] = h
+                positions[i] += d
@@ -13,6 +13,8 @@ from ruamel.yaml import YAML
 from xarray.core.dataarray import DataArray
 from xarray.core.dataset import Dataset
 
+from neuralhydrology.datautils.datasetcache import cached_attribute_table
+
 # Pandas switched from "Y" to "YE" and similar identifiers in 2.2.0. This snippet checks which one is correct for the
 # current pandas installation.
 _YE_FREQ = 'YE'
@@ -76,6 +78,8 @@ def load_scaler(run_dir: Path) -> Dict[str, Union[pd.Series, xarray.Dataset]]:
                                     "Looked for (new) yaml file or (old) pickle file")
 
 
+@cached_attribute_table(lambda data_dir: [Path(data_dir) / 'hydroatlas_attributes' / 'attributes.csv'],
+                        drop_missing_basins=True)
 def load_hydroatlas_attributes(data_dir: Path, basins: List[str] = []) -> pd.DataFrame:
     """Load HydroATLAS attributes into a pandas DataFrame
 
@@ -383,3 +387,47 @@ def get_frequency_factor(freq_one: str, freq_two: str) -> float:
     except ValueError as err:
         raise ValueError(f'Frequencies {freq_one} and/or {freq_two} are not comparable.') from err
     return factor
+
+
+def encode_dates(dates: np.ndarray) -> np.ndarray:
+    """Encode datetime64 values as int32 offsets in minutes since 1970-01-01.
+
+    The compact encoding covers dates between the years -2113 and 6053 at a resolution of one minute.
+
+    Parameters
+    ----------
+    dates : np.ndarray
+        Array of datetime64 values.
+
+    Returns
+    -------
+    np.ndarray
+        Array of the same shape with int32 offsets, which can be converted back with `decode_dates`.
+
+    Raises
+    ------
+    ValueError
+        If any date is not a full minute.
+    """
+    minutes = dates.astype("datetime64[m]")
+    if np.any(minutes != dates):
+        raise ValueError("Dates can only be encoded if they are full minutes.")
+    return minutes.astype(np.int64).astype(np.int32)
+
+
+def decode_dates(dates: np.ndarray) -> np.ndarray:
+    """Decode dates that were encoded with `encode_dates` to datetime64[ns] values.
+
+    Parameters
+    ----------
+    dates : np.ndarray
+        Array of int32 offsets in minutes since 1970-01-01. Arrays of datetime64 values are returned unchanged.
+
+    Returns
+    -------
+    np.ndarray
+        Array of the same shape with datetime64[ns] values.
+    """
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates
+    return dates.astype(np.int64).astype("datetime64[m]").astype("datetime64[ns]")
@@ -1,8 +1,9 @@
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 
 import numpy as np
 import pandas as pd
+import torch
 from scipy import stats, signal
 from xarray.core.dataarray import DataArray
 
@@ -27,6 +28,10 @@ def get_available_metrics() -> List[str]:
     return metrics
 
 
+# maps the lower case metric names to the names in the results
+_METRIC_NAMES = {metric.lower(): metric for metric in get_available_metrics()}
+
+
 def _validate_inputs(obs: DataArray, sim: DataArray):
     if obs.shape != sim.shape:
         raise RuntimeError("Shapes of observations and simulations must match")
@@ -583,46 +588,11 @@ def mean_peak_timing(obs: DataArray,
     # get time series with only valid observations (scipy's find_peaks doesn't guarantee correctness with NaNs)
     obs, sim = _mask_valid(obs, sim)
 
-    # heuristic to get indices of peaks and their corresponding height.
-    peaks, _ = signal.find_peaks(obs.values, distance=100, prominence=np.std(obs.values))
-
     # infer name of datetime index
     if datetime_coord is None:
         datetime_coord = utils.infer_datetime_coord(obs)
 
-    if window is None:
-        # infer a reasonable window size
-        window = max(int(utils.get_frequency_factor('12h', resolution)), 3)
-
-    # evaluate timing
-    timing_errors = []
-    for idx in peaks:
-        # skip peaks at the start and end of the sequence and peaks around missing observations
-        # (NaNs that were removed in obs & sim would result in windows that span too much time).
-        if (idx - window < 0) or (idx + window >= len(obs)) or (pd.date_range(obs[idx - window][datetime_coord].values,
-                                                                              obs[idx + window][datetime_coord].values,
-                                                                              freq=resolution).size != 2 * window + 1):
-            continue
-
-        # check if the value at idx is a peak (both neighbors must be smaller)
-        if (sim[idx] > sim[idx - 1]) and (sim[idx] > sim[idx + 1]):
-            peak_sim = sim[idx]
-        else:
-            # define peak around idx as the max value inside of the window
-            values = sim[idx - window:idx + window + 1]
-            peak_sim = values[values.argmax()]
-
-        # get xarray object of qobs peak, for getting the date and calculating the datetime offset
-        peak_obs = obs[idx]
-
-        # calculate the time difference between the peaks
-        delta = peak_obs.coords[datetime_coord] - peak_sim.coords[datetime_coord]
-
-        timing_error = np.abs(delta.values / pd.to_timedelta(resolution))
-
-        timing_errors.append(timing_error)
-
-    return np.mean(timing_errors) if len(timing_errors) > 0 else np.nan
+    return _mean_peak_timing(obs.values, sim.values, obs[datetime_coord].values, window, resolution)
 
 
 def missed_peaks(obs: DataArray,
@@ -666,42 +636,11 @@ def missed_peaks(obs: DataArray,
     # get time series with only valid observations (scipy's find_peaks doesn't guarantee correctness with NaNs)
     obs, sim = _mask_valid(obs, sim)
 
-    # minimum height of a peak, as defined by percentile, which can be passed
-    min_obs_height = np.percentile(obs.values, percentile)
-    min_sim_height = np.percentile(sim.values, percentile)
-
-    # get time indices of peaks in obs and sim.
-    peaks_obs_times, _ = signal.find_peaks(obs, distance=30, height=min_obs_height)
-    peaks_sim_times, _ = signal.find_peaks(sim, distance=30, height=min_sim_height)
-
-    if len(peaks_obs_times) == 0:
-        return 0.
-
     # infer name of datetime index
     if datetime_coord is None:
         datetime_coord = utils.infer_datetime_coord(obs)
 
-    # infer a reasonable window size
-    if window is None:
-        window = max(int(utils.get_frequency_factor('12h', resolution)), 1)
-
-    # count missed peaks
-    missed_events = 0
-
-    for idx in peaks_obs_times:
-
-        # skip peaks at the start and end of the sequence and peaks around missing observations
-        # (NaNs that were removed in obs & sim would result in windows that span too much time).
-        if (idx - window < 0) or (idx + window >= len(obs)) or (pd.date_range(obs[idx - window][datetime_coord].values,
-                                                                              obs[idx + window][datetime_coord].values,
-                                                                              freq=resolution).size != 2 * window + 1):
-            continue
-
-        nearby_peak_sim_index = np.where(np.abs(peaks_sim_times - idx) <= window)[0]
-        if len(nearby_peak_sim_index) == 0:
-            missed_events += 1
-
-    return missed_events / len(peaks_obs_times)
+    return _missed_peaks(obs.values, sim.values, obs[datetime_coord].values, window, resolution, percentile)
 
 
 def mean_absolute_percentage_peak_error(obs: DataArray, sim: DataArray) -> float:
@@ -734,20 +673,81 @@ def mean_absolute_percentage_peak_error(obs: DataArray, sim: DataArray) -> float
     # get time series with only valid observations
     obs, sim = _mask_valid(obs, sim)
 
+    return _mean_absolute_percentage_peak_error(obs.values, sim.values)
+
+
+def _mean_peak_timing(obs: np.ndarray, sim: np.ndarray, dates: np.ndarray, window: int, resolution: str) -> float:
+    """Mean peak timing error of time series without NaNs. See `mean_peak_timing`."""
+    # heuristic to get indices of peaks and their corresponding height.
+    peaks, _ = signal.find_peaks(obs, distance=100, prominence=np.std(obs))
+
+    if window is None:
+        # infer a reasonable window size
+        window = max(int(utils.get_frequency_factor('12h', resolution)), 3)
+
+    # skip peaks at the start and end of the sequence and peaks around missing observations
+    # (NaNs that were removed in obs & sim would result in windows that span too much time).
+    peaks = _get_peaks_with_complete_window(peaks, dates, window, resolution)
+    if len(peaks) == 0:
+        return np.nan
+
+    # take the simulated value at the observed peak if both neighbors are smaller, otherwise define the simulated
+    # peak as the max value inside of the window
+    windows = np.lib.stride_tricks.sliding_window_view(sim, 2 * window + 1)[peaks - window]
+    is_peak = (sim[peaks] > sim[peaks - 1]) & (sim[peaks] > sim[peaks + 1])
+    peaks_sim = np.where(is_peak, peaks, peaks - window + windows.argmax(axis=1))
+
+    # time difference between the peaks, in multiples of the resolution
+    timing_errors = np.abs((dates[peaks] - dates[peaks_sim]) / pd.to_timedelta(resolution))
+    return np.mean(timing_errors)
+
+
+def _missed_peaks(obs: np.ndarray, sim: np.ndarray, dates: np.ndarray, window: int, resolution: str,
+                  percentile: float) -> float:
+    """Fraction of missed peaks of time series without NaNs. See `missed_peaks`."""
+    # minimum height of a peak, as defined by percentile, which can be passed
+    min_obs_height = np.percentile(obs, percentile)
+    min_sim_height = np.percentile(sim, percentile)
+
+    # get time indices of peaks in obs and sim.
+    peaks_obs_times, _ = signal.find_peaks(obs, distance=30, height=min_obs_height)
+    peaks_sim_times, _ = signal.find_peaks(sim, distance=30, height=min_sim_height)
+
+    if len(peaks_obs_times) == 0:
+        return 0.
+
+    # infer a reasonable window size
+    if window is None:
+        window = max(int(utils.get_frequency_factor('12h', resolution)), 1)
+
+    # skip peaks at the start and end of the sequence and peaks around missing observations
+    peaks = _get_peaks_with_complete_window(peaks_obs_times, dates, window, resolution)
+
+    # an observed peak is missed if there is no simulated peak within the window. find_peaks returns sorted indices,
+    # so it suffices to check the first simulated peak that is not before the window.
+    nearby = np.searchsorted(peaks_sim_times, peaks - window)
+    peaks_sim_times = np.append(peaks_sim_times, np.iinfo(peaks_sim_times.dtype).max)
+    missed_events = np.sum(peaks_sim_times[nearby] > peaks + window)
+
+    return missed_events / len(peaks_obs_times)
+
+
+def _mean_absolute_percentage_peak_error(obs: np.ndarray, sim: np.ndarray) -> float:
+    """Peak MAPE of time series without NaNs. See `mean_absolute_percentage_peak_error`."""
     # return np.nan if there are no valid observed or simulated values
     if obs.size == 0 or sim.size == 0:
         return np.nan
 
     # heuristic to get indices of peaks and their corresponding height.
-    peaks, _ = signal.find_peaks(obs.values, distance=100, prominence=np.std(obs.values))
+    peaks, _ = signal.find_peaks(obs, distance=100, prominence=np.std(obs))
 
     # check if any peaks exist, otherwise return np.nan
     if peaks.size == 0:
         return np.nan
 
     # subset data to only peak values
-    obs = obs[peaks].values
-    sim = sim[peaks].values
+    obs = obs[peaks]
+    sim = sim[peaks]
 
     # calculate the mean absolute percentage peak error
     peak_mape = np.sum(np.abs((sim - obs) / obs)) / peaks.size * 100
@@ -755,6 +755,348 @@ def mean_absolute_percentage_peak_error(obs: DataArray, sim: DataArray) -> float
     return peak_mape
 
 
+def _get_peaks_with_complete_window(peaks: np.ndarray, dates: np.ndarray, window: int, resolution: str) -> np.ndarray:
+    """Subset peaks to those with `window` time steps on either side and no missing time steps inside the window.
+
+    A window is complete if a date range from its first to its last date, with the resolution as frequency, has
+    exactly ``2 * window + 1`` dates. This is checked with integer time offsets instead of creating the date ranges.
+    """
+    peaks = peaks[(peaks - window >= 0) & (peaks + window < len(dates))]
+    offsets = dates.astype('datetime64[ns]').astype(np.int64)
+    n_steps = (offsets[peaks + window] - offsets[peaks - window]) // pd.to_timedelta(resolution).value
+    return peaks[n_steps == 2 * window]
+
+
+# metrics that `calculate_multi_basin_metrics` computes for all basins at once from shared statistics
+_VECTORIZED_METRICS = [
+    "NSE", "MSE", "RMSE", "KGE", "Alpha-NSE", "Pearson-r", "Beta-KGE", "Beta-NSE", "FHV", "FMS", "FLV"
+]
+
+# metrics of `calculate_all_metrics`, in the order of the results
+_ALL_METRICS = [
+    "NSE", "MSE", "RMSE", "KGE", "Alpha-NSE", "Beta-KGE", "Beta-NSE", "Pearson-r", "FHV", "FMS", "FLV", "Peak-Timing",
+    "Peak-MAPE"
+]
+
+
+def calculate_multi_basin_metrics(obs: Union[np.ndarray, torch.Tensor],
+                                  sim: Union[np.ndarray, torch.Tensor],
+                                  metrics: List[str],
+                                  mask: Union[np.ndarray, torch.Tensor] = None,
+                                  resolution: str = "1D",
+                                  dates: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Calculate metrics with default values for many basins at once.
+
+    Instead of masking and validating the inputs for each basin and metric, all metrics are computed in one pass over
+    dense arrays of all basins. The metrics share the sufficient statistics (counts, means, variances, covariances and
+    the sorted flow duration curves), which are computed once in double precision. The results agree with the metric
+    functions of this module (e.g., `nse`) up to floating point rounding. The peak metrics are computed per basin, on
+    plain arrays.
+
+    Parameters
+    ----------
+    obs : Union[np.ndarray, torch.Tensor]
+        Observed time series of shape [basin, time].
+    sim : Union[np.ndarray, torch.Tensor]
+        Simulated time series of shape [basin, time].
+    metrics : List[str]
+        List of metric names, or 'all' for the metrics of `calculate_all_metrics`.
+    mask : Union[np.ndarray, torch.Tensor], optional
+        Boolean array of shape [basin, time] that is False for time steps to ignore. Time steps with NaN observations or
+        simulations are always ignored.
+    resolution : str, optional
+        Temporal resolution of the time series in pandas format, e.g. '1D' for daily and '1h' for hourly.
+    dates : np.ndarray, optional
+        Dates of the time steps, of shape [time]. Required for the metrics 'Peak-Timing' and 'Missed-Peaks'.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Dictionary with keys corresponding to metric name and values of shape [basin]. Basins without valid time steps
+        get NaN values.
+    """
+    obs, sim = _to_numpy(obs).astype(np.float64), _to_numpy(sim).astype(np.float64)
+    if obs.shape != sim.shape or obs.ndim != 2:
+        raise RuntimeError("Observations and simulations must be arrays of the same shape [basin, time]")
+    valid = ~np.isnan(obs) & ~np.isnan(sim)
+    if mask is not None:
+        valid &= _to_numpy(mask).astype(bool)
+
+    if "all" in metrics:
+        metrics = _ALL_METRICS
+    metric_names = []
+    for metric in metrics:
+        if metric.lower() not in _METRIC_NAMES:
+            raise RuntimeError(f"Unknown metric {metric}")
+        metric_names.append(_METRIC_NAMES[metric.lower()])
+
+    stats = _BasinStatistics(obs, sim, valid)
+    values = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for metric in metric_names:
+            if metric in _VECTORIZED_METRICS:
+                values[metric] = stats.get_metric(metric)
+            else:
+                values[metric] = _get_peak_metric(metric, obs, sim, valid, resolution, dates)
+    return values
+
+
+class _BasinStatistics(object):
+    """Sufficient statistics of many basins, shared by the vectorized metrics and computed on first use."""
+
+    def __init__(self, obs: np.ndarray, sim: np.ndarray, valid: np.ndarray):
+        self.obs = obs
+        self.sim = sim
+        self.valid = valid
+        self.n = valid.sum(axis=1)
+        self._moments = None
+        self._fdcs = None
+
+    def get_metric(self, metric: str) -> np.ndarray:
+        if metric in ["FHV", "FMS", "FLV"]:
+            return self._get_fdc_metric(metric)
+        mean_obs, mean_sim, var_obs, var_sim, cov, sse = self._get_moments()
+        std_obs, std_sim = np.sqrt(var_obs), np.sqrt(var_sim)
+        if metric == "NSE":
+            return 1 - sse / (var_obs * self.n)
+        if metric == "MSE":
+            return sse / self.n
+        if metric == "RMSE":
+            return np.sqrt(sse / self.n)
+        if metric == "Alpha-NSE":
+            return std_sim / std_obs
+        if metric == "Beta-KGE":
+            return mean_sim / mean_obs
+        if metric == "Beta-NSE":
+            return (mean_sim - mean_obs) / std_obs
+        # like scipy.stats.pearsonr, clip the correlation to [-1, 1] and require at least two values
+        r = np.where(self.n < 2, np.nan, np.clip(cov / (std_obs * std_sim), -1, 1))
+        if metric == "Pearson-r":
+            return r
+        return 1 - np.sqrt((r - 1)**2 + (std_sim / std_obs - 1)**2 + (mean_sim / mean_obs - 1)**2)
+
+    def _get_moments(self) -> Tuple[np.ndarray, ...]:
+        if self._moments is None:
+            obs = np.where(self.valid, self.obs, 0)
+            sim = np.where(self.valid, self.sim, 0)
+            mean_obs = obs.sum(axis=1) / self.n
+            mean_sim = sim.sum(axis=1) / self.n
+            # two-pass (centered) moments, which are numerically stable
+            obs_anomaly = np.where(self.valid, obs - mean_obs[:, None], 0)
+            sim_anomaly = np.where(self.valid, sim - mean_sim[:, None], 0)
+            var_obs = (obs_anomaly**2).sum(axis=1) / self.n
+            var_sim = (sim_anomaly**2).sum(axis=1) / self.n
+            cov = (obs_anomaly * sim_anomaly).sum(axis=1) / self.n
+            sse = ((sim - obs)**2).sum(axis=1)
+            self._moments = (mean_obs, mean_sim, var_obs, var_sim, cov, sse)
+        return self._moments
+
+    def _get_fdcs(self) -> Tuple[np.ndarray, np.ndarray]:
+        # ascending flow duration curves, with the invalid time steps (as NaN) at the end of each row. The k-th largest
+        # value of a basin with n valid values is at position n - 1 - k.
+        if self._fdcs is None:
+            self._fdcs = (np.sort(np.where(self.valid, self.obs, np.nan), axis=1),
+                          np.sort(np.where(self.valid, self.sim, np.nan), axis=1))
+        return self._fdcs
+
+    def _get_fdc_metric(self, metric: str) -> np.ndarray:
+        obs, sim = self._get_fdcs()
+        n = self.n[:, None]
+        position = np.arange(obs.shape[1])[None, :]
+        if metric == "FHV":
+            # the round(0.02 * n) highest flows
+            top = (position >= n - np.round(0.02 * n)) & (position < n)
+            value = np.where(top, sim - obs, 0).sum(axis=1) / np.where(top, obs, 0).sum(axis=1)
+            return np.where(self.n < 1, np.nan, value * 100)
+
+        # for numerical reasons change 0s to 1e-6. Simulations can still contain negatives, so also reset those.
+        sim = np.where(sim <= 0, 1e-6, sim)
+        obs = np.where(obs == 0, 1e-6, obs)
+        if metric == "FMS":
+            log_obs, log_sim = [], []
+            for fraction in [0.2, 0.7]:
+                # index into the ascending curve of the value at position round(fraction * n) of the descending curve
+                idx = self.n - 1 - np.round(fraction * self.n).astype(int)
+                in_range = idx >= 0
+                idx = np.clip(idx, 0, None)[:, None]
+                log_obs.append(np.where(in_range, np.log(np.take_along_axis(obs, idx, axis=1)[:, 0]), np.nan))
+                log_sim.append(np.where(in_range, np.log(np.take_along_axis(sim, idx, axis=1)[:, 0]), np.nan))
+            value = ((log_sim[0] - log_sim[1]) - (log_obs[0] - log_obs[1])) / (log_obs[0] - log_obs[1] + 1e-6)
+            return np.where(self.n < 1, np.nan, value * 100)
+
+        # FLV: the round(0.3 * n) lowest flows. Like slicing with [-0:], zero flows mean all flows.
+        n_low = np.round(0.3 * n)
+        low = position < np.where(n_low == 0, n, n_low)
+        log_obs, log_sim = np.log(np.where(low, obs, 1)), np.log(np.where(low, sim, 1))
+        qsl = np.where(low, log_sim - np.where(low, log_sim, np.inf).min(axis=1, keepdims=True), 0).sum(axis=1)
+        qol = np.where(low, log_obs - np.where(low, log_obs, np.inf).min(axis=1, keepdims=True), 0).sum(axis=1)
+        value = -1 * (qsl - qol) / (qol + 1e-6)
+        return np.where(self.n < 1, np.nan, value * 100)
+
+
+def _get_peak_metric(metric: str, obs: np.ndarray, sim: np.ndarray, valid: np.ndarray, resolution: str,
+                     dates: np.ndarray) -> np.ndarray:
+    """Compute a peak metric basin by basin, on the valid time steps of each basin.
+
+    The basins are processed serially: without the per-peak Python loop, the remaining work per basin is a few
+    vectorized NumPy calls, and parallel processes would mostly add the cost of sending the time series to them.
+    `nh-results-ensemble` already calculates the metrics of chunks of basins in parallel worker processes.
+    """
+    if dates is None and metric in ["Peak-Timing", "Missed-Peaks"]:
+        raise ValueError(f"{metric} requires the dates of the time steps.")
+    values = np.full(obs.shape[0], np.nan)
+    for i in range(obs.shape[0]):
+        if not valid[i].any():
+            continue
+        basin_obs, basin_sim = obs[i, valid[i]], sim[i, valid[i]]
+        if metric == "Peak-Timing":
+            values[i] = _mean_peak_timing(basin_obs, basin_sim, dates[valid[i]], None, resolution)
+        elif metric == "Missed-Peaks":
+            values[i] = _missed_peaks(basin_obs, basin_sim, dates[valid[i]], None, resolution, 80)
+        else:
+            values[i] = _mean_absolute_percentage_peak_error(basin_obs, basin_sim)
+    return values
+
+
+def _to_numpy(values: Union[np.ndarray, torch.Tensor]) -> np.ndarray:
+    if isinstance(values, torch.Tensor):
+        return values.detach().cpu().numpy()
+    return np.asarray(values)
+
+
+class StreamingMetrics(object):
+    """Accumulate the sufficient statistics of the metrics of many basins, batch by batch, on the device of the batches.
+
+    For each basin and target variable, the number of valid observations, the number of time steps where both
+    observations and simulations are valid, the means of the observations and simulations, and the sums of the squared
+    deviations from these means and of the products of the deviations are accumulated in double precision (single
+    precision on MPS devices, which do not support double). The centered statistics of each batch are computed in two
+    passes and merged with the statistics of the previous batches (Chan et al., 1979), which avoids the cancellation
+    of raw sums of squares, e.g., for large discharge values in single precision. The metrics in
+    `StreamingMetrics.METRICS` are derived from these statistics, such that the time series never have to be collected.
+    The values agree with `calculate_metrics` up to floating point rounding.
+
+    Parameters
+    ----------
+    n_basins : int
+        Number of basins.
+    n_targets : int
+        Number of target variables.
+    device : torch.device
+        Device on which the batches are passed and the statistics are accumulated.
+    """
+
+    METRICS = ["NSE", "MSE", "RMSE", "KGE", "Alpha-NSE", "Pearson-r", "Beta-KGE", "Beta-NSE"]
+
+    def __init__(self, n_basins: int, n_targets: int, device: torch.device):
+        dtype = torch.float32 if device.type == "mps" else torch.float64
+        # number of observations, number of valid pairs, mean of obs and sim, squared deviations of obs and sim, and
+        # products of the deviations of obs and sim
+        self._stats = torch.zeros((7, n_basins, n_targets), dtype=dtype, device=device)
+
+    def update(self, obs: torch.Tensor, sim: torch.Tensor, basin_index: torch.Tensor):
+        """Add a batch of observations and simulations to the statistics of their basins.
+
+        Parameters
+        ----------
+        obs : torch.Tensor
+            Observations of shape [batch size, time steps, targets]. NaNs are ignored.
+        sim : torch.Tensor
+            Simulations of the same shape as `obs`. NaNs are ignored.
+        basin_index : torch.Tensor
+            Index of the basin of each sample, of shape [batch size].
+        """
+        has_obs = ~torch.isnan(obs)
+        valid = has_obs & ~torch.isnan(sim)
+        dtype = self._stats.dtype
+        obs = torch.where(valid, obs, 0).to(dtype)
+        sim = torch.where(valid, sim, 0).to(dtype)
+        valid = valid.to(dtype)
+
+        # first pass: counts and means of the batch, per basin
+        batch = torch.zeros_like(self._stats)
+        batch[:4].index_add_(1, basin_index, torch.stack([has_obs.to(dtype), valid, obs, sim]).sum(dim=2))
+        n_batch = batch[1]
+        batch[2:4] /= n_batch.clamp(min=1)
+        # second pass: deviations from the batch means of the basins
+        obs_dev = (obs - batch[2, basin_index].unsqueeze(1)) * valid
+        sim_dev = (sim - batch[3, basin_index].unsqueeze(1)) * valid
+        batch[4:].index_add_(1, basin_index, torch.stack([obs_dev**2, sim_dev**2, obs_dev * sim_dev]).sum(dim=2))
+
+        # merge with the statistics of the previous batches
+        n_prev = self._stats[1].clone()
+        n = n_prev + n_batch
+        weight = n_batch / n.clamp(min=1)
+        delta_obs, delta_sim = batch[2] - self._stats[2], batch[3] - self._stats[3]
+        self._stats[0] += batch[0]
+        self._stats[1] = n
+        self._stats[2] += delta_obs * weight
+        self._stats[3] += delta_sim * weight
+        self._stats[4] += batch[4] + delta_obs**2 * n_prev * weight
+        self._stats[5] += batch[5] + delta_sim**2 * n_prev * weight
+        self._stats[6] += batch[6] + delta_obs * delta_sim * n_prev * weight
+
+    def has_observations(self) -> np.ndarray:
+        """Return a boolean array of shape [basins, targets] that is True where valid observations were added."""
+        return (self._stats[0] > 0).cpu().numpy()
+
+    def compute(self, metrics: List[str]) -> Dict[str, np.ndarray]:
+        """Calculate metrics from the accumulated statistics.
+
+        Parameters
+        ----------
+        metrics : List[str]
+            List of metric names, which must be in `StreamingMetrics.METRICS`.
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            Dictionary with keys corresponding to metric name and values of shape [basins, targets]. Basins without
+            valid time steps get NaN values.
+
+        Raises
+        ------
+        RuntimeError
+            If a metric cannot be derived from the accumulated statistics.
+        """
+        # basins without valid pairs have n = 0, such that all metrics are NaN (0 / 0)
+        _, n, mean_obs, mean_sim, m2_obs, m2_sim, co = self._stats
+        mean_obs = torch.where(n > 0, mean_obs, torch.nan)
+        std_obs, std_sim = (m2_obs / n).sqrt(), (m2_sim / n).sqrt()
+        sse = (m2_obs + m2_sim - 2 * co + n * (mean_sim - mean_obs)**2).clamp(min=0)
+        # like scipy.stats.pearsonr, clip the correlation to [-1, 1] and require at least two values
+        r = (co / (m2_obs * m2_sim).sqrt()).clamp(-1, 1)
+        r = torch.where(n < 2, torch.nan, r)
+
+        values = {}
+        for metric in metrics:
+            name = _METRIC_NAMES.get(metric.lower())
+            if name == "NSE":
+                value = 1 - sse / m2_obs
+            elif name == "MSE":
+                value = sse / n
+            elif name == "RMSE":
+                value = (sse / n).sqrt()
+            elif name == "KGE":
+                value = 1 - ((r - 1)**2 + (std_sim / std_obs - 1)**2 + (mean_sim / mean_obs - 1)**2).sqrt()
+            elif name == "Alpha-NSE":
+                value = std_sim / std_obs
+            elif name == "Pearson-r":
+                value = r
+            elif name == "Beta-KGE":
+                value = mean_sim / mean_obs
+            elif name == "Beta-NSE":
+                value = (mean_sim - mean_obs) / std_obs
+            else:
+                raise RuntimeError(f"Metric {metric} cannot be calculated from streaming statistics. "
+                                   f"Supported metrics are {StreamingMetrics.METRICS}.")
+            values[name] = value
+        # copy all metrics to the host at once
+        names = list(values.keys())
+        stacked = torch.stack([values[name] for name in names]).cpu().numpy() if names else []
+        return {name: stacked[i] for i, name in enumerate(names)}
+
+
 def calculate_all_metrics(obs: DataArray,
                           sim: DataArray,
                           resolution: str = "1D",
@@ -783,24 +1125,7 @@ def calculate_all_metrics(obs: DataArray,
         If all observations or all simulations are NaN.
     """
     _check_all_nan(obs, sim)
-
-    results = {
-        "NSE": nse(obs, sim),
-        "MSE": mse(obs, sim),
-        "RMSE": rmse(obs, sim),
-        "KGE": kge(obs, sim),
-        "Alpha-NSE": alpha_nse(obs, sim),
-        "Beta-KGE": beta_kge(obs, sim),
-        "Beta-NSE": beta_nse(obs, sim),
-        "Pearson-r": pearsonr(obs, sim),
-        "FHV": fdc_fhv(obs, sim),
-        "FMS": fdc_fms(obs, sim),
-        "FLV": fdc_flv(obs, sim),
-        "Peak-Timing": mean_peak_timing(obs, sim, resolution=resolution, datetime_coord=datetime_coord),
-        "Peak-MAPE": mean_absolute_percentage_peak_error(obs, sim)
-    }
-
-    return results
+    return _calculate_metrics(obs, sim, _ALL_METRICS, resolution=resolution, datetime_coord=datetime_coord)
 
 
 def calculate_metrics(obs: DataArray,
@@ -838,38 +1163,33 @@ def calculate_metrics(obs: DataArray,
 
     _check_all_nan(obs, sim)
 
+    metric_names = []
+    for metric in metrics:
+        if metric.lower() not in _METRIC_NAMES:
+            raise RuntimeError(f"Unknown metric {metric}")
+        metric_names.append(_METRIC_NAMES[metric.lower()])
+
+    return _calculate_metrics(obs, sim, metric_names, resolution=resolution, datetime_coord=datetime_coord)
+
+
+def _calculate_metrics(obs: DataArray, sim: DataArray, metrics: List[str], resolution: str,
+                       datetime_coord: str) -> Dict[str, float]:
+    """Calculate metrics of a single time series, using the vectorized implementation where available."""
+    _validate_inputs(obs, sim)
+
+    vectorized_values = calculate_multi_basin_metrics(obs.values.reshape(1, -1),
+                                                      sim.values.reshape(1, -1),
+                                                      [metric for metric in metrics if metric in _VECTORIZED_METRICS])
     values = {}
     for metric in metrics:
-        if metric.lower() == "nse":
-            values["NSE"] = nse(obs, sim)
-        elif metric.lower() == "mse":
-            values["MSE"] = mse(obs, sim)
-        elif metric.lower() == "rmse":
-            values["RMSE"] = rmse(obs, sim)
-        elif metric.lower() == "kge":
-            values["KGE"] = kge(obs, sim)
-        elif metric.lower() == "alpha-nse":
-            values["Alpha-NSE"] = alpha_nse(obs, sim)
-        elif metric.lower() == "beta-kge":
-            values["Beta-KGE"] = beta_kge(obs, sim)
-        elif metric.lower() == "beta-nse":
-            values["Beta-NSE"] = beta_nse(obs, sim)
-        elif metric.lower() == "pearson-r":
-            values["Pearson-r"] = pearsonr(obs, sim)
-        elif metric.lower() == "fhv":
-            values["FHV"] = fdc_fhv(obs, sim)
-        elif metric.lower() == "fms":
-            values["FMS"] = fdc_fms(obs, sim)
-        elif metric.lower() == "flv":
-            values["FLV"] = fdc_flv(obs, sim)
-        elif metric.lower() == "peak-timing":
-            values["Peak-Timing"] = mean_peak_timing(obs, sim, resolution=resolution, datetime_coord=datetime_coord)
-        elif metric.lower() == "missed-peaks":
-            values["Missed-Peaks"] = missed_peaks(obs, sim, resolution=resolution, datetime_coord=datetime_coord)
-        elif metric.lower() == "peak-mape":
-            values["Peak-MAPE"] = mean_absolute_percentage_peak_error(obs, sim)
+        if metric in vectorized_values:
+            values[metric] = float(vectorized_values[metric][0])
+        elif metric == "Peak-Timing":
+            values[metric] = mean_peak_timing(obs, sim, resolution=resolution, datetime_coord=datetime_coord)
+        elif metric == "Missed-Peaks":
+            values[metric] = missed_peaks(obs, sim, resolution=resolution, datetime_coord=datetime_coord)
         else:
-            raise RuntimeError(f"Unknown metric {metric}")
+            values[metric] = mean_absolute_percentage_peak_error(obs, sim)
 
     return values
 
@@ -0,0 +1,244 @@
+import json
+import os
+import pickle
+import shutil
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+import xarray
+
+from neuralhydrology.evaluation.utils import metrics_to_dataframe
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+class ResultsWriter(object):
+    """Write evaluation results to a results store on disk, one basin at a time.
+
+    A results store is a folder with one uncompressed ``.npz`` file per basin for the result time series and, if
+    requested, one per basin for the raw model output. Because netCDF files do not support arbitrary variable names,
+    the arrays are stored under generic keys. The file ``manifest.jsonl`` has one line per written file, which maps
+    the keys back to the variable names and dimensions and contains the metrics of the basin. A line is only appended
+    after its file was completely written, such that all basins listed in the manifest can be read even if the
+    evaluation is interrupted. Additionally, the metrics can be appended to a csv file, one row per basin.
+
+    Use `ResultsStore` to read the results.
+
+    Parameters
+    ----------
+    store_dir : Path
+        Folder of the results store. An existing store in this folder is replaced.
+    metrics_file : Path, optional
+        If passed, the metrics of each basin are appended to this csv file, which is replaced if it exists.
+    metrics : List[str], optional
+        Metric names (without frequency suffix) of the columns of the csv file.
+    targets : List[str], optional
+        Target variable names, used to derive the columns of the csv file.
+    """
+
+    def __init__(self,
+                 store_dir: Path,
+                 metrics_file: Path = None,
+                 metrics: List[str] = None,
+                 targets: List[str] = None):
+        self.store_dir = Path(store_dir)
+        if self.store_dir.is_dir():
+            shutil.rmtree(self.store_dir)
+        self.store_dir.mkdir(parents=True)
+        (self.store_dir / MANIFEST_FILE).touch()
+        self._n_files = 0
+
+        self._metrics_file = metrics_file
+        self._metrics = metrics
+        self._targets = targets
+        self._metrics_columns = None
+        if self._metrics_file is not None and self._metrics_file.is_file():
+            self._metrics_file.unlink()
+
+    def add_results(self, basin: str, basin_results: Dict[str, dict]):
+        """Write the results of one basin.
+
+        Parameters
+        ----------
+        basin : str
+            The basin id.
+        basin_results : Dict[str, dict]
+            The results of the basin, as returned by the tester: for each frequency, a dictionary that contains the
+            result xarray under the key 'xr', and the metrics.
+        """
+        arrays, frequencies = {}, {}
+        for i, (freq, freq_results) in enumerate(basin_results.items()):
+            xr = freq_results["xr"]
+            coords = {}
+            for j, name in enumerate(xr.coords):
+                coords[name] = f"{i}_c{j}"
+                arrays[coords[name]] = xr.coords[name].values
+            variables = []
+            for j, name in enumerate(xr.data_vars):
+                variables.append({"name": name, "dims": list(xr[name].dims), "key": f"{i}_v{j}"})
+                arrays[variables[-1]["key"]] = xr[name].values
+            metrics = {key: float(value) for key, value in freq_results.items() if key != "xr"}
+            frequencies[freq] = {"coords": coords, "variables": variables, "metrics": metrics}
+        self._write_file(basin, "results", arrays, {"frequencies": frequencies})
+
+        if self._metrics_file is not None:
+            self._append_metrics(basin, basin_results)
+
+    def add_all_output(self, basin: str, all_output: Dict[str, np.ndarray]):
+        """Write the raw model output of one basin.
+
+        Parameters
+        ----------
+        basin : str
+            The basin id.
+        all_output : Dict[str, np.ndarray]
+            The model output of the basin, as collected by the tester.
+        """
+        keys = {name: f"o{i}" for i, name in enumerate(all_output.keys())}
+        self._write_file(basin, "all_output", {keys[name]: values for name, values in all_output.items()},
+                         {"keys": keys})
+
+    def _write_file(self, basin: str, kind: str, arrays: Dict[str, np.ndarray], entry: dict):
+        file_name = f"{self._n_files}.npz"
+        self._n_files += 1
+        # write to a temporary file first, such that the store never contains incomplete files
+        tmp_file = self.store_dir / f"{file_name}.tmp"
+        with tmp_file.open("wb") as fp:
+            np.savez(fp, **arrays)
+        os.replace(tmp_file, self.store_dir / file_name)
+        with (self.store_dir / MANIFEST_FILE).open("a") as fp:
+            fp.write(json.dumps({"basin": basin, "kind": kind, "file": file_name, **entry}) + "\n")
+
+    def _append_metrics(self, basin: str, basin_results: Dict[str, dict]):
+        df = metrics_to_dataframe({basin: basin_results}, self._metrics, self._targets)
+        if self._metrics_columns is None:
+            self._metrics_columns = df.columns
+        df.reindex(columns=self._metrics_columns).to_csv(self._metrics_file,
+                                                         mode="a",
+                                                         header=not self._metrics_file.is_file())
+
+
+class ResultsStore(Mapping):
+    """Read-only access to a results store, as written by `ResultsWriter`.
+
+    The store behaves like the dictionary of results returned by the tester: it maps basin ids to a dictionary that
+    contains, for each frequency, the result xarray under the key 'xr' and the metrics. The time series of a basin are
+    only read from disk when the basin is accessed.
+
+    Parameters
+    ----------
+    store_dir : Path
+        Folder of the results store.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self._entries = {"results": {}, "all_output": {}}
+        with (self.store_dir / MANIFEST_FILE).open("r") as fp:
+            for line in fp:
+                if not line.endswith("\n"):
+                    break  # the evaluation was interrupted while writing this line
+                entry = json.loads(line)
+                self._entries[entry["kind"]][entry["basin"]] = entry
+
+    def __getitem__(self, basin: str) -> Dict[str, dict]:
+        results = {}
+        for freq, (coords, data_vars) in self.read_arrays(basin).items():
+            metrics = self._entries["results"][basin]["frequencies"][freq]["metrics"]
+            results[freq] = {"xr": xarray.Dataset(data_vars=data_vars, coords=coords), **metrics}
+        return results
+
+    def read_arrays(self, basin: str) -> Dict[str, Tuple[Dict[str, np.ndarray], Dict[str, tuple]]]:
+        """Read the result time series of a basin as plain arrays, which is faster than creating the xarray datasets.
+
+        Parameters
+        ----------
+        basin : str
+            The basin id.
+
+        Returns
+        -------
+        Dict[str, Tuple[Dict[str, np.ndarray], Dict[str, tuple]]]
+            For each frequency, the coordinates (name -> values) and the variables (name -> (dimensions, values)).
+        """
+        entry = self._entries["results"][basin]
+        results = {}
+        with np.load(self.store_dir / entry["file"], allow_pickle=False) as arrays:
+            for freq, freq_entry in entry["frequencies"].items():
+                coords = {name: arrays[key] for name, key in freq_entry["coords"].items()}
+                data_vars = {var["name"]: (var["dims"], arrays[var["key"]]) for var in freq_entry["variables"]}
+                results[freq] = (coords, data_vars)
+        return results
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries["results"])
+
+    def __len__(self) -> int:
+        return len(self._entries["results"])
+
+    def __contains__(self, basin: object) -> bool:
+        # avoid reading the basin file, as the default implementation of `Mapping` would
+        return basin in self._entries["results"]
+
+    @property
+    def metrics(self) -> Dict[str, Dict[str, dict]]:
+        """Metrics of all basins, without reading the time series: basin id -> frequency -> metric name -> value."""
+        return {
+            basin: {freq: freq_entry["metrics"] for freq, freq_entry in entry["frequencies"].items()
+                   } for basin, entry in self._entries["results"].items()
+        }
+
+    @property
+    def all_output(self) -> "StoredOutput":
+        """The raw model output of all basins, if it was stored."""
+        return StoredOutput(self.store_dir, self._entries["all_output"])
+
+
+class StoredOutput(Mapping):
+    """Read-only access to the raw model output in a results store, which maps basin ids to dictionaries of arrays.
+
+    Parameters
+    ----------
+    store_dir : Path
+        Folder of the results store.
+    entries : Dict[str, dict]
+        The manifest entries of the model output files, per basin.
+    """
+
+    def __init__(self, store_dir: Path, entries: Dict[str, dict]):
+        self.store_dir = store_dir
+        self._entries = entries
+
+    def __getitem__(self, basin: str) -> Dict[str, np.ndarray]:
+        entry = self._entries[basin]
+        with np.load(self.store_dir / entry["file"], allow_pickle=False) as arrays:
+            return {name: arrays[key] for name, key in entry["keys"].items()}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def load_results(path: Path) -> Union[ResultsStore, dict]:
+    """Load evaluation results, either from a results store or from a pickle file.
+
+    Parameters
+    ----------
+    path : Path
+        Folder of a results store (e.g., ``test_results``), or a pickled results file (e.g., ``test_results.p``).
+
+    Returns
+    -------
+    Union[ResultsStore, dict]
+        The results, which map basin ids to the per-frequency result dictionaries. A results store is read lazily.
+    """
+    path = Path(path)
+    if path.is_dir():
+        return ResultsStore(path)
+    with path.open("rb") as fp:
+        return pickle.load(fp)
+
@@ -5,7 +5,7 @@ from typing import Dict, List, Tuple
 from dateutil.relativedelta import relativedelta
 
 import numpy as np
-from numba import njit
+from numba import njit, prange
 from xarray.core.dataarray import DataArray
 
 from neuralhydrology.datautils import utils
@@ -127,6 +127,101 @@ def calculate_signatures(da: DataArray,
     return values
 
 
+def calculate_multi_basin_signatures(flow: np.ndarray,
+                                     dates: np.ndarray,
+                                     signatures: List[str],
+                                     prcp: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Calculate the specified signatures with default values for many basins at once.
+
+    All signatures are computed in one pass over the arrays of all basins, which share the intermediate results: the
+    sorted flow duration curves (for 'q5', 'q95' and 'slope_fdc'), the grouping of the time steps into calendar years
+    (for 'high_q_freq' and 'low_q_freq') and hydrological years (for 'hfd_mean' and 'stream_elas'). The run-length
+    based durations and the baseflow filter are compiled with numba and run in parallel across basins. The values agree
+    with the signature functions of this module (e.g., `high_q_freq`) up to floating point rounding.
+
+    Parameters
+    ----------
+    flow : np.ndarray
+        Array of discharge values of shape [basin, time].
+    dates : np.ndarray
+        Dates of the time steps, of shape [time].
+    signatures : List[str]
+        List of names of the signatures to calculate.
+    prcp : np.ndarray, optional
+        Array of precipitation values of shape [basin, time]. Required for signatures 'runoff_ratio' and
+        'stream_elas'.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Dictionary with signature names as keys and arrays of shape [basin] with the signature values as values.
+
+    Raises
+    ------
+    ValueError
+        If a passed signature name does not exist, if the shapes of the arrays do not match, or if the precipitation is
+        required but not passed.
+    """
+    flow = np.ascontiguousarray(flow, dtype=np.float64)
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    if flow.ndim != 2 or flow.shape[1] != len(dates):
+        raise ValueError("flow must have the shape [basin, time], with one date per time step.")
+    unknown_signatures = [signature for signature in signatures if signature not in get_available_signatures()]
+    if unknown_signatures:
+        raise ValueError(f"Unknown signatures {unknown_signatures}")
+    if prcp is not None:
+        prcp = np.asarray(prcp, dtype=np.float64)
+        if prcp.shape != flow.shape:
+            raise ValueError("prcp must have the same shape as flow.")
+    elif "runoff_ratio" in signatures or "stream_elas" in signatures:
+        raise ValueError("The signatures 'runoff_ratio' and 'stream_elas' require precipitation.")
+
+    # intermediate results that are shared between signatures, computed on first use
+    fdc, calendar_years, hydrological_years = None, None, None
+
+    values = {}
+    # empty years and basins without valid values result in NaNs, like in the single-basin signatures
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        for signature in signatures:
+            if signature in ["high_q_freq", "low_q_freq"]:
+                if calendar_years is None:
+                    calendar_years = _get_year_segments(dates, month=1)
+                if signature == "high_q_freq":
+                    condition = flow > 9. * np.nanmedian(flow, axis=1, keepdims=True)
+                else:
+                    condition = flow < 0.2 * np.nanmean(flow, axis=1, keepdims=True)
+                values[signature] = _mean_count_per_year(condition, calendar_years)
+            elif signature == "high_q_dur":
+                values[signature] = _mean_run_length(flow > 9. * np.nanmedian(flow, axis=1, keepdims=True))
+            elif signature == "low_q_dur":
+                values[signature] = _mean_run_length(flow < 0.2 * np.nanmean(flow, axis=1, keepdims=True))
+            elif signature == "zero_q_freq":
+                values[signature] = (flow == 0).sum(axis=1) / flow.shape[1]
+            elif signature in ["q5", "q95", "slope_fdc"]:
+                if fdc is None:
+                    # ascending flow duration curves, with NaNs at the end of each row
+                    fdc = np.sort(flow, axis=1)
+                if signature == "slope_fdc":
+                    values[signature] = _slope_fdc(fdc)
+                else:
+                    values[signature] = _quantile_of_sorted(fdc, 0.05 if signature == "q5" else 0.95)
+            elif signature == "q_mean":
+                values[signature] = np.nanmean(flow, axis=1)
+            elif signature in ["hfd_mean", "stream_elas"]:
+                if hydrological_years is None:
+                    hydrological_years = _get_year_segments(dates, month=10)
+                if signature == "hfd_mean":
+                    values[signature] = _mean_half_flow_step(flow, hydrological_years)
+                else:
+                    values[signature] = _median_stream_elasticity(flow, prcp, hydrological_years)
+            elif signature == "baseflow_index":
+                values[signature] = _baseflow_index_batch(flow, 0.98, 30, _infer_n_passes(dates))
+            elif signature == "runoff_ratio":
+                values[signature] = np.nanmean(flow, axis=1) / np.nanmean(prcp, axis=1)
+    return values
+
+
 @njit
 def _split_list(alist: list, min_length: int = 0) -> list:
     """Split a list of indices into lists of consecutive indices of at least length `min_length`. """
@@ -503,6 +598,16 @@ def _baseflow_index_jit(streamflow: np.ndarray, alpha: float, warmup: int, n_pas
     return bf_index, overall_baseflow
 
 
+def _infer_n_passes(dates: np.ndarray) -> int:
+    """Default number of baseflow filter passes: 3 for daily and 9 for hourly data."""
+    freq = utils.infer_frequency(dates)
+    if freq == '1D':
+        return 3
+    if freq == '1h':
+        return 9
+    raise ValueError(f'For frequencies other than daily or hourly, n_passes must be specified.')
+
+
 def baseflow_index(da: DataArray,
                    alpha: float = 0.98,
                    warmup: int = 30,
@@ -549,13 +654,7 @@ def baseflow_index(da: DataArray,
         datetime_coord = utils.infer_datetime_coord(da)
 
     if n_passes is None:
-        freq = utils.infer_frequency(da[datetime_coord].values)
-        if freq == '1D':
-            n_passes = 3
-        elif freq == '1h':
-            n_passes = 9
-        else:
-            raise ValueError(f'For frequencies other than daily or hourly, n_passes must be specified.')
+        n_passes = _infer_n_passes(da[datetime_coord].values)
     if n_passes % 2 != 1:
         warnings.warn('n_passes should be an even number. The returned baseflow will be reversed.')
 
@@ -713,3 +812,104 @@ def stream_elas(da: DataArray, prcp: DataArray, datetime_coord: str = None) -> f
         end_date += relativedelta(years=1)
 
     return np.median([float(v) for v in values])
+
+
+def _get_year_segments(dates: np.ndarray, month: int) -> np.ndarray:
+    """Start and end index of the time steps of each full year that starts on the first day of `month`.
+
+    The first year starts on the first occurrence of the first day of `month` in the data period, and years are added
+    as long as they end before the last date, like in the single-basin signatures (e.g., `hfd_mean`).
+    """
+    first_date, last_date = dates[0].astype('datetime64[s]'), dates[-1].astype('datetime64[s]')
+    year = first_date.astype('datetime64[Y]').astype(int) + 1970
+    if np.datetime64(f'{year}-{month:02d}-01T00:00:00') < first_date:
+        year += 1
+
+    segments = []
+    end_date = np.datetime64(f'{year + 1}-{month:02d}-01T00:00:00') - np.timedelta64(1, 's')
+    while end_date < last_date:
+        start_date = np.datetime64(f'{year}-{month:02d}-01T00:00:00')
+        segments.append((np.searchsorted(dates, start_date.astype(dates.dtype), side='left'),
+                         np.searchsorted(dates, end_date.astype(dates.dtype), side='right')))
+        year += 1
+        end_date = np.datetime64(f'{year + 1}-{month:02d}-01T00:00:00') - np.timedelta64(1, 's')
+    return np.array(segments, dtype=int).reshape(-1, 2)
+
+
+def _mean_count_per_year(condition: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Mean number of time steps per year where `condition` is True, with years as returned by `_get_year_segments`."""
+    counts = np.concatenate([np.zeros((condition.shape[0], 1), dtype=int), np.cumsum(condition, axis=1)], axis=1)
+    return (counts[:, years[:, 1]] - counts[:, years[:, 0]]).mean(axis=1)
+
+
+@njit(parallel=True)
+def _mean_run_length(condition: np.ndarray) -> np.ndarray:
+    """Mean length of the runs of consecutive True values in each row, or NaN for rows without True values."""
+    result = np.full(condition.shape[0], np.nan)
+    for i in prange(condition.shape[0]):
+        n_steps, n_runs = 0, 0
+        for j in range(condition.shape[1]):
+            if condition[i, j]:
+                n_steps += 1
+                if j == 0 or not condition[i, j - 1]:
+                    n_runs += 1
+        if n_runs > 0:
+            result[i] = n_steps / n_runs
+    return result
+
+
+def _quantile_of_sorted(fdc: np.ndarray, quantile: float) -> np.ndarray:
+    """Linearly interpolated quantile of each row of ascending values with NaNs at the end, ignoring the NaNs."""
+    n_valid = (~np.isnan(fdc)).sum(axis=1)
+    position = quantile * np.maximum(n_valid - 1, 0)
+    lower, upper = np.floor(position).astype(int), np.ceil(position).astype(int)
+    lower_values = np.take_along_axis(fdc, lower[:, None], axis=1)[:, 0]
+    upper_values = np.take_along_axis(fdc, upper[:, None], axis=1)[:, 0]
+    values = lower_values + (upper_values - lower_values) * (position - lower)
+    return np.where(n_valid > 0, values, np.nan)
+
+
+def _slope_fdc(fdc: np.ndarray, lower_quantile: float = 0.33, upper_quantile: float = 0.66) -> np.ndarray:
+    """Slope of the flow duration curve for rows of ascending values with NaNs at the end. See `slope_fdc`."""
+    # like the single-basin signature, index into the descending curve including NaNs, which are sorted first
+    idx_lower = fdc.shape[1] - 1 - np.round(lower_quantile * fdc.shape[1]).astype(int)
+    idx_upper = fdc.shape[1] - 1 - np.round(upper_quantile * fdc.shape[1]).astype(int)
+    return (np.log(fdc[:, idx_lower] + 1e-8) - np.log(fdc[:, idx_upper] + 1e-8)) / (upper_quantile - lower_quantile)
+
+
+def _mean_half_flow_step(flow: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Mean step of each year at which the cumulative discharge exceeds half of the annual discharge. See `hfd_mean`."""
+    steps = np.full((flow.shape[0], len(years)), np.nan)
+    for k, (start, end) in enumerate(years):
+        if end == start:
+            continue
+        data = flow[:, start:end]
+        exceeds_half = np.nancumsum(data, axis=1) > np.nansum(data, axis=1, keepdims=True) / 2
+        # years without discharge are ignored
+        steps[:, k] = np.where(exceeds_half.any(axis=1), exceeds_half.argmax(axis=1), np.nan)
+    return np.nanmean(steps, axis=1)
+
+
+def _median_stream_elasticity(flow: np.ndarray, prcp: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Median annual streamflow precipitation elasticity. See `stream_elas`."""
+    # mask only valid time steps (only discharge has missing values)
+    valid = flow >= 0
+    flow, prcp = np.where(valid, flow, np.nan), np.where(valid, prcp, np.nan)
+    q_mean_total = np.nanmean(flow, axis=1)
+    p_mean_total = np.nanmean(prcp, axis=1)
+
+    values = np.full((flow.shape[0], len(years)), np.nan)
+    for k, (start, end) in enumerate(years):
+        q = np.nanmean(flow[:, start:end], axis=1)
+        p = np.nanmean(prcp[:, start:end], axis=1)
+        values[:, k] = (q - q_mean_total) / (p - p_mean_total) * (p_mean_total / q_mean_total)
+    return np.median(values, axis=1)
+
+
+@njit(parallel=True)
+def _baseflow_index_batch(flow: np.ndarray, alpha: float, warmup: int, n_passes: int) -> np.ndarray:
+    """Baseflow index of each row of `flow`. See `baseflow_index`."""
+    result = np.full(flow.shape[0], np.nan)
+    for i in prange(flow.shape[0]):
+        result[i] = _baseflow_index_jit(flow[i], alpha, warmup, n_passes)[0]
+    return result
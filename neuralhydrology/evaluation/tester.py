@@ -1,3 +1,4 @@
+import itertools
 import logging
 import pickle
 import random
@@ -5,7 +6,7 @@ import re
 import sys
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -16,9 +17,12 @@ from tqdm import tqdm
 
 from neuralhydrology.datasetzoo import get_dataset
 from neuralhydrology.datasetzoo.basedataset import BaseDataset
-from neuralhydrology.datautils.utils import get_frequency_factor, load_basin_file, load_scaler, sort_frequencies
+from neuralhydrology.datautils.utils import (decode_dates, get_frequency_factor, load_basin_file, load_scaler,
+                                             sort_frequencies)
 from neuralhydrology.evaluation import plots
-from neuralhydrology.evaluation.metrics import calculate_metrics, get_available_metrics
+from neuralhydrology.evaluation.metrics import (StreamingMetrics, calculate_multi_basin_metrics,
+                                                get_available_metrics)
+from neuralhydrology.evaluation.resultsstore import ResultsStore, ResultsWriter
 from neuralhydrology.evaluation.utils import load_basin_id_encoding, metrics_to_dataframe
 from neuralhydrology.modelzoo import get_model
 from neuralhydrology.modelzoo.basemodel import BaseModel
@@ -26,10 +30,20 @@ from neuralhydrology.modelzoo.cfe_modules.dcfe_utils import move_data_to_device
 from neuralhydrology.training import get_loss_obj, get_regularization_obj
 from neuralhydrology.training.logger import Logger
 from neuralhydrology.utils.config import Config
-from neuralhydrology.utils.errors import AllNaNError, NoEvaluationDataError
+from neuralhydrology.utils.errors import NoEvaluationDataError
+from neuralhydrology.utils.lrucache import LRUCache
 
 LOGGER = logging.getLogger(__name__)
 
+# models whose output at a time step only depends on the inputs up to this time step and whose sequences all start from
+# the same initial state, such that they can be run once over long sequences (see `seq2seq_evaluation`). "lstm" is the
+# deprecated alias of "customlstm".
+SEQ2SEQ_MODELS = ["cudalstm", "customlstm", "ealstm", "embcudalstm", "gru", "lstm"]
+
+# number of basins whose metrics are calculated together (see `BaseTester._add_metrics`). Bounds the memory of the
+# dense [basin, time] arrays and the number of basin results that are held back when results are streamed to disk.
+_METRICS_BLOCK_SIZE = 256
+
 
 class BaseTester(object):
     """Base class to run inference on a model.
@@ -72,8 +86,9 @@ class BaseTester(object):
         self.id_to_int = {}
         self.additional_features = []
 
-        # placeholder to store cached validation data
-        self.cached_datasets = {}
+        # least-recently-used cache of the validation data sets, bounded by `validation_cache_mb`
+        max_bytes = float("inf") if cfg.validation_cache_mb is None else int(cfg.validation_cache_mb * 1024**2)
+        self.cached_datasets = LRUCache(max_bytes=max_bytes, load_fn=self._load_cached_dataset)
 
         # initialize loss object to compute the loss of the evaluation data
         self.loss_obj = get_loss_obj(cfg)
@@ -81,6 +96,37 @@ class BaseTester(object):
 
         self._load_run_data()
 
+        if cfg.seq2seq_evaluation:
+            self._check_seq2seq_evaluation()
+        if cfg.streaming_validation_metrics and self.period == "validation":
+            self._check_streaming_validation_metrics()
+
+    def _check_seq2seq_evaluation(self):
+        """Raise an error if the run configuration does not support the `seq2seq_evaluation` mode."""
+        if self.cfg.model.lower() not in SEQ2SEQ_MODELS:
+            raise ValueError(f"seq2seq_evaluation is not supported for {self.cfg.model}. "
+                             f"Supported models are {SEQ2SEQ_MODELS}.")
+        if self.cfg.head.lower() != "regression":
+            raise ValueError("seq2seq_evaluation is only supported for regression heads.")
+        if len(self.cfg.use_frequencies) > 1:
+            raise ValueError("seq2seq_evaluation is only supported for a single frequency.")
+        if self.cfg.hindcast_inputs or self.cfg.forecast_inputs or self.cfg.timestep_counter:
+            raise ValueError("seq2seq_evaluation is not supported for forecast inputs and timestep counters.")
+        if self.cfg.evolving_attributes:
+            raise ValueError("seq2seq_evaluation is not supported for evolving attributes.")
+
+    def _check_streaming_validation_metrics(self):
+        """Raise an error if the run configuration does not support `streaming_validation_metrics`."""
+        if self.cfg.seq2seq_evaluation:
+            raise ValueError("streaming_validation_metrics is not supported in the seq2seq_evaluation mode.")
+        metrics = self.cfg.metrics
+        if isinstance(metrics, dict):
+            metrics = [metric for var_metrics in metrics.values() for metric in var_metrics]
+        unsupported = [metric for metric in metrics if metric not in StreamingMetrics.METRICS]
+        if unsupported:
+            raise ValueError(f"The metrics {unsupported} are not supported by streaming_validation_metrics. "
+                             f"Supported metrics are {StreamingMetrics.METRICS}.")
+
     def _set_device(self):
         if self.cfg.device is not None:
             if self.cfg.device.startswith("cuda"):
@@ -156,6 +202,20 @@ class BaseTester(object):
         )
         return ds
 
+    def _load_dataset(self, basin: Union[str, List[str]]) -> Optional[BaseDataset]:
+        """Load the data set of one or more basins, or return None if there is no evaluation data."""
+        try:
+            return self._get_dataset(basin)
+        except NoEvaluationDataError:
+            return None
+
+    def _load_cached_dataset(self, key: Union[str, frozenset]) -> Optional[BaseDataset]:
+        """Load the data set of one basin or, if `key` is the set of all basins, the joint data set of all basins."""
+        return self._load_dataset(list(self.basins) if isinstance(key, frozenset) else key)
+
+    def _use_dataset_cache(self) -> bool:
+        return self.cfg.cache_validation_data and self.period == "validation"
+
     def evaluate(
         self,
         epoch: int = None,
@@ -185,7 +245,8 @@ class BaseTester(object):
         Returns
         -------
         dict
-            A dictionary containing one xarray per basin with the evaluation results.
+            A dictionary containing one xarray per basin with the evaluation results. If the results are streamed to
+            a results store (see config argument `stream_results`), a `ResultsStore` that reads them lazily.
         """
         if model is None:
             if self.init_model:
@@ -207,171 +268,497 @@ class BaseTester(object):
         else:
             model.eval()
 
+        # during training, only compute the loss and the metrics, without collecting the outputs
+        if (self.cfg.streaming_validation_metrics and self.period == "validation" and not save_results and
+                not save_all_output):
+            self._evaluate_streaming_metrics(model, basins, metrics, experiment_logger)
+            self._log_cache_statistics()
+            return {}
+
         results = defaultdict(dict)
         all_output = {basin: None for basin in basins}
 
-        pbar = tqdm(basins, file=sys.stdout, disable=self._disable_pbar)
-        pbar.set_description("# Validation" if self.period == "validation" else "# Evaluation")
-
-        for basin in pbar:
-            if self.cfg.cache_validation_data and basin in self.cached_datasets.keys():
-                ds = self.cached_datasets[basin]
+        # write the results of each basin to disk as soon as it is evaluated, instead of keeping them in memory
+        writer = None
+        if self.cfg.stream_results and (save_results or save_all_output):
+            parent_directory = self._get_results_directory(epoch)
+            metrics_file, metrics_list = None, None
+            if self.cfg.metrics and save_results:
+                metrics_file = parent_directory / f"{self.period}_metrics.csv"
+                metrics_list = self._get_metrics_list()
+            writer = ResultsWriter(parent_directory / f"{self.period}_results",
+                                   metrics_file=metrics_file,
+                                   metrics=metrics_list,
+                                   targets=self.cfg.target_variables)
+
+        if self.cfg.multi_basin_evaluation:
+            basin_outputs = self._evaluate_basins_jointly(model, basins, save_all_output, experiment_logger)
+        else:
+            basin_outputs = self._evaluate_basins(model, basins, save_all_output, experiment_logger)
+
+        basin_outputs = ((basin, *self._get_basin_results(basin, frequencies, y_hat, y, dates, log_warnings=i == 0),
+                          basin_output)
+                         for i, (basin, frequencies, y_hat, y, dates, basin_output) in enumerate(basin_outputs))
+        for basin, basin_results, basin_output in self._add_metrics(basin_outputs, metrics, experiment_logger):
+            if writer is not None and save_results:
+                if basin_results:
+                    writer.add_results(basin, basin_results)
+            elif basin_results:
+                results[basin] = basin_results
+            if writer is not None and save_all_output:
+                writer.add_all_output(basin, basin_output)
             else:
-                try:
-                    ds = self._get_dataset(basin)
-                except NoEvaluationDataError:
-                    # skip basin
-                    continue
-                if self.cfg.cache_validation_data and self.period == "validation":
-                    self.cached_datasets[basin] = ds
-
-            loader = DataLoader(ds, batch_size=self.cfg.batch_size, num_workers=0, collate_fn=ds.collate_fn)
-
-            y_hat, y, dates, all_losses, all_output[basin] = self._evaluate(model, loader, ds.frequencies, save_all_output)
-
-            # log loss of this basin plus number of samples in the logger to compute epoch aggregates later
-            if experiment_logger is not None:
-                experiment_logger.log_step(**{k: (v, len(loader)) for k, v in all_losses.items()})
-
-            predict_last_n = self.cfg.predict_last_n
-            seq_length = self.cfg.seq_length
-            # if predict_last_n/seq_length are int, there's only one frequency
-            if isinstance(predict_last_n, int):
-                predict_last_n = {ds.frequencies[0]: predict_last_n}
-            if isinstance(seq_length, int):
-                seq_length = {ds.frequencies[0]: seq_length}
-            lowest_freq = sort_frequencies(ds.frequencies)[0]
-            for freq in ds.frequencies:
-                if predict_last_n[freq] == 0:
-                    continue  # this frequency is not being predicted
-                results[basin][freq] = {}
-
-                # rescale observations
-                feature_scaler = self.scaler["xarray_feature_scale"][self.cfg.target_variables].to_array().values
-                feature_center = self.scaler["xarray_feature_center"][self.cfg.target_variables].to_array().values
-                y_freq = y[freq] * feature_scaler + feature_center
-                # rescale predictions
-                if y_hat[freq].ndim == 3 or (len(feature_scaler) == 1):
-                    y_hat_freq = y_hat[freq] * feature_scaler + feature_center
-                elif y_hat[freq].ndim == 4:
-                    # if y_hat has 4 dim and we have multiple features we expand the dimensions for scaling
-                    feature_scaler = np.expand_dims(feature_scaler, (0, 1, 3))
-                    feature_center = np.expand_dims(feature_center, (0, 1, 3))
-                    y_hat_freq = y_hat[freq] * feature_scaler + feature_center
-                else:
-                    raise RuntimeError(f"Simulations have {y_hat[freq].ndim} dimension. Only 3 and 4 are supported.")
-
-                # Create data_vars dictionary for the xarray.Dataset
-                data_vars = self._create_xarray_data_vars(y_hat_freq, y_freq)
-
-                # freq_range are the steps of the current frequency at each lowest-frequency step
-                frequency_factor = int(get_frequency_factor(lowest_freq, freq))
-
-                # Create coords dictionary for the xarray.Dataset. 'date' can be directly infered from the dates
-                # dictionary. We index the sample by the date of the last timestep of the sequence. The 'time_step'
-                # index that specifies the position in the output sequence (relative to the end) can be inferred by
-                # computing the timedelta of the dates. To account for predict_last_n > 1 and multi-freq stuff, we
-                # need to add the frequency factor and remove 1 (to start at zero).
-                coords = {
-                    "date": dates[lowest_freq][:, -1],
-                    "time_step": ((dates[freq][0, :] - dates[freq][0, -1]) / pd.Timedelta(freq)).astype(np.int64)
-                    + frequency_factor
-                    - 1,
-                }
-                xr = xarray.Dataset(data_vars=data_vars, coords=coords)
-                xr = xr.reindex(
-                    {
-                        "date": pd.DatetimeIndex(
-                            pd.date_range(xr["date"].values[0], xr["date"].values[-1], freq=lowest_freq), name="date"
-                        )
-                    }
-                )
-                results[basin][freq]["xr"] = xr
-
-                # create datetime range at the current frequency
-                freq_date_range = pd.date_range(start=dates[lowest_freq][0, -1], end=dates[freq][-1, -1], freq=freq)
-                # remove datetime steps that are not being predicted from the datetime range
-                mask = np.ones(frequency_factor).astype(bool)
-                mask[: -predict_last_n[freq]] = False
-                freq_date_range = freq_date_range[np.tile(mask, len(xr["date"]))]
-
-                # only warn once per freq
-                if frequency_factor < predict_last_n[freq] and basin == basins[0]:
-                    tqdm.write(
-                        f"Metrics for {freq} are calculated over last {frequency_factor} elements only. "
-                        f"Ignoring {predict_last_n[freq] - frequency_factor} predictions per sequence."
-                    )
-
-                if metrics:
-                    for target_variable in self.cfg.target_variables:
-                        # stack dates and time_steps so we don't just evaluate every 24h when use_frequencies=[1D, 1h]
-                        obs = (
-                            xr.isel(time_step=slice(-frequency_factor, None))
-                            .stack(datetime=["date", "time_step"])
-                            .drop_vars({"datetime", "date", "time_step"})[f"{target_variable}_obs"]
-                        )
-                        obs["datetime"] = freq_date_range
-                        # check if there are observations for this period
-                        if not all(obs.isnull()):
-                            sim = (
-                                xr.isel(time_step=slice(-frequency_factor, None))
-                                .stack(datetime=["date", "time_step"])
-                                .drop_vars({"datetime", "date", "time_step"})[f"{target_variable}_sim"]
-                            )
-                            sim["datetime"] = freq_date_range
-
-                            # clip negative predictions to zero, if variable is listed in config 'clip_target_to_zero'
-                            if target_variable in self.cfg.clip_targets_to_zero:
-                                sim = xarray.where(sim < 0, 0, sim)
-
-                            if "samples" in sim.dims:
-                                sim = sim.mean(dim="samples")
-
-                            var_metrics = metrics if isinstance(metrics, list) else metrics[target_variable]
-                            if "all" in var_metrics:
-                                var_metrics = get_available_metrics()
-                            try:
-                                values = calculate_metrics(obs, sim, metrics=var_metrics, resolution=freq)
-                            except AllNaNError as err:
-                                msg = (
-                                    f"Basin {basin} "
-                                    + (f"{target_variable} " if len(self.cfg.target_variables) > 1 else "")
-                                    + (f"{freq} " if len(ds.frequencies) > 1 else "")
-                                    + str(err)
-                                )
-                                LOGGER.warning(msg)
-                                values = {metric: np.nan for metric in var_metrics}
-
-                            # add variable identifier to metrics if needed
-                            if len(self.cfg.target_variables) > 1:
-                                values = {f"{target_variable}_{key}": val for key, val in values.items()}
-                            # add frequency identifier to metrics if needed
-                            if len(ds.frequencies) > 1:
-                                values = {f"{key}_{freq}": val for key, val in values.items()}
-                            if experiment_logger is not None:
-                                experiment_logger.log_step(**values)
-                            for k, v in values.items():
-                                results[basin][freq][k] = v
+                all_output[basin] = basin_output
 
         # convert default dict back to normal Python dict to avoid unexpected behavior when trying to access
         # a non-existing basin
         results = dict(results)
+        if writer is not None:
+            LOGGER.info(f"Stored results at {writer.store_dir}")
+            if save_results:
+                results = ResultsStore(writer.store_dir)
 
         if (self.period == "validation") and (self.cfg.log_n_figures > 0) and (experiment_logger is not None) and results:
             self._create_and_log_figures(results, experiment_logger, epoch)
 
-        # save model output to file, if requested
+        # save model output to file, if requested and not already streamed to disk
         results_to_save = None
         states_to_save = None
         if save_results:
             results_to_save = results
         if save_all_output:
             states_to_save = all_output
-        if save_results or save_all_output:
+        if (save_results or save_all_output) and writer is None:
             self._save_results(results=results_to_save, states=states_to_save, epoch=epoch)
 
+        self._log_cache_statistics()
         return results
 
+    def _log_cache_statistics(self):
+        if not self._use_dataset_cache():
+            return
+        cache = self.cached_datasets
+        LOGGER.info(f"Validation data cache: {cache.hits} hits, {cache.misses} misses, {len(cache)} data sets "
+                    f"using {cache.nbytes / 1024**2:.1f} MB")
+
+    def _evaluate_basins(self, model: BaseModel, basins: List[str], save_all_output: bool,
+                         experiment_logger: Logger) -> Iterator[tuple]:
+        """Evaluate the model with one data set and one data loader per basin."""
+        pbar = tqdm(basins, file=sys.stdout, disable=self._disable_pbar)
+        pbar.set_description("# Validation" if self.period == "validation" else "# Evaluation")
+
+        for basin in pbar:
+            ds = self._get_basin_dataset(basin)
+            if ds is None:
+                continue  # skip basin
+
+            if self.cfg.seq2seq_evaluation:
+                y_hat, y, dates, all_losses, all_output, n_batches = self._evaluate_sequences(
+                    model, ds, np.arange(len(ds)), save_all_output)
+            else:
+                loader = DataLoader(ds, batch_size=self.cfg.batch_size, num_workers=0, collate_fn=ds.collate_fn)
+                y_hat, y, dates, all_losses, all_output = self._evaluate(model, loader, ds.frequencies, save_all_output)
+                n_batches = len(loader)
+
+            # log loss of this basin plus number of samples in the logger to compute epoch aggregates later
+            if experiment_logger is not None:
+                experiment_logger.log_step(**{k: (v, n_batches) for k, v in all_losses.items()})
+
+            yield basin, ds.frequencies, y_hat, y, dates, all_output
+
+    def _evaluate_basins_jointly(self, model: BaseModel, basins: List[str], save_all_output: bool,
+                                 experiment_logger: Logger) -> Iterator[tuple]:
+        """Evaluate the model with a single data set of all basins, whose batches mix the samples of multiple basins.
+
+        The data loader workers prepare the next batches while the model runs. The samples are ordered by basin, such
+        that the outputs can be split into contiguous per-basin slices afterwards.
+        """
+        ds, indices = self._get_joint_dataset(basins)
+        if len(indices) == 0:
+            return
+        sample_basins, lookup_basins = ds.get_sample_basins()
+
+        if self.cfg.seq2seq_evaluation:
+            y_hat, y, dates, all_losses, all_output, n_batches = self._evaluate_sequences(
+                model, ds, indices, save_all_output, disable_pbar=self._disable_pbar)
+        else:
+            loader = DataLoader(ds,
+                                batch_size=self.cfg.batch_size,
+                                sampler=indices.tolist(),
+                                num_workers=self.cfg.num_workers,
+                                collate_fn=ds.collate_fn)
+            pbar = tqdm(loader, file=sys.stdout, disable=self._disable_pbar)
+            pbar.set_description("# Validation" if self.period == "validation" else "# Evaluation")
+            y_hat, y, dates, all_losses, all_output = self._evaluate(model, pbar, ds.frequencies, save_all_output,
+                                                                     n_samples=len(indices))
+            n_batches = len(loader)
+
+        # the batches mix basins, so the loss can only be logged for all basins together
+        if experiment_logger is not None:
+            experiment_logger.log_step(**{k: (v, n_batches) for k, v in all_losses.items()})
+
+        # scatter the outputs back to the basins, using the basin index of each sample
+        sample_basin_idx = lookup_basins[indices]
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(sample_basin_idx)) + 1])
+        ends = np.concatenate([starts[1:], [len(indices)]])
+        for start, end in zip(starts, ends):
+            basin_slice = slice(start, end)
+            yield (sample_basins[sample_basin_idx[start]], ds.frequencies,
+                   {freq: values[basin_slice] for freq, values in y_hat.items()},
+                   {freq: values[basin_slice] for freq, values in y.items()},
+                   {freq: values[basin_slice] for freq, values in dates.items()},
+                   {key: values[basin_slice] for key, values in all_output.items()})
+
+    def _get_basin_dataset(self, basin: str) -> Optional[BaseDataset]:
+        """Return the (possibly cached) data set of one basin, or None if the basin has no evaluation data."""
+        if self._use_dataset_cache():
+            return self.cached_datasets[basin]
+        return self._load_dataset(basin)
+
+    def _get_joint_dataset(self, basins: List[str]) -> Tuple[Optional[BaseDataset], np.ndarray]:
+        """Return the data set of all basins and the indices of the samples of `basins`, ordered by basin."""
+        if self._use_dataset_cache():
+            # cache the data set of all basins, because the random subset of validation basins changes every epoch
+            ds = self.cached_datasets[frozenset(self.basins)]
+        else:
+            ds = self._load_dataset(list(basins))
+        if ds is None:
+            return None, np.array([], dtype=int)
+
+        sample_basins, lookup_basins = ds.get_sample_basins()
+        is_evaluated = np.isin(np.array(sample_basins), basins)
+        indices = np.flatnonzero(is_evaluated[lookup_basins])
+        return ds, indices[np.argsort(lookup_basins[indices], kind="stable")]
+
+    def _evaluate_sequences(self,
+                            model: BaseModel,
+                            ds: BaseDataset,
+                            indices: np.ndarray,
+                            save_all_output: bool,
+                            disable_pbar: bool = True) -> tuple:
+        """Evaluate the model on long sequences that cover the samples at `indices` (see `seq2seq_evaluation`).
+
+        Each run of contiguous samples is split into chunks of at most `seq2seq_chunk_length` samples. Each chunk is
+        passed to the model as one sequence that starts `seq_length` time steps before its first prediction. Chunks of
+        the same length are batched such that a batch contains about `batch_size` samples. The outputs are returned in
+        the order of `indices`, together with the number of batches.
+        """
+        seq_length = ds.seq_len[0]
+        chunks = []
+        for run in ds.get_contiguous_samples(indices):
+            chunk_length = self.cfg.seq2seq_chunk_length or len(run)
+            chunks.extend(run[i:i + chunk_length] for i in range(0, len(run), chunk_length))
+        chunk_starts = np.cumsum([0] + [len(chunk) for chunk in chunks[:-1]])
+
+        chunks_by_length = defaultdict(list)
+        for i, chunk in enumerate(chunks):
+            chunks_by_length[len(chunk)].append(i)
+        batches = []
+        for length, chunk_ids in chunks_by_length.items():
+            n_chunks = max(1, self.cfg.batch_size // length)
+            batches.extend(chunk_ids[i:i + n_chunks] for i in range(0, len(chunk_ids), n_chunks))
+
+        loader = (ds.collate_fn([ds.get_sequence(int(chunks[i][-1]), seq_length + len(chunks[i]) - 1) for i in batch])
+                  for batch in batches)
+        pbar = tqdm(loader, total=len(batches), file=sys.stdout, disable=disable_pbar)
+        pbar.set_description("# Validation" if self.period == "validation" else "# Evaluation")
+        y_hat, y, dates, all_losses, all_output = self._evaluate(model,
+                                                                 pbar,
+                                                                 ds.frequencies,
+                                                                 save_all_output,
+                                                                 seq_length=seq_length,
+                                                                 n_samples=len(indices))
+
+        # the outputs are ordered by batch, restore the order of the samples
+        order = np.argsort(
+            np.concatenate([np.arange(chunk_starts[i], chunk_starts[i] + len(chunks[i])) for b in batches for i in b]))
+        y_hat, y, dates = [{freq: values[order] for freq, values in outputs.items()} for outputs in [y_hat, y, dates]]
+        all_output = {key: values[order] for key, values in all_output.items()}
+        return y_hat, y, dates, all_losses, all_output, len(batches)
+
+    def _evaluate_streaming_metrics(self, model: BaseModel, basins: List[str], metrics: Union[list, dict],
+                                    experiment_logger: Logger):
+        """Log the loss and the metrics of each basin, without collecting the outputs.
+
+        In the `streaming_validation_metrics` mode, the sufficient statistics of the metrics of each basin are
+        accumulated on the device during the forward passes, such that only the final metric values are copied to the
+        host.
+        """
+        statistics, frequencies = {}, []
+        if self.cfg.multi_basin_evaluation:
+            ds, indices = self._get_joint_dataset(basins)
+            if len(indices) > 0:
+                sample_basins, lookup_basins = ds.get_sample_basins()
+                positions = {basin: i for i, basin in enumerate(basins)}
+                basin_positions = np.array([positions.get(basin, -1) for basin in sample_basins])
+                loader = DataLoader(ds,
+                                    batch_size=self.cfg.batch_size,
+                                    sampler=indices.tolist(),
+                                    num_workers=self.cfg.num_workers,
+                                    collate_fn=ds.collate_fn)
+                pbar = tqdm(loader, file=sys.stdout, disable=self._disable_pbar)
+                pbar.set_description("# Validation")
+                frequencies = ds.frequencies
+                losses = self._accumulate_metric_statistics(model, pbar, frequencies,
+                                                            basin_positions[lookup_basins[indices]], statistics,
+                                                            len(basins))
+                if experiment_logger is not None:
+                    experiment_logger.log_step(**{k: (v, len(loader)) for k, v in losses.items()})
+        else:
+            pbar = tqdm(basins, file=sys.stdout, disable=self._disable_pbar)
+            pbar.set_description("# Validation")
+            for i, basin in enumerate(pbar):
+                ds = self._get_basin_dataset(basin)
+                if ds is None:
+                    continue  # skip basin
+                loader = DataLoader(ds, batch_size=self.cfg.batch_size, num_workers=0, collate_fn=ds.collate_fn)
+                frequencies = ds.frequencies
+                losses = self._accumulate_metric_statistics(model, loader, frequencies, np.full(len(ds), i),
+                                                            statistics, len(basins))
+                if experiment_logger is not None:
+                    experiment_logger.log_step(**{k: (v, len(loader)) for k, v in losses.items()})
+
+        if not metrics or experiment_logger is None:
+            return
+        metrics_list = metrics
+        if isinstance(metrics, dict):
+            metrics_list = list(set(metric for var_metrics in metrics.values() for metric in var_metrics))
+        for freq, freq_statistics in statistics.items():
+            values = freq_statistics.compute(metrics_list)
+            has_observations = freq_statistics.has_observations()
+            for i in range(len(basins)):
+                for j, target_variable in enumerate(self.cfg.target_variables):
+                    if not has_observations[i, j]:
+                        continue
+                    var_metrics = metrics if isinstance(metrics, list) else metrics[target_variable]
+                    basin_values = {metric: float(values[metric][i, j]) for metric in var_metrics}
+                    # add variable and frequency identifiers to metrics if needed
+                    if len(self.cfg.target_variables) > 1:
+                        basin_values = {f"{target_variable}_{key}": val for key, val in basin_values.items()}
+                    if len(frequencies) > 1:
+                        basin_values = {f"{key}_{freq}": val for key, val in basin_values.items()}
+                    experiment_logger.log_step(**basin_values)
+
+    def _accumulate_metric_statistics(self, model: BaseModel, loader: DataLoader, frequencies: List[str],
+                                      basin_index: np.ndarray, statistics: Dict[str, StreamingMetrics],
+                                      n_basins: int) -> Dict[str, float]:
+        """Run the model and add the rescaled outputs to the metric statistics, where `basin_index` is the basin index
+        of each sample in the order of the loader. Returns the mean losses."""
+        predict_last_n = self.cfg.predict_last_n
+        if isinstance(predict_last_n, int):
+            predict_last_n = {frequencies[0]: predict_last_n}
+        lowest_freq = sort_frequencies(frequencies)[0]
+        targets = self.cfg.target_variables
+        scale, center = [
+            torch.from_numpy(self.scaler[key][targets].to_array().values).float().to(self.device)
+            for key in ["xarray_feature_scale", "xarray_feature_center"]
+        ]
+        clip = torch.tensor([target in self.cfg.clip_targets_to_zero for target in targets], device=self.device)
+        basin_index = torch.from_numpy(basin_index).to(self.device)
+
+        losses = []
+        n_samples = 0
+        with torch.no_grad():
+            for data in loader:
+                data = model.pre_model_hook(self._move_to_device(data), is_train=False)
+                predictions, loss = self._get_predictions_and_loss(model, data)
+                batch_size = 0
+                for freq in frequencies:
+                    if predict_last_n[freq] == 0:
+                        continue  # no predictions for this frequency
+                    freq_key = "" if len(frequencies) == 1 else f"_{freq}"
+                    y_hat_sub, y_sub = self._subset_targets(model, data, predictions, predict_last_n[freq], freq_key)
+                    batch_size = y_sub.shape[0]
+
+                    # like the metrics of the regular evaluation, use the last time steps of each lowest-frequency step
+                    frequency_factor = int(get_frequency_factor(lowest_freq, freq))
+                    obs = y_sub[:, -frequency_factor:] * scale + center
+                    if y_hat_sub.ndim == 4:
+                        sim = y_hat_sub[:, -frequency_factor:] * scale[:, None] + center[:, None]
+                        sim = torch.where(clip[:, None] & (sim < 0), 0, sim).mean(dim=-1)
+                    else:
+                        sim = y_hat_sub[:, -frequency_factor:] * scale + center
+                        sim = torch.where(clip & (sim < 0), 0, sim)
+
+                    if freq not in statistics:
+                        statistics[freq] = StreamingMetrics(n_basins, len(targets), self.device)
+                    statistics[freq].update(obs, sim, basin_index[n_samples:n_samples + batch_size])
+                n_samples += batch_size
+                losses.append(loss)
+
+        return _get_mean_losses(losses)
+
+    def _get_basin_results(self, basin: str, frequencies: List[str], y_hat: Dict[str, np.ndarray],
+                           y: Dict[str, np.ndarray], dates: Dict[str, np.ndarray],
+                           log_warnings: bool) -> Tuple[dict, Dict[str, pd.DatetimeIndex]]:
+        """Rescale the outputs of one basin and create the result xarrays.
+
+        Also returns, for each frequency, the dates of the predicted time steps over which the metrics are calculated
+        (see `_add_metrics`).
+        """
+        basin_results, metric_dates = {}, {}
+        predict_last_n = self.cfg.predict_last_n
+        seq_length = self.cfg.seq_length
+        # if predict_last_n/seq_length are int, there's only one frequency
+        if isinstance(predict_last_n, int):
+            predict_last_n = {frequencies[0]: predict_last_n}
+        if isinstance(seq_length, int):
+            seq_length = {frequencies[0]: seq_length}
+        lowest_freq = sort_frequencies(frequencies)[0]
+        for freq in frequencies:
+            if predict_last_n[freq] == 0:
+                continue  # this frequency is not being predicted
+            basin_results[freq] = {}
+
+            # rescale observations
+            feature_scaler = self.scaler["xarray_feature_scale"][self.cfg.target_variables].to_array().values
+            feature_center = self.scaler["xarray_feature_center"][self.cfg.target_variables].to_array().values
+            y_freq = y[freq] * feature_scaler + feature_center
+            # rescale predictions
+            if y_hat[freq].ndim == 3 or (len(feature_scaler) == 1):
+                y_hat_freq = y_hat[freq] * feature_scaler + feature_center
+            elif y_hat[freq].ndim == 4:
+                # if y_hat has 4 dim and we have multiple features we expand the dimensions for scaling
+                feature_scaler = np.expand_dims(feature_scaler, (0, 1, 3))
+                feature_center = np.expand_dims(feature_center, (0, 1, 3))
+                y_hat_freq = y_hat[freq] * feature_scaler + feature_center
+            else:
+                raise RuntimeError(f"Simulations have {y_hat[freq].ndim} dimension. Only 3 and 4 are supported.")
+
+            # Create data_vars dictionary for the xarray.Dataset
+            data_vars = self._create_xarray_data_vars(y_hat_freq, y_freq)
+
+            # freq_range are the steps of the current frequency at each lowest-frequency step
+            frequency_factor = int(get_frequency_factor(lowest_freq, freq))
+
+            # Create coords dictionary for the xarray.Dataset. 'date' can be directly infered from the dates
+            # dictionary. We index the sample by the date of the last timestep of the sequence. The 'time_step'
+            # index that specifies the position in the output sequence (relative to the end) can be inferred by
+            # computing the timedelta of the dates. To account for predict_last_n > 1 and multi-freq stuff, we
+            # need to add the frequency factor and remove 1 (to start at zero).
+            coords = {
+                "date": dates[lowest_freq][:, -1],
+                "time_step": ((dates[freq][0, :] - dates[freq][0, -1]) / pd.Timedelta(freq)).astype(np.int64)
+                + frequency_factor
+                - 1,
+            }
+            xr = xarray.Dataset(data_vars=data_vars, coords=coords)
+            xr = xr.reindex(
+                {
+                    "date": pd.DatetimeIndex(
+                        pd.date_range(xr["date"].values[0], xr["date"].values[-1], freq=lowest_freq), name="date"
+                    )
+                }
+            )
+            basin_results[freq]["xr"] = xr
+
+            # create datetime range at the current frequency
+            freq_date_range = pd.date_range(start=dates[lowest_freq][0, -1], end=dates[freq][-1, -1], freq=freq)
+            # remove datetime steps that are not being predicted from the datetime range
+            mask = np.ones(frequency_factor).astype(bool)
+            mask[: -predict_last_n[freq]] = False
+            metric_dates[freq] = freq_date_range[np.tile(mask, len(xr["date"]))]
+
+            # only warn once per freq
+            if frequency_factor < predict_last_n[freq] and log_warnings:
+                tqdm.write(
+                    f"Metrics for {freq} are calculated over last {frequency_factor} elements only. "
+                    f"Ignoring {predict_last_n[freq] - frequency_factor} predictions per sequence."
+                )
+
+        return basin_results, metric_dates
+
+    def _add_metrics(self, basin_outputs: Iterator[Tuple[str, dict, Dict[str, pd.DatetimeIndex], Optional[dict]]],
+                     metrics: Union[list, dict],
+                     experiment_logger: Logger) -> Iterator[Tuple[str, dict, Optional[dict]]]:
+        """Calculate the metrics of the basins and add them to the basin results.
+
+        The basins are processed in blocks of `_METRICS_BLOCK_SIZE` basins. For each frequency and target variable, the
+        observations and simulations of all basins of a block are aligned on their common dates as dense [basin, time]
+        arrays, and the metrics of all basins are calculated in one call of `calculate_multi_basin_metrics`. Yields
+        the basin, its results (with metrics) and its output.
+        """
+        block = []
+        for basin_output in basin_outputs:
+            block.append(basin_output)
+            if len(block) == _METRICS_BLOCK_SIZE:
+                yield from self._add_block_metrics(block, metrics, experiment_logger)
+                block = []
+        if block:
+            yield from self._add_block_metrics(block, metrics, experiment_logger)
+
+    def _add_block_metrics(self, block: List[Tuple[str, dict, Dict[str, pd.DatetimeIndex], Optional[dict]]],
+                           metrics: Union[list, dict],
+                           experiment_logger: Logger) -> Iterator[Tuple[str, dict, Optional[dict]]]:
+        """Add the metrics to the results of a block of basins (see `_add_metrics`)."""
+        basin_values = [{} for _ in block]
+        frequencies = list(dict.fromkeys(freq for _, basin_results, _, _ in block for freq in basin_results))
+        multiple_frequencies = len(self.cfg.use_frequencies) > 1
+        if metrics:
+            for freq, target_variable in itertools.product(frequencies, self.cfg.target_variables):
+                var_metrics = metrics if isinstance(metrics, list) else metrics[target_variable]
+                if "all" in var_metrics:
+                    var_metrics = get_available_metrics()
+
+                # stack dates and time_steps so we don't just evaluate every 24h when use_frequencies=[1D, 1h]
+                basin_indices, obs, sim, dates = [], [], [], []
+                for i, (_, basin_results, metric_dates, _) in enumerate(block):
+                    if freq not in basin_results:
+                        continue
+                    xr = basin_results[freq]["xr"]
+                    frequency_factor = len(metric_dates[freq]) // len(xr["date"])
+                    xr = xr.isel(time_step=slice(-frequency_factor, None))
+                    basin_obs = xr[f"{target_variable}_obs"].transpose("date", "time_step").values.reshape(-1)
+                    # metrics are only calculated if there are observations for this period
+                    if np.isnan(basin_obs).all():
+                        continue
+                    basin_sim = xr[f"{target_variable}_sim"]
+                    # clip negative predictions to zero, if variable is listed in config 'clip_target_to_zero'
+                    if target_variable in self.cfg.clip_targets_to_zero:
+                        basin_sim = xarray.where(basin_sim < 0, 0, basin_sim)
+                    if "samples" in basin_sim.dims:
+                        basin_sim = basin_sim.mean(dim="samples")
+                    basin_indices.append(i)
+                    obs.append(basin_obs)
+                    sim.append(basin_sim.transpose("date", "time_step").values.reshape(-1))
+                    dates.append(metric_dates[freq].values)
+                if not basin_indices:
+                    continue
+
+                # align the time series of all basins on their common dates
+                all_dates = np.unique(np.concatenate(dates))
+                dense_obs = np.full((len(basin_indices), len(all_dates)), np.nan)
+                dense_sim = np.full((len(basin_indices), len(all_dates)), np.nan)
+                for j, (basin_obs, basin_sim, basin_dates) in enumerate(zip(obs, sim, dates)):
+                    positions = np.searchsorted(all_dates, basin_dates)
+                    dense_obs[j, positions] = basin_obs
+                    dense_sim[j, positions] = basin_sim
+                values = calculate_multi_basin_metrics(dense_obs, dense_sim, var_metrics, resolution=freq,
+                                                       dates=all_dates)
+
+                for j, i in enumerate(basin_indices):
+                    freq_values = {metric: float(metric_values[j]) for metric, metric_values in values.items()}
+                    if np.isnan(sim[j]).all():
+                        msg = (f"Basin {block[i][0]} " +
+                               (f"{target_variable} " if len(self.cfg.target_variables) > 1 else "") +
+                               (f"{freq} " if multiple_frequencies else "") +
+                               "All simulated values are NaN, thus metrics will be NaN, too.")
+                        LOGGER.warning(msg)
+                    # add variable identifier to metrics if needed
+                    if len(self.cfg.target_variables) > 1:
+                        freq_values = {f"{target_variable}_{key}": val for key, val in freq_values.items()}
+                    # add frequency identifier to metrics if needed
+                    if multiple_frequencies:
+                        freq_values = {f"{key}_{freq}": val for key, val in freq_values.items()}
+                    basin_values[i].setdefault(freq, {}).update(freq_values)
+
+        for (basin, basin_results, _, basin_output), values in zip(block, basin_values):
+            for freq, freq_values in values.items():
+                if experiment_logger is not None:
+                    experiment_logger.log_step(**freq_values)
+                basin_results[freq].update(freq_values)
+            yield basin, basin_results, basin_output
+
     def _create_and_log_figures(self, results: dict, experiment_logger: Logger, epoch: int):
         basins = list(results.keys())
         random.shuffle(basins)
@@ -399,21 +786,11 @@ class BaseTester(object):
         pickle as a wrapper. The reason is that netCDF files have special constraints on the characters/symbols that can
         be used as variable names. However, for convenience we will store metrics, if calculated, in a separate csv-file.
         """
-        # use name of weight file as part of the result folder name
-        weight_file = self._get_weight_file(epoch=epoch)
-
-        # make sure the parent directory exists
-        parent_directory = self.run_dir / self.period / weight_file.stem
-        parent_directory.mkdir(parents=True, exist_ok=True)
+        parent_directory = self._get_results_directory(epoch)
 
         # save metrics any time this function is called, as long as they exist
         if self.cfg.metrics and results is not None:
-            metrics_list = self.cfg.metrics
-            if isinstance(metrics_list, dict):
-                metrics_list = list(set(metrics_list.values()))
-            if "all" in metrics_list:
-                metrics_list = get_available_metrics()
-            df = metrics_to_dataframe(results, metrics_list, self.cfg.target_variables)
+            df = metrics_to_dataframe(results, self._get_metrics_list(), self.cfg.target_variables)
             metrics_file = parent_directory / f"{self.period}_metrics.csv"
             df.to_csv(metrics_file)
             LOGGER.info(f"Stored metrics at {metrics_file}")
@@ -432,43 +809,65 @@ class BaseTester(object):
                 pickle.dump(states, fp)
             LOGGER.info(f"Stored states at {result_file}")
 
-    def _evaluate(self, model: BaseModel, loader: DataLoader, frequencies: List[str], save_all_output: bool = False):
-        """Evaluate model"""
+    def _get_results_directory(self, epoch: int = None) -> Path:
+        """Return (and create) the folder in which the results of the given epoch are stored."""
+        # use name of weight file as part of the result folder name
+        weight_file = self._get_weight_file(epoch=epoch)
+
+        # make sure the parent directory exists
+        parent_directory = self.run_dir / self.period / weight_file.stem
+        parent_directory.mkdir(parents=True, exist_ok=True)
+        return parent_directory
+
+    def _get_metrics_list(self) -> List[str]:
+        """Return the names of all metrics of the run configuration."""
+        metrics_list = self.cfg.metrics
+        if isinstance(metrics_list, dict):
+            metrics_list = list(set(metrics_list.values()))
+        if "all" in metrics_list:
+            metrics_list = get_available_metrics()
+        return metrics_list
+
+    def _evaluate(self,
+                  model: BaseModel,
+                  loader: DataLoader,
+                  frequencies: List[str],
+                  save_all_output: bool = False,
+                  seq_length: int = None,
+                  n_samples: int = None):
+        """Evaluate model
+
+        The outputs are copied into arrays that are preallocated for `n_samples` samples (by default, the length of the
+        data set of the loader), such that each batch is copied only once.
+
+        If `seq_length` is passed, the batches contain sequences that cover several samples of `seq_length` time steps
+        each, and the outputs are cut into the windows of these samples (see `_evaluate_sequences`).
+        """
         predict_last_n = self.cfg.predict_last_n
         if isinstance(predict_last_n, int):
             predict_last_n = {frequencies[0]: predict_last_n}  # if predict_last_n is int, there's only one frequency
+        if n_samples is None:
+            n_samples = len(loader.dataset) if hasattr(loader, "dataset") else 0
+        # page-locked host memory allows asynchronous copies from the GPU
+        pin_memory = self.device.type == "cuda"
 
         preds, obs, dates, all_output = {}, {}, {}, {}
         losses = []
         with torch.no_grad():
             for data in loader:
-                for key in data.keys():
-                    if key.startswith("x_d"):
-                        data[key] = {k: v.to(self.device) for k, v in data[key].items()}
-                    elif not key.startswith("date"):
-                        if key == "static_conceptual_params":
-                            data[key] = move_data_to_device(data[key], self.device)
-                        else:
-                            data[key] = data[key].to(self.device)
-                    # if key.startswith("x_d"):
-                    #     data[key] = {k: v.to(self.device) for k, v in data[key].items()}
-                    # elif not key.startswith("date"):
-                    #     print(f"key is {key}")
-                    #     print(data)
-                    #     data[key] = data[key].to(self.device)
-                data = model.pre_model_hook(data, is_train=False)
-                predictions, loss = self._get_predictions_and_loss(model, data)
+                data = model.pre_model_hook(self._move_to_device(data), is_train=False)
+                if seq_length is None:
+                    predictions, loss = self._get_predictions_and_loss(model, data)
+                else:
+                    predictions, loss, data = self._get_sequence_predictions_and_loss(
+                        model, data, seq_length, predict_last_n[frequencies[0]])
 
-                if all_output:
+                if save_all_output:
                     for key, value in predictions.items():
                         if value is not None and not isinstance(value, dict):
-                            all_output[key].append(value.detach().cpu().numpy())
-                elif save_all_output:
-                    all_output = {
-                        key: [value.detach().cpu().numpy()]
-                        for key, value in predictions.items()
-                        if value is not None and type(value) != dict
-                    }
+                            if key not in all_output:
+                                all_output[key] = _OutputBuffer(n_samples, pin_memory)
+                            all_output[key].append(value.detach())
 
                 for freq in frequencies:
                     if predict_last_n[freq] == 0:
@@ -479,40 +878,75 @@ class BaseTester(object):
                     date_sub = data[f"date{freq_key}"][:, -predict_last_n[freq] :]
 
                     if freq not in preds:
-                        preds[freq] = y_hat_sub.detach().cpu()
-                        obs[freq] = y_sub.cpu()
-                        dates[freq] = date_sub
-                    else:
-                        preds[freq] = torch.cat((preds[freq], y_hat_sub.detach().cpu()), 0)
-                        obs[freq] = torch.cat((obs[freq], y_sub.detach().cpu()), 0)
-                        dates[freq] = np.concatenate((dates[freq], date_sub), axis=0)
+                        preds[freq] = _OutputBuffer(n_samples, pin_memory)
+                        obs[freq] = _OutputBuffer(n_samples, pin_memory)
+                        dates[freq] = _OutputBuffer(n_samples, pin_memory)
+                    preds[freq].append(y_hat_sub.detach())
+                    obs[freq].append(y_sub.detach())
+                    dates[freq].append(date_sub)
 
                 losses.append(loss)
 
             for freq in preds.keys():
-                preds[freq] = preds[freq].numpy()
-                obs[freq] = obs[freq].numpy()
-
-        # concatenate all output variables (currently a dict-of-dicts) into a single-level dict
-        for key, list_of_data in all_output.items():
-            all_output[key] = np.concatenate(list_of_data, 0)
-
-        # set to NaN explicitly if all losses are NaN to avoid RuntimeWarning
-        mean_losses = {}
-        if len(losses) == 0:
-            mean_losses["loss"] = np.nan
-        else:
-            for loss_name in losses[0].keys():
-                loss_values = [loss[loss_name] for loss in losses]
-                mean_losses[loss_name] = np.nanmean(loss_values) if not np.all(np.isnan(loss_values)) else np.nan
-
-        return preds, obs, dates, mean_losses, all_output
+                preds[freq] = preds[freq].to_numpy()
+                obs[freq] = obs[freq].to_numpy()
+                # dates are int32 offsets if the data set is stored in a compact data type
+                dates[freq] = decode_dates(dates[freq].to_numpy())
+
+        # convert the buffers of all output variables into arrays
+        for key, buffer in all_output.items():
+            all_output[key] = buffer.to_numpy()
+
+        return preds, obs, dates, _get_mean_losses(losses), all_output
+
+    def _move_to_device(self, data: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        for key in data.keys():
+            if key.startswith("x_d"):
+                data[key] = {k: v.to(self.device).float() for k, v in data[key].items()}
+            elif key.startswith("x_s"):
+                data[key] = data[key].to(self.device).float()
+            elif not key.startswith("date"):
+                if key == "static_conceptual_params":
+                    data[key] = move_data_to_device(data[key], self.device)
+                else:
+                    data[key] = data[key].to(self.device)
+            # if key.startswith("x_d"):
+            #     data[key] = {k: v.to(self.device) for k, v in data[key].items()}
+            # elif not key.startswith("date"):
+            #     print(f"key is {key}")
+            #     print(data)
+            #     data[key] = data[key].to(self.device)
+        return data
 
     def _get_predictions_and_loss(self, model: BaseModel, data: Dict[str, torch.Tensor]) -> Tuple[torch.Tensor, float]:
         predictions = model(data)
         _, all_losses = self.loss_obj(predictions, data)
         return predictions, {k: v.item() for k, v in all_losses.items()}
 
+    def _get_sequence_predictions_and_loss(self, model: BaseModel, data: Dict[str, torch.Tensor], seq_length: int,
+                                           predict_last_n: int) -> Tuple[Dict[str, torch.Tensor], dict, dict]:
+        """Run the model on long sequences and cut outputs and targets into the windows of the covered samples.
+
+        A sequence of `seq_length + n - 1` time steps covers n samples. For each sample, the windows contain the last
+        `predict_last_n` time steps, such that the loss and the results are computed as for the regular samples.
+        """
+        outputs = model(data)
+        total_length = data["y"].shape[1]
+        n_windows = total_length - seq_length + 1
+        predictions = {
+            key: _cut_windows(value, n_windows, predict_last_n)
+            for key, value in outputs.items()
+            if isinstance(value, torch.Tensor) and value.ndim > 1 and value.shape[1] == total_length
+        }
+        windows = {}
+        for key, value in data.items():
+            if key.startswith("y") or key.startswith("date"):
+                windows[key] = _cut_windows(value, n_windows, predict_last_n)
+            elif isinstance(value, torch.Tensor):
+                windows[key] = value.repeat_interleave(n_windows, dim=0)
+        _, all_losses = self.loss_obj(predictions, windows)
+        return predictions, {k: v.item() for k, v in all_losses.items()}, windows
+
     def _subset_targets(
         self, model: BaseModel, data: Dict[str, torch.Tensor], predictions: np.ndarray, predict_last_n: int, freq: str
     ):
@@ -606,3 +1040,81 @@ class UncertaintyTester(BaseTester):
 
     def _get_plots(self, qobs: np.ndarray, qsim: np.ndarray, title: str):
         return plots.uncertainty_plot(qobs, qsim, title)
+
+
+def _get_mean_losses(losses: List[Dict[str, float]]) -> Dict[str, float]:
+    """Average the losses of all batches."""
+    # set to NaN explicitly if all losses are NaN to avoid RuntimeWarning
+    mean_losses = {}
+    if len(losses) == 0:
+        mean_losses["loss"] = np.nan
+    else:
+        for loss_name in losses[0].keys():
+            loss_values = [loss[loss_name] for loss in losses]
+            mean_losses[loss_name] = np.nanmean(loss_values) if not np.all(np.isnan(loss_values)) else np.nan
+    return mean_losses
+
+
+def _cut_windows(values: Union[torch.Tensor, np.ndarray], n_windows: int,
+                 window_length: int) -> Union[torch.Tensor, np.ndarray]:
+    """Cut the last `n_windows` windows of `window_length` time steps, each shifted by one time step, out of sequences.
+
+    Sequences of shape [batch size, sequence length, ...] become windows of shape
+    [batch size * n_windows, window_length, ...].
+    """
+    if isinstance(values, np.ndarray):
+        windows = np.lib.stride_tricks.sliding_window_view(values, window_length, axis=1)[:, -n_windows:]
+        return np.moveaxis(windows, -1, 2).reshape(-1, window_length, *values.shape[2:])
+    windows = values.unfold(1, window_length, 1)[:, -n_windows:]
+    return windows.movedim(-1, 2).reshape(-1, window_length, *values.shape[2:])
+
+
+class _OutputBuffer(object):
+    """Array into which the outputs of the batches are copied, preallocated for the expected number of samples.
+
+    The array is allocated with the shape and data type of the first batch. If more samples arrive than expected, its
+    capacity is doubled. Tensors on the GPU are copied asynchronously into page-locked memory, if `pin_memory` is True.
+    """
+
+    def __init__(self, n_samples: int, pin_memory: bool = False):
+        self._n_samples = n_samples
+        self._pin_memory = pin_memory
+        self._values = None
+        self._size = 0
+        self._cuda_device = None
+
+    def append(self, values: Union[torch.Tensor, np.ndarray]):
+        end = self._size + len(values)
+        if self._values is None:
+            self._values = self._allocate(values, max(self._n_samples, end))
+        elif end > len(self._values):
+            grown = self._allocate(values, max(2 * len(self._values), end))
+            if self._cuda_device is not None:
+                # the asynchronous copies from the GPU into the old buffer have to be completed before it is copied
+                torch.cuda.synchronize(self._cuda_device)
+            grown[:self._size] = self._values[:self._size]
+            self._values = grown
+        if isinstance(values, torch.Tensor):
+            if values.is_cuda:
+                self._cuda_device = values.device
+            self._values[self._size:end].copy_(values, non_blocking=values.is_cuda and self._pin_memory)
+        else:
+            self._values[self._size:end] = values
+        self._size = end
+
+    def to_numpy(self) -> np.ndarray:
+        """Return the filled part of the buffer as numpy array."""
+        if self._cuda_device is not None:
+            # wait for the asynchronous copies from the GPU
+            torch.cuda.synchronize(self._cuda_device)
+        values = self._values[:self._size]
+        if self._size < len(self._values):
+            # don't keep the unused capacity alive
+            values = values.copy() if isinstance(values, np.ndarray) else values.clone()
+        return values.numpy() if isinstance(values, torch.Tensor) else values
+
+    def _allocate(self, values: Union[torch.Tensor, np.ndarray], n_samples: int) -> Union[torch.Tensor, np.ndarray]:
+        shape = (n_samples, *values.shape[1:])
+        if isinstance(values, torch.Tensor):
+            return torch.empty(shape, dtype=values.dtype, pin_memory=self._pin_memory)
+        return np.empty(shape, dtype=values.dtype)
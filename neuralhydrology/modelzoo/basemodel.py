@@ -57,6 +57,10 @@ class BaseModel(nn.Module):
         scaler = load_scaler(self.cfg.run_dir)
         return sample_pointpredictions(self, data, n_samples, scaler)
 
+    def _one_hot_basin_ids(self, basin_ids: torch.Tensor) -> torch.Tensor:
+        """One-hot encode the integer basin ids (`x_basin_id`) of a batch on their device."""
+        return nn.functional.one_hot(basin_ids, num_classes=self.cfg.number_of_basins).to(torch.float32)
+
     def forward(self, data: dict[str, torch.Tensor | dict[str, torch.Tensor]]) -> Dict[str, torch.Tensor]:
         """Perform a forward pass.
 
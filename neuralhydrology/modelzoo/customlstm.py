@@ -160,8 +160,24 @@ class _LSTMCell(nn.Module):
         if self.initial_forget_bias != 0:
             self.b_hh.data[self.hidden_size:2 * self.hidden_size] = self.initial_forget_bias
 
-    def forward(self, x_t: torch.Tensor, h_0: torch.Tensor, c_0: torch.Tensor) -> Dict[str, torch.Tensor]:
-        gates = h_0 @ self.w_hh.T + self.b_hh + x_t @ self.w_ih.T + self.b_ih
+    def get_static_gates(self, x_s: torch.Tensor) -> torch.Tensor:
+        """Compute the contribution of static inputs, which are the last inputs of the cell, to the gates.
+
+        The result can be passed to `forward` for each time step, such that the static inputs are neither repeated over
+        the sequence nor multiplied with their weights at each time step.
+        """
+        return x_s @ self.w_ih[:, self.input_size - x_s.shape[-1]:].T
+
+    def forward(self,
+                x_t: torch.Tensor,
+                h_0: torch.Tensor,
+                c_0: torch.Tensor,
+                static_gates: torch.Tensor = None) -> Dict[str, torch.Tensor]:
+        if static_gates is None:
+            gates = h_0 @ self.w_hh.T + self.b_hh + x_t @ self.w_ih.T + self.b_ih
+        else:
+            # x_t contains only the dynamic inputs
+            gates = h_0 @ self.w_hh.T + self.b_hh + x_t @ self.w_ih[:, :x_t.shape[-1]].T + static_gates + self.b_ih
         i, f, g, o = gates.chunk(4, 1)
 
         c_1 = c_0 * torch.sigmoid(f) + torch.sigmoid(i) * torch.tanh(g)
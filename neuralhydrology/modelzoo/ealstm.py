@@ -84,7 +84,7 @@ class EALSTM(BaseModel):
         # possibly pass dynamic and static inputs through embedding layers
         x_d, x_s = self.embedding_net(data, concatenate_output=False)
         if x_s is None:
-            raise ValueError('Need x_s or x_one_hot in forward pass.')
+            raise ValueError('Need x_s or x_basin_id in forward pass.')
 
         # TODO: move hidden and cell state initialization to init and only reset states in forward pass to zero.
         h_t = x_d.data.new(x_d.shape[1], self._hidden_size).zero_()
@@ -100,8 +100,10 @@ class InputLayer(nn.Module):
             self._num_autoregression_inputs = len(cfg.autoregressive_inputs)
 
         statics_input_size = len(cfg.static_attributes + cfg.hydroatlas_attributes + cfg.evolving_attributes)
+        self._num_basins = 0
         if cfg.use_basin_id_encoding:
-            statics_input_size += cfg.number_of_basins
+            self._num_basins = cfg.number_of_basins
+            statics_input_size += self._num_basins
 
         self.statics_embedding, self.statics_output_size = \
             self._get_embedding_net(cfg.statics_embedding, statics_input_size, 'statics')
@@ -210,18 +212,9 @@ class InputLayer(nn.Module):
         if isinstance(features, dict):
             features = features[list(features.keys())[0]]
 
-        if 'x_s' in data and 'x_one_hot' in data:
-            x_s = torch.cat([data['x_s'], data['x_one_hot']], dim=-1)
-        elif 'x_s' in data:
-            x_s = data['x_s']
-        elif 'x_one_hot' in data:
-            x_s = data['x_one_hot']
-        else:
-            x_s = None
-
         statics_out = None
-        if x_s is not None:
-            statics_out = self.statics_embedding(x_s)
+        if 'x_s' in data or 'x_basin_id' in data:
+            statics_out = self._embed_statics(data.get('x_s'), data.get('x_basin_id'))
 
         if self.nan_handling_method == 'masked_mean':
             dynamics_out = self._masked_mean_embedding(data[self._x_d_key])
@@ -238,7 +231,9 @@ class InputLayer(nn.Module):
             ret_val = dynamics_out, statics_out
         else:
             if statics_out is not None:
-                statics_out = statics_out.unsqueeze(0).repeat(dynamics_out.shape[0], 1, 1)
+                # broadcast the statics over the sequence as a view. The concatenation still materializes them at each
+                # time step, because the (cuDNN) sequence models take a single input tensor.
+                statics_out = statics_out.unsqueeze(0).expand(dynamics_out.shape[0], -1, -1)
                 ret_val = torch.cat([dynamics_out, statics_out], dim=-1)
             else:
                 ret_val = dynamics_out
@@ -252,6 +247,25 @@ class InputLayer(nn.Module):
 
         return ret_val
 
+    def _embed_statics(self, x_s: Optional[torch.Tensor], basin_ids: Optional[torch.Tensor]) -> torch.Tensor:
+        """Embed the static inputs, followed by the one-hot encoding of the basin ids if basin ids are passed.
+
+        If the statics are passed through an embedding network, the product of the one-hot encoding with the weights of
+        the first layer is computed as a lookup of the weight columns of the basins, such that the (dense) one-hot
+        encoding is never created.
+        """
+        if basin_ids is None:
+            return self.statics_embedding(x_s)
+        if isinstance(self.statics_embedding, FC):
+            first_layer = self.statics_embedding.net[0]
+            basin_weights = first_layer.weight[:, -self._num_basins:]
+            statics_out = nn.functional.embedding(basin_ids, basin_weights.t()) + first_layer.bias
+            if x_s is not None:
+                statics_out = statics_out + nn.functional.linear(x_s, first_layer.weight[:, :-self._num_basins])
+            return self.statics_embedding.net[1:](statics_out)
+        x_one_hot = nn.functional.one_hot(basin_ids, num_classes=self._num_basins).to(torch.float32)
+        return self.statics_embedding(x_one_hot if x_s is None else torch.cat([x_s, x_one_hot], dim=-1))
+
     def _attention(self, x_d: dict[str, torch.Tensor], statics_embedding: torch.Tensor | None) -> torch.Tensor:
         """Attention mechanism with statics + positional encoding as query, feature groups as keys and values."""
         if statics_embedding is None:
@@ -276,7 +290,7 @@ class InputLayer(nn.Module):
         n_groups, seq_len, batch_size, embed_dim = dynamics_out.shape
         stacked_masks = torch.stack(masks, dim=0).view(n_groups, seq_len * batch_size, 1)
         # query: (seq_len, batch_size, embed_dim)
-        query = statics_embedding.unsqueeze(0).repeat(seq_len, 1, 1)
+        query = statics_embedding.unsqueeze(0).expand(seq_len, -1, -1)
         if self._pos_enc is not None:
             query = self._pos_enc(query)
         query = torch.cat([query, stacked_masks.squeeze(-1).permute(1, 0).view(seq_len, batch_size, n_groups)],dim=-1)
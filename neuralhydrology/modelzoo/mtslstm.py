@@ -194,7 +194,7 @@ class MTSLSTM(BaseModel):
             input_data = {
                 'x_d': data[f'x_d_{freq}'],
                 'x_s': data.get('x_s'),
-                'x_one_hot': data.get('x_one_hot')
+                'x_basin_id': data.get('x_basin_id')
             }
             # if specific x_s for frequency is available, use that
             if f'x_s_{freq}' in data:
@@ -224,19 +224,19 @@ class MTSLSTM(BaseModel):
                 # no dynamic features found, which is invalid
                 raise ValueError(f"No dynamic features found for frequency {freq}.")
 
-            # concat all static and one-hot encoded features
-            if f'x_s{suffix}' in data and 'x_one_hot' in data:
-                x_s = data[f'x_s{suffix}'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
-                x_one_hot = data['x_one_hot'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
+            # concat all static and one-hot encoded features, which are broadcast over the sequence as views
+            if f'x_s{suffix}' in data and 'x_basin_id' in data:
+                x_s = data[f'x_s{suffix}'].unsqueeze(0).expand(x_d.shape[0], -1, -1)
+                x_one_hot = self._one_hot_basin_ids(data['x_basin_id']).unsqueeze(0).expand(x_d.shape[0], -1, -1)
                 x_d = torch.cat([x_d, x_s, x_one_hot], dim=-1)
             elif f'x_s{suffix}' in data:
-                x_s = data[f'x_s{suffix}'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
+                x_s = data[f'x_s{suffix}'].unsqueeze(0).expand(x_d.shape[0], -1, -1)
                 x_d = torch.cat([x_d, x_s], dim=-1)
             elif 'x_s' in data:
-                x_s = data['x_s'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
+                x_s = data['x_s'].unsqueeze(0).expand(x_d.shape[0], -1, -1)
                 x_d = torch.cat([x_d, x_s], dim=-1)
-            elif 'x_one_hot' in data:
-                x_one_hot = data['x_one_hot'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
+            elif 'x_basin_id' in data:
+                x_one_hot = self._one_hot_basin_ids(data['x_basin_id']).unsqueeze(0).expand(x_d.shape[0], -1, -1)
                 x_d = torch.cat([x_d, x_one_hot], dim=-1)
             else:
                 pass
@@ -126,33 +126,33 @@ class ODELSTM(BaseModel):
                self._frequency_factors[self._frequencies[-2]] for f in self._frequencies):
             raise NotImplementedError('predict_last_n cannot be larger than sequence length of highest frequency.')
 
-    def _prepare_inputs(self, data: Dict[str, torch.Tensor],
-                        freq: str) -> Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor]]:
-        """Concat all different inputs to the time series input. """
+    def _prepare_inputs(self, data: Dict[str, torch.Tensor], freq: str) -> torch.Tensor:
+        """Concat all dynamic inputs to the time series input. """
         suffix = f"_{freq}"
         # transpose to [seq_length, batch_size, n_features]
         x_d = torch.cat([data[f'x_d{suffix}'][k] for k in self._dynamic_inputs], dim=-1).transpose(0, 1)
 
-        # concat all inputs
-        if f'x_s{suffix}' in data and 'x_one_hot' in data:
-            x_s = data[f'x_s{suffix}'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
-            x_one_hot = data['x_one_hot'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
-            x_d = torch.cat([x_d, x_s, x_one_hot], dim=-1)
-        elif f'x_s{suffix}' in data:
-            x_s = data[f'x_s{suffix}'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
-            x_d = torch.cat([x_d, x_s], dim=-1)
-        elif 'x_one_hot' in data:
-            x_one_hot = data['x_one_hot'].unsqueeze(0).repeat(x_d.shape[0], 1, 1)
-            x_d = torch.cat([x_d, x_one_hot], dim=-1)
-        else:
-            pass
-
         # add frequency indicator. This will not be used as normal input, but the ODE-RNN uses it to determine the
         # elapsed time since the last sample.
         frequency_factor = 1 / self._frequency_factors[freq]
         frequency_encoding = torch.ones(x_d.shape[0], x_d.shape[1], 1).to(x_d) * frequency_factor
         return torch.cat([x_d, frequency_encoding], dim=-1)
 
+    def _get_static_gates(self, data: Dict[str, torch.Tensor], freq: str) -> Union[torch.Tensor, None]:
+        """Compute the contribution of the static inputs and the one-hot encoded basin ids to the LSTM gates.
+
+        The static inputs are the last inputs of the LSTM cell. Their contribution is computed once per sample instead
+        of repeating them over the input sequence.
+        """
+        x_s = []
+        if f'x_s_{freq}' in data:
+            x_s.append(data[f'x_s_{freq}'])
+        if 'x_basin_id' in data:
+            x_s.append(self._one_hot_basin_ids(data['x_basin_id']))
+        if not x_s:
+            return None
+        return self.lstm_cell.get_static_gates(torch.cat(x_s, dim=-1))
+
     def _randomize_freq(self, x_d: torch.Tensor, low_frequency: str, high_frequency: str) -> torch.Tensor:
         """Randomize the frequency of the  input sequence. """
         frequency_factor = int(get_frequency_factor(low_frequency, high_frequency))
@@ -195,6 +195,7 @@ class ODELSTM(BaseModel):
         """
 
         x_d = {freq: self._prepare_inputs(data, freq) for freq in self._frequencies}
+        static_gates = {freq: self._get_static_gates(data, freq) for freq in self._frequencies}
 
         slice_one = self._randomize_freq(x_d[self._frequencies[0]][:-self._slice_timesteps[self._frequencies[1]]],
                                          self.cfg.ode_random_freq_lower_bound, self._frequencies[0])
@@ -202,7 +203,7 @@ class ODELSTM(BaseModel):
         batch_size = slice_one.shape[1]
         h_0 = slice_one.data.new(batch_size, self.cfg.hidden_size).zero_()
         c_0 = slice_one.data.new(batch_size, self.cfg.hidden_size).zero_()
-        h_n, c_n = self._run_odelstm(slice_one, h_0, c_0)
+        h_n, c_n = self._run_odelstm(slice_one, h_0, c_0, static_gates[self._frequencies[0]])
 
         prev_freq = self._frequencies[0]
         i = 1
@@ -214,7 +215,7 @@ class ODELSTM(BaseModel):
                 continue
             # random-frequency steps until the beginning of the highest-frequency input sequence.
             slice_two = self._randomize_freq(to_randomize, prev_freq, freq)
-            h_n, c_n = self._run_odelstm(slice_two, h_n[:, -1], c_n)
+            h_n, c_n = self._run_odelstm(slice_two, h_n[:, -1], c_n, static_gates[freq])
             prev_freq = freq
             i += 1
 
@@ -233,18 +234,18 @@ class ODELSTM(BaseModel):
             if end_step != prev_freq_end_step and end_step > -self.cfg.seq_length[self._frequencies[-1]]:
                 slice_three = self._randomize_freq(x_d[self._frequencies[-1]][prev_freq_end_step:end_step], prev_freq,
                                                    self._frequencies[-1])
-                h_n, c_n = self._run_odelstm(slice_three, h_n[:, -1], c_n)
+                h_n, c_n = self._run_odelstm(slice_three, h_n[:, -1], c_n, static_gates[self._frequencies[-1]])
                 prev_freq_end_step = end_step
 
             # run predict_last_n steps at the target frequency
             pred_slice = x_d[freq][-self.cfg.predict_last_n[freq]:]
-            h_n_out, _ = self._run_odelstm(pred_slice, h_n[:, -1], c_n)
+            h_n_out, _ = self._run_odelstm(pred_slice, h_n[:, -1], c_n, static_gates[freq])
             pred[f'y_hat_{freq}'] = self.head(self.dropout(h_n_out))['y_hat']
 
         return pred
 
-    def _run_odelstm(self, input_slice: torch.Tensor, h_0: torch.Tensor,
-                     c_0: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    def _run_odelstm(self, input_slice: torch.Tensor, h_0: torch.Tensor, c_0: torch.Tensor,
+                     static_gates: Union[torch.Tensor, None]) -> Tuple[torch.Tensor, torch.Tensor]:
         """Ingest `input_slice` into the ODE-LSTM and return hidden states and last cell state. """
         h_x = (h_0, c_0)
 
@@ -256,7 +257,7 @@ class ODELSTM(BaseModel):
             t_input = x_t[:, :-1]
             t_elapsed = x_t[0, -1]
 
-            lstm_out = self.lstm_cell(x_t=t_input, h_0=h_0, c_0=c_0)
+            lstm_out = self.lstm_cell(x_t=t_input, h_0=h_0, c_0=c_0, static_gates=static_gates)
             ode_out = self.ode_cell(lstm_out['h_n'], h_0, t_elapsed)
 
             h_x = (ode_out, lstm_out['c_n'])
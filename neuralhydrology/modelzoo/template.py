@@ -39,7 +39,7 @@ class TemplateModel(BaseModel):
         """Forward pass through the model
 
                 By convention, each forward pass has to accept a dict of input tensors. Usually, this dict contains
-                'x_d' and, possibly, x_s and x_one_hot. If x_d and x_s are available at multiple frequencies,
+                'x_d' and, possibly, x_s and x_basin_id. If x_d and x_s are available at multiple frequencies,
                 the keys 'x_d' and 'x_s' have frequency suffixes such as 'x_d_1h' for hourly data.
                 Furthermore, by definition, each model has to return a dict containing the network predictions in
                 'y_hat', potentially in addition to other dictionary keys. LSTM-based models should stick to the
@@ -56,9 +56,9 @@ class TemplateModel(BaseModel):
                             concatenation of what is defined in the config under static_attributes and evolving_attributes.
                             In case not a single camels attribute or static input feature is defined in the config,
                             x_s will not be present.
-                        - x_one_hot of shape [batch size, number of basins] containing the one hot encoding of the
-                            basins. In case 'use_basin_id_encoding' is set to False in the config, x_one_hot will
-                            not be present.
+                        - x_basin_id of shape [batch size] containing the integer ids of the basins, which models
+                            use as one-hot encoding (see `BaseModel._one_hot_basin_ids`). In case
+                            'use_basin_id_encoding' is set to False in the config, x_basin_id will not be present.
                             
                         Note: If the input data are available at multiple frequencies (via use_frequencies), each input
                             dictionary key will have a suffix "_{freq}" indicating the corresponding value's frequency.
@@ -0,0 +1,106 @@
+from typing import Dict, List
+
+import torch
+
+from neuralhydrology.utils.config import Config
+
+
+def add_nan_streaks(x_d: Dict[str, torch.Tensor],
+                    groups: List[List[str]],
+                    nan_step_probability: float,
+                    nan_sequence_probability: float,
+                    generator: torch.Generator = None) -> Dict[str, torch.Tensor]:
+    """Set random time steps and whole sequences of feature groups to NaN in a batch of dynamic inputs.
+
+    For each sample and feature group, the whole sequence is dropped with probability `nan_sequence_probability`, but
+    never the sequences of all groups of a sample at the same time. Additionally, each time step of each group is
+    dropped with probability `nan_step_probability`. All random numbers of the batch are drawn with a single call on
+    the device of the inputs.
+
+    Parameters
+    ----------
+    x_d : Dict[str, torch.Tensor]
+        Dynamic inputs of a batch. Maps feature names to tensors of shape [batch size, sequence length, 1].
+    groups : List[List[str]]
+        Feature groups that are dropped together.
+    nan_step_probability : float
+        Probability to drop a single time step of a feature group.
+    nan_sequence_probability : float
+        Probability to drop the whole sequence of a feature group.
+    generator : torch.Generator, optional
+        Random number generator on the device of the inputs, e.g., for reproducible augmentation.
+
+    Returns
+    -------
+    Dict[str, torch.Tensor]
+        Dynamic inputs with NaNs at the dropped time steps.
+
+    Raises
+    ------
+    ValueError
+        If `groups` is not a list of lists.
+    """
+    if not groups or not isinstance(groups[0], list):
+        raise ValueError("For dropout streaks, dynamic_inputs must be a list of lists.")
+    batch_size, seq_length = x_d[groups[0][0]].shape[:2]
+    device = x_d[groups[0][0]].device
+
+    # per sample and group: one random number per time step, one for the sequence dropout, and one to choose the group
+    # that is kept if the sequences of all groups would be dropped
+    uniform = torch.rand((batch_size, len(groups), seq_length + 2), device=device, generator=generator)
+    drop_steps = uniform[:, :, :seq_length] < nan_step_probability
+    drop_sequences = uniform[:, :, seq_length] < nan_sequence_probability
+    all_dropped = drop_sequences.all(dim=1, keepdim=True)
+    kept_group = torch.nn.functional.one_hot(uniform[:, :, seq_length + 1].argmax(dim=1), len(groups)).bool()
+    drop_sequences = drop_sequences & ~(all_dropped & kept_group)
+    drop_masks = (drop_steps | drop_sequences.unsqueeze(-1)).unsqueeze(-1)
+
+    for i, group in enumerate(groups):
+        for feature in group:
+            x_d[feature] = torch.where(drop_masks[:, i], torch.nan, x_d[feature])
+    return x_d
+
+
+def add_nan_streaks_to_batch(data: Dict[str, torch.Tensor],
+                             cfg: Config,
+                             generator: torch.Generator = None) -> Dict[str, torch.Tensor]:
+    """Apply `add_nan_streaks` to all dynamic inputs of a batch, according to the run configuration.
+
+    If `hindcast_inputs` are specified, the hindcast and forecast inputs are augmented with the feature groups in
+    `hindcast_inputs` and `forecast_inputs`. Otherwise, the dynamic inputs of each frequency are augmented with the
+    feature groups in `dynamic_inputs`.
+
+    Parameters
+    ----------
+    data : Dict[str, torch.Tensor]
+        Batch of training samples, as returned by the data loader.
+    cfg : Config
+        The run configuration, which defines `nan_step_probability` and `nan_sequence_probability`.
+    generator : torch.Generator, optional
+        Random number generator on the device of the batch.
+
+    Returns
+    -------
+    Dict[str, torch.Tensor]
+        The batch with augmented dynamic inputs.
+    """
+    for key in data.keys():
+        if not key.startswith("x_d") or not data[key]:
+            continue
+        if cfg.hindcast_inputs_flattened:
+            if key.endswith("_hindcast"):
+                groups = cfg.hindcast_inputs
+            elif key.endswith("_forecast"):
+                groups = cfg.forecast_inputs
+            else:
+                continue
+        elif key.endswith("_hindcast") or key.endswith("_forecast"):
+            continue
+        else:
+            groups = cfg.dynamic_inputs
+        data[key] = add_nan_streaks(data[key],
+                                    groups=groups,
+                                    nan_step_probability=cfg.nan_step_probability,
+                                    nan_sequence_probability=cfg.nan_sequence_probability,
+                                    generator=generator)
+    return data
@@ -19,6 +19,7 @@ from neuralhydrology.evaluation import get_tester
 from neuralhydrology.evaluation.tester import BaseTester
 from neuralhydrology.modelzoo import get_model
 from neuralhydrology.training import get_loss_obj, get_optimizer, get_regularization_obj
+from neuralhydrology.training.augmentation import add_nan_streaks_to_batch
 from neuralhydrology.training.logger import Logger
 from neuralhydrology.utils.config import Config
 from neuralhydrology.utils.logging_utils import setup_logging
@@ -47,6 +48,7 @@ class BaseTrainer(object):
         self.loader = None
         self.validator = None
         self.noise_sampler_y = None
+        self._nan_streak_generator = None
         self._target_mean = None
         self._target_std = None
         self._scaler = {}
@@ -103,9 +105,11 @@ class BaseTrainer(object):
         return get_tester(cfg=self.cfg, run_dir=self.cfg.run_dir, period="validation", init_model=False)
 
     def _get_data_loader(self, ds: BaseDataset) -> torch.utils.data.DataLoader:
+        sampler = ds.get_sampler()
         return DataLoader(ds,
                           batch_size=self.cfg.batch_size,
-                          shuffle=True,
+                          shuffle=sampler is None,
+                          sampler=sampler,
                           num_workers=self.cfg.num_workers,
                           collate_fn=ds.collate_fn)
 
@@ -207,6 +211,11 @@ class BaseTrainer(object):
             self._target_std = torch.from_numpy(
                 ds.scaler["xarray_feature_scale"][self.cfg.target_variables].to_array().values).to(self.device)
 
+        if self.cfg.nan_step_probability or self.cfg.nan_sequence_probability:
+            # separate generator on the training device, such that the augmentation is reproducible with the seed
+            self._nan_streak_generator = torch.Generator(device=self.device)
+            self._nan_streak_generator.manual_seed(self.cfg.seed)
+
     def train_and_validate(self):
         """Train and validate the model.
 
@@ -311,15 +320,21 @@ class BaseTrainer(object):
             if self._max_updates_per_epoch is not None and i >= self._max_updates_per_epoch:
                 break
 
+            # inputs that are stored in a compact data type (storage_dtype) are upcast only after the transfer
             for key in data.keys():
                 if key.startswith('x_d'):
-                    data[key] = {k: v.to(self.device) for k, v in data[key].items()}
+                    data[key] = {k: v.to(self.device).float() for k, v in data[key].items()}
+                elif key.startswith('x_s'):
+                    data[key] = data[key].to(self.device).float()
                 elif not key.startswith('date'):
                     if key == "static_conceptual_params":
                         data[key] = move_data_to_device(data[key], self.device)
                     else:
                         data[key] = data[key].to(self.device)
 
+            if self._nan_streak_generator is not None:
+                data = add_nan_streaks_to_batch(data, self.cfg, generator=self._nan_streak_generator)
+
             # apply possible pre-processing to the batch before the forward pass
             data = self.model.pre_model_hook(data, is_train=True)
             
@@ -348,6 +348,14 @@ class Config(object):
     def dataset(self) -> str:
         return self._get_value_verbose("dataset")
 
+    @property
+    def dataset_cache_dir(self) -> Path:
+        return self._cfg.get("dataset_cache_dir", None)
+
+    @property
+    def derived_pet(self) -> Dict[str, str]:
+        return self._cfg.get("derived_pet", {})
+
     @property
     def device(self) -> str:
         return self._cfg.get("device", None)
@@ -547,6 +555,18 @@ class Config(object):
     def lagged_features(self) -> dict:
         return self._as_default_dict(self._cfg.get("lagged_features", {}))
 
+    @property
+    def lazy_loading(self) -> bool:
+        return self._cfg.get("lazy_loading", False)
+
+    @property
+    def lazy_loading_cache_mb(self) -> float:
+        return self._cfg.get("lazy_loading_cache_mb", 1024)
+
+    @property
+    def lazy_loading_dir(self) -> Path:
+        return self._cfg.get("lazy_loading_dir", None)
+
     @property
     def learning_rate(self) -> Dict[int, float]:
         if ("learning_rate" in self._cfg.keys()) and (self._cfg["learning_rate"] is not None):
@@ -618,6 +638,10 @@ class Config(object):
     def model(self) -> str:
         return self._get_value_verbose("model")
 
+    @property
+    def multi_basin_evaluation(self) -> bool:
+        return self._cfg.get("multi_basin_evaluation", False)
+
     @property
     def conceptual_model(self) -> str:
         return self._cfg.get("conceptual_model", "SHM")
@@ -788,10 +812,22 @@ class Config(object):
         else:
             raise RuntimeError("Seed was already specified and can't be replaced")
 
+    @property
+    def seq2seq_chunk_length(self) -> Optional[int]:
+        return self._cfg.get("seq2seq_chunk_length", None)
+
+    @property
+    def seq2seq_evaluation(self) -> bool:
+        return self._cfg.get("seq2seq_evaluation", False)
+
     @property
     def seq_length(self) -> Union[int, Dict[str, int]]:
         return self._get_value_verbose("seq_length")
 
+    @property
+    def shared_memory_dataset(self) -> bool:
+        return self._cfg.get("shared_memory_dataset", False)
+
     @property
     def shared_mtslstm(self) -> bool:
         return self._cfg.get("shared_mtslstm", False)
@@ -815,6 +851,18 @@ class Config(object):
             return None
         return self._get_embedding_spec(embedding_spec)
 
+    @property
+    def storage_dtype(self) -> str:
+        return self._cfg.get("storage_dtype", "float32")
+
+    @property
+    def stream_results(self) -> bool:
+        return self._cfg.get("stream_results", False)
+
+    @property
+    def streaming_validation_metrics(self) -> bool:
+        return self._cfg.get("streaming_validation_metrics", False)
+
     @property
     def target_loss_weights(self) -> List[float]:
         return self._cfg.get("target_loss_weights", None)
@@ -922,6 +970,10 @@ class Config(object):
     def validation_basin_file(self) -> Path:
         return self._get_value_verbose("validation_basin_file")
 
+    @property
+    def validation_cache_mb(self) -> float:
+        return self._cfg.get("validation_cache_mb", None)
+
     @property
     def validation_end_date(self) -> pd.Timestamp:
         return self._get_value_verbose("validation_end_date")
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import torch
+
+
+class LRUCache:
+    """Least-recently-used cache with a memory budget in bytes.
+
+    Values are loaded on demand with `load_fn` and the least recently used values are evicted as soon as the total size
+    of all cached values exceeds `max_bytes`. A single value that is larger than the budget is still returned (and
+    cached until the next miss), such that the cache never fails.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget of the cache in bytes.
+    load_fn : Callable[[Hashable], Any]
+        Function that loads the value of a key on a cache miss.
+    """
+
+    def __init__(self, max_bytes: int, load_fn: Callable[[Hashable], Any]):
+        self.max_bytes = max_bytes
+        self._load_fn = load_fn
+        self._values = OrderedDict()
+        self._sizes = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key: Hashable) -> Any:
+        if key in self._values:
+            self.hits += 1
+            self._values.move_to_end(key)
+            return self._values[key]
+
+        self.misses += 1
+        value = self._load_fn(key)
+        size = get_nbytes(value)
+        while self._values and self.nbytes + size > self.max_bytes:
+            evicted_key, _ = self._values.popitem(last=False)
+            self.nbytes -= self._sizes.pop(evicted_key)
+        self._values[key] = value
+        self._sizes[key] = size
+        self.nbytes += size
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def clear(self):
+        """Remove all values from the cache. """
+        self._values.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+
+def get_nbytes(value: Any) -> int:
+    """Return the memory size of the arrays and tensors in a (nested) dictionary, list or tuple, or of another object.
+
+    Parameters
+    ----------
+    value : Any
+        A numpy array, torch tensor or a (nested) container of these. Other objects are counted with the size reported
+        by their `nbytes` attribute, if they have one (e.g., data sets), and with zero bytes otherwise.
+
+    Returns
+    -------
+    int
+        Total size of all arrays and tensors in bytes.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, dict):
+        return sum(get_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(get_nbytes(v) for v in value)
+    return int(getattr(value, "nbytes", 0))
@@ -0,0 +1,106 @@
+"""Utility script to convert the time series files of a data set into layouts that are faster to read. """
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import xarray
+from tqdm import tqdm
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from neuralhydrology.datasetzoo.caravan import get_caravan_timeseries_path, load_caravan_timeseries
+from neuralhydrology.datasetzoo.genericdataset import get_timeseries_file
+from neuralhydrology.datasetzoo.hourlycamelsus import rechunk_hourly_us_netcdf
+from neuralhydrology.datautils.columnarstore import write_columnar_timeseries
+
+
+def convert_timeseries(data_dir: Path, dataset: str, overwrite: bool = False) -> List[Path]:
+    """Convert the netCDF time series files of all basins into the columnar binary layout.
+
+    The GenericDataset and the Caravan data set read only the needed columns and time steps of a basin, if the
+    converted time series of this basin exist. The original files are kept.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Path to the data directory of the data set.
+    dataset : {'generic', 'caravan'}
+        Name of the data set, which defines the folder structure of the time series files.
+    overwrite : bool, optional
+        If True, existing converted time series are overwritten. Otherwise, these basins are skipped.
+
+    Returns
+    -------
+    List[Path]
+        Folders of the converted basins.
+    """
+    converted = []
+    for basin, basin_dir in tqdm(_get_basins(data_dir, dataset), file=sys.stdout):
+        if basin_dir.exists() and not overwrite:
+            continue
+        if dataset == "generic":
+            with xarray.open_dataset(get_timeseries_file(data_dir, basin)) as xr:
+                df = xr.to_dataframe()
+        else:
+            df = load_caravan_timeseries(data_dir, basin, filetype="netcdf")
+        write_columnar_timeseries(df, basin_dir)
+        converted.append(basin_dir)
+    return converted
+
+
+def _get_basins(data_dir: Path, dataset: str) -> List[Tuple[str, Path]]:
+    """Return basin id and target folder of each basin with a netCDF time series file. """
+    if dataset == "generic":
+        files = sorted([*(data_dir / "time_series").glob("*.nc4"), *(data_dir / "time_series").glob("*.nc")])
+        return [(f.stem, data_dir / "time_series_npy" / f.stem) for f in files]
+    elif dataset == "caravan":
+        files = sorted((data_dir / "timeseries" / "netcdf").glob("*/*.nc"))
+        return [(f.stem, get_caravan_timeseries_path(data_dir, f.stem, filetype="npy")) for f in files]
+    else:
+        raise ValueError(f"Conversion is not supported for data set {dataset}. Use 'generic' or 'caravan'.")
+
+
+def convert_hourly_camels_us(data_dir: Path, forcings: List[str]) -> List[Path]:
+    """Rechunk the preprocessed hourly CAMELS US netCDF files, such that the data of each basin is contiguous.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Path to the CAMELS US directory, which contains the folder 'hourly' with the netCDF files.
+    forcings : List[str]
+        Names of the hourly forcing products, e.g. 'nldas_hourly' for 'usgs-streamflow-nldas_hourly.nc'.
+
+    Returns
+    -------
+    List[Path]
+        Paths to the rechunked netCDF files.
+    """
+    return [rechunk_hourly_us_netcdf(data_dir, forcing) for forcing in forcings]
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', type=str, required=True, help='Data directory of the data set.')
+    parser.add_argument('--dataset', type=str, choices=['generic', 'caravan', 'hourly_camels_us'], required=True)
+    parser.add_argument('--forcings',
+                        type=str,
+                        nargs='+',
+                        required=False,
+                        help='Hourly forcing products to rechunk (only for hourly_camels_us), e.g. nldas_hourly.')
+    parser.add_argument('--overwrite',
+                        action='store_true',
+                        help='If provided, basins that were already converted are converted again.')
+    args = vars(parser.parse_args())
+
+    if args['dataset'] == 'hourly_camels_us':
+        if not args['forcings']:
+            raise ValueError('The hourly forcing products to rechunk have to be passed with --forcings.')
+        for netcdf_path in convert_hourly_camels_us(Path(args['data_dir']), args['forcings']):
+            print(f"Stored rechunked netCDF file at {netcdf_path}.")
+    else:
+        converted = convert_timeseries(Path(args['data_dir']), args['dataset'], overwrite=args['overwrite'])
+        print(f"Converted the time series of {len(converted)} basins.")
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,10 +1,12 @@
 """Utility script to average the predictions of several runs. """
 import argparse
+import multiprocessing
 import pickle
 import sys
+import tempfile
 from collections import defaultdict
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -13,20 +15,28 @@ from tqdm import tqdm
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from neuralhydrology.datautils.utils import get_frequency_factor, sort_frequencies
-from neuralhydrology.evaluation.metrics import calculate_metrics, get_available_metrics
+from neuralhydrology.evaluation.metrics import calculate_multi_basin_metrics, get_available_metrics
+from neuralhydrology.evaluation.resultsstore import MANIFEST_FILE, ResultsStore, ResultsWriter, load_results
 from neuralhydrology.evaluation.utils import metrics_to_dataframe
 from neuralhydrology.utils.config import Config
-from neuralhydrology.utils.errors import AllNaNError
+
+# number of basins whose results are combined at once
+BASIN_CHUNK_SIZE = 64
 
 
 def create_results_ensemble(run_dirs: List[Path],
                             best_k: int = None,
                             metrics: List[str] = None,
                             period: str = 'test',
-                            epoch: int = None) -> dict:
+                            epoch: int = None,
+                            aggregation: str = 'mean',
+                            weights: List[float] = None,
+                            quantiles: List[float] = None,
+                            num_workers: int = 1) -> dict:
     """Average the predictions of several runs for the specified period and calculate new metrics.
 
     If `best_k` is provided, only the k runs with the best validation NSE will be used in the generated ensemble.
+    All basins are held in memory; use `iterate_results_ensemble` to process the ensemble one basin at a time.
     
     Parameters
     ----------
@@ -41,120 +51,274 @@ def create_results_ensemble(run_dirs: List[Path],
         The run_directories must contain results files for the specified period.
     epoch : int, optional
         If provided, will ensemble the model predictions of this epoch otherwise of the last epoch
+    aggregation : {'mean', 'median'}, optional
+        How the predictions of the runs are combined. By default, the (weighted) mean is used.
+    weights : List[float], optional
+        Weight of each run in `run_dirs` for the weighted mean. By default, all runs are weighted equally.
+    quantiles : List[float], optional
+        If provided, the quantiles of the predictions of the runs are stored as additional variables
+        ``{target}_sim_quantiles`` with a 'quantile' dimension.
+    num_workers : int, optional
+        Number of processes that read and combine the results of different basins in parallel. Default: 1.
     
     Returns
     -------
     dict
         Dictionary of ensemble predictions and metrics per basin and frequency.
     """
+    return dict(
+        iterate_results_ensemble(run_dirs,
+                                 best_k=best_k,
+                                 metrics=metrics,
+                                 period=period,
+                                 epoch=epoch,
+                                 aggregation=aggregation,
+                                 weights=weights,
+                                 quantiles=quantiles,
+                                 num_workers=num_workers))
+
+
+def iterate_results_ensemble(run_dirs: List[Path],
+                             best_k: int = None,
+                             metrics: List[str] = None,
+                             period: str = 'test',
+                             epoch: int = None,
+                             aggregation: str = 'mean',
+                             weights: List[float] = None,
+                             quantiles: List[float] = None,
+                             num_workers: int = 1) -> Iterator[Tuple[str, dict]]:
+    """Combine the predictions of several runs basin by basin and calculate new metrics.
+
+    The basins are processed in chunks, optionally in parallel processes: the results of all runs are read basin by
+    basin from their results stores, combined with running sums (or, for the median and quantiles, per basin), and the
+    metrics of all basins of a chunk are calculated at once. Hence, each process holds only the results of one chunk of
+    basins in memory. Pickled results files are first converted to temporary results stores, one run at a time.
+    See `create_results_ensemble` for the parameters.
+
+    Returns
+    -------
+    Iterator[Tuple[str, dict]]
+        Basin ids and the ensemble predictions and metrics of the basin per frequency.
+    """
     if len(run_dirs) < 2:
         raise ValueError('Need to provide at least two run directories to be merged.')
 
     if period not in ['train', 'validation', 'test']:
         raise ValueError(f'Unknown period {period}.')
+    if aggregation not in ['mean', 'median']:
+        raise ValueError(f'Unknown aggregation {aggregation}. Use one of [\'mean\', \'median\'].')
+    if weights is not None:
+        if aggregation != 'mean':
+            raise ValueError('Weights are only supported for the mean aggregation.')
+        if len(weights) != len(run_dirs) or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError('Need to provide one non-negative weight per run directory, with a positive sum.')
+    run_weights = dict(zip(run_dirs, weights if weights is not None else [1.0] * len(run_dirs)))
     if best_k is not None:
         if period != 'test':
             raise ValueError('If best_k is specified, the period must be test.')
         print('Searching for best validation runs.')
-        best_val_runs = _get_best_validation_runs(run_dirs, best_k, epoch)
-        best_runs = [_get_results_file(run_dir, period, epoch) for run_dir in best_val_runs]
-    else:
-        best_runs = [_get_results_file(run_dir, period, epoch) for run_dir in run_dirs]
+        run_dirs = _get_best_validation_runs(run_dirs, best_k, epoch)
+    best_runs = [_get_results_file(run_dir, period, epoch) for run_dir in run_dirs]
 
     config = Config(run_dirs[0] / 'config.yml')
     if metrics is not None:
         # override metrics from config
         config.metrics = metrics
 
-    # get frequencies from a results file.
-    # (they might not be stored in the config if the native data frequency was used)
-    run_results = pickle.load(open(best_runs[0], 'rb'))
-    frequencies = list(run_results[list(run_results.keys())[0]].keys())
+    return _iterate_ensemble(best_runs, [run_weights[run_dir] for run_dir in run_dirs], config, aggregation,
+                             quantiles, num_workers)
+
+
+def _iterate_ensemble(results_files: List[Path], weights: List[float], config: Config, aggregation: str,
+                      quantiles: List[float], num_workers: int) -> Iterator[Tuple[str, dict]]:
+    """Combine the predictions of the passed runs chunk by chunk of basins and re-calculate metrics. """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # pickled results files are converted to results stores first, such that the basins can be read one by one
+        stores = [f if f.is_dir() else Path(tmp_dir) / str(i) for i, f in enumerate(results_files)]
+        conversions = [(f, store) for f, store in zip(results_files, stores) if f != store]
+        if conversions:
+            print('Converting pickled results files to results stores.')
+            if num_workers > 1:
+                with multiprocessing.Pool(num_workers) as pool:
+                    list(tqdm(pool.imap(_convert_to_store, conversions), total=len(conversions), file=sys.stdout))
+            else:
+                for conversion in tqdm(conversions, file=sys.stdout):
+                    _convert_to_store(conversion)
+
+        runs = [ResultsStore(store) for store in stores]
+        # get frequencies from a results file.
+        # (they might not be stored in the config if the native data frequency was used)
+        frequencies = list(next(iter(runs[0].values())).keys())
+        basins = list(dict.fromkeys(basin for run in runs for basin in run.keys()))
+        chunks = [basins[i:i + BASIN_CHUNK_SIZE] for i in range(0, len(basins), BASIN_CHUNK_SIZE)]
+
+        print('Combining results and calculating metrics.')
+        init_args = (stores, weights, frequencies, config, aggregation, quantiles)
+        if num_workers > 1:
+            with multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=init_args) as pool:
+                for chunk_results in tqdm(pool.imap(_combine_chunk, chunks), total=len(chunks), file=sys.stdout):
+                    yield from chunk_results
+        else:
+            _init_worker(*init_args)
+            for chunk in tqdm(chunks, file=sys.stdout):
+                yield from _combine_chunk(chunk)
+
+
+def _convert_to_store(conversion: Tuple[Path, Path]):
+    results_file, store_dir = conversion
+    writer = ResultsWriter(store_dir)
+    for basin, basin_results in load_results(results_file).items():
+        writer.add_results(basin, basin_results)
+
+
+# state of the processes that combine the results, set by `_init_worker`
+_WORKER_STATE = {}
+
+
+def _init_worker(stores: List[Path], weights: List[float], frequencies: List[str], config: Config, aggregation: str,
+                 quantiles: List[float]):
+    _WORKER_STATE.update(runs=[ResultsStore(store) for store in stores],
+                         weights=weights,
+                         frequencies=frequencies,
+                         config=config,
+                         aggregation=aggregation,
+                         quantiles=quantiles)
+
+
+def _combine_chunk(basins: List[str]) -> List[Tuple[str, dict]]:
+    """Combine the predictions of a chunk of basins across all runs and calculate the metrics of these basins. """
+    state = _WORKER_STATE
+    keep_members = state['aggregation'] == 'median' or state['quantiles'] is not None
+    results = {}
+    for basin in basins:
+        ensemble = _BasinEnsemble(state['frequencies'], keep_members)
+        for run, weight in zip(state['runs'], state['weights']):
+            if basin in run:
+                ensemble.add(run.read_arrays(basin), weight)
+        results[basin] = ensemble.combine(state['aggregation'], state['quantiles'])
+    _add_metrics(results, state['frequencies'], state['config'])
+    return list(results.items())
+
+
+class _BasinEnsemble(object):
+    """Running (weighted) sum of the predictions of one basin, and the predictions of all runs if `keep_members`. """
+
+    def __init__(self, frequencies: List[str], keep_members: bool):
+        self.frequencies = frequencies
+        self.keep_members = keep_members
+        self.first_results = None
+        self.sums = {}
+        self.members = defaultdict(list)
+        self.total_weight = 0.0
+
+    def add(self, basin_arrays: dict, weight: float):
+        """Add the results of one run, as returned by `ResultsStore.read_arrays`. """
+        if self.first_results is None:
+            self.first_results = {freq: basin_arrays[freq] for freq in self.frequencies}
+        self.total_weight += weight
+        for freq in self.frequencies:
+            for name, (_, values) in basin_arrays[freq][1].items():
+                if not name.endswith('_sim'):
+                    continue
+                if (freq, name) in self.sums:
+                    self.sums[(freq, name)] += weight * values
+                else:
+                    self.sums[(freq, name)] = weight * values.astype(np.float64)
+                if self.keep_members:
+                    self.members[(freq, name)].append(values)
+
+    def combine(self, aggregation: str, quantiles: List[float]) -> dict:
+        """Return the combined predictions per frequency, with the time steps stacked to a 'datetime' dimension. """
+        lowest_freq = sort_frequencies(self.frequencies)[0]
+        results = {}
+        for freq, (first_coords, first_vars) in self.first_results.items():
+            # combine date and time to a single index, removing the time steps of the higher frequencies that
+            # are predicted for more than one date
+            n_steps = min(int(get_frequency_factor(lowest_freq, freq)), len(first_coords['time_step']))
+            time_steps = first_coords['time_step'][-n_steps:]
+            datetime = (first_coords['date'][:, np.newaxis] +
+                        time_steps[np.newaxis, :] * pd.to_timedelta(freq).to_timedelta64()).reshape(-1)
+
+            data_vars = {}
+            for name, (var_dims, values) in first_vars.items():
+                dims = tuple(dim for dim in var_dims if dim not in ['date', 'time_step']) + ('datetime',)
+                if not name.endswith('_sim'):
+                    data_vars[name] = (dims, _stack_time_steps(values, n_steps))
+                    continue
+                if aggregation == 'mean':
+                    sim = self.sums[(freq, name)] / self.total_weight
+                else:
+                    sim = np.median(np.stack(self.members[(freq, name)]), axis=0)
+                data_vars[name] = (dims, _stack_time_steps(sim.astype(values.dtype), n_steps))
+                if quantiles is not None:
+                    sim_quantiles = np.quantile(np.stack(self.members[(freq, name)]), quantiles, axis=0)
+                    data_vars[f'{name}_quantiles'] = (('quantile',) + dims,
+                                                      _stack_time_steps(np.moveaxis(sim_quantiles, 0, 2),
+                                                                        n_steps).astype(values.dtype))
 
-    return _create_ensemble(best_runs, frequencies, config)
+            coords = {'datetime': datetime}
+            if quantiles is not None:
+                coords['quantile'] = quantiles
+            results[freq] = {'xr': xr.Dataset(data_vars=data_vars, coords=coords)}
+        return results
 
 
-def _create_ensemble(results_files: List[Path], frequencies: List[str], config: Config) -> dict:
-    """Averages the predictions of the passed runs and re-calculates metrics. """
-    lowest_freq = sort_frequencies(frequencies)[0]
-    ensemble_sum = defaultdict(dict)
-    target_vars = config.target_variables
+def _stack_time_steps(values: np.ndarray, n_steps: int) -> np.ndarray:
+    """Stack the date and the last `n_steps` time steps (the first two axes) to a single, trailing datetime axis. """
+    values = values[:, -n_steps:]
+    return np.moveaxis(values.reshape(-1, *values.shape[2:]), 0, -1)
 
-    print('Loading results for each run.')
-    for run in tqdm(results_files):
-        run_results = pickle.load(open(run, 'rb'))
-        for basin, basin_results in run_results.items():
-            for freq in frequencies:
-                freq_results = basin_results[freq]['xr']
 
-                # sum up the predictions of all basins
-                if freq not in ensemble_sum[basin]:
-                    ensemble_sum[basin][freq] = freq_results
-                else:
-                    for target_var in target_vars:
-                        ensemble_sum[basin][freq][f'{target_var}_sim'] += freq_results[f'{target_var}_sim']
-
-    # divide the prediction sum by number of runs to get the mean prediction for each basin and frequency
-    print('Combining results and calculating metrics.')
-    ensemble = defaultdict(lambda: defaultdict(dict))
-    for basin in tqdm(ensemble_sum.keys()):
-        for freq in frequencies:
-            ensemble_xr = ensemble_sum[basin][freq]
-
-            # combine date and time to a single index to calculate metrics
-            # create datetime range at the current frequency, removing time steps that are not being predicted
-            frequency_factor = int(get_frequency_factor(lowest_freq, freq))
-            # make sure the last day is fully contained in the range
-            freq_date_range = pd.date_range(start=ensemble_xr.coords['date'].values[0],
-                                            end=ensemble_xr.coords['date'].values[-1] \
-                                                + pd.Timedelta(days=1, seconds=-1),
-                                            freq=freq)
-            mask = np.ones(frequency_factor).astype(bool)
-            mask[:-len(ensemble_xr.coords['time_step'])] = False
-            freq_date_range = freq_date_range[np.tile(mask, len(ensemble_xr.coords['date']))]
-
-            ensemble_xr = ensemble_xr.isel(time_step=slice(-frequency_factor, None)) \
-                .stack(datetime=['date', 'time_step']) \
-                .drop_vars({'datetime', 'date', 'time_step'})
-            ensemble_xr['datetime'] = freq_date_range
+def _add_metrics(results: Dict[str, dict], frequencies: List[str], config: Config):
+    """Calculate the metrics of all basins of a chunk, and add them to the results of each basin. """
+    target_vars = config.target_variables
+    for freq in frequencies:
+        # the vectorized metrics need the same dates for all basins, which is usually the case within a period
+        basin_groups = defaultdict(list)
+        for basin, basin_results in results.items():
+            if freq in basin_results:
+                basin_groups[basin_results[freq]['xr'].coords['datetime'].values.tobytes()].append(basin)
+
+        for basins in basin_groups.values():
+            dates = results[basins[0]][freq]['xr'].coords['datetime'].values
+            values = {basin: {} for basin in basins}
             for target_var in target_vars:
-                # average predictions
-                ensemble_xr[f'{target_var}_sim'] = ensemble_xr[f'{target_var}_sim'] / len(results_files)
+                obs = np.stack([results[basin][freq]['xr'][f'{target_var}_obs'].values for basin in basins])
+                sim = np.stack([results[basin][freq]['xr'][f'{target_var}_sim'].values for basin in basins])
+                if sim.ndim == 3:
+                    # evaluate the mean of the samples of uncertainty models
+                    sim = sim.mean(axis=1)
 
                 # clip predictions to zero
-                sim = ensemble_xr[f'{target_var}_sim']
                 if target_var in config.clip_targets_to_zero:
-                    sim = xr.where(sim < 0, 0, sim)
+                    sim = np.where(sim < 0, 0, sim)
 
                 # calculate metrics
                 metrics = config.metrics if isinstance(config.metrics, list) else config.metrics[target_var]
                 if 'all' in metrics:
                     metrics = get_available_metrics()
-                try:
-                    ensemble_metrics = calculate_metrics(ensemble_xr[f'{target_var}_obs'],
-                                                         sim,
-                                                         metrics=metrics,
-                                                         resolution=freq)
-                except AllNaNError as err:
-                    msg = f'Basin {basin} ' \
-                        + (f'{target_var} ' if len(target_vars) > 1 else '') \
-                        + (f'{freq} ' if len(frequencies) > 1 else '') \
-                        + str(err)
-                    print(msg)
-                    ensemble_metrics = {metric: np.nan for metric in metrics}
-
-                # add variable identifier to metrics if needed
-                if len(target_vars) > 1:
-                    ensemble_metrics = {f'{target_var}_{key}': val for key, val in ensemble_metrics.items()}
-                # add frequency identifier to metrics if needed
-                if len(frequencies) > 1:
-                    ensemble_metrics = {f'{key}_{freq}': val for key, val in ensemble_metrics.items()}
-                for metric, val in ensemble_metrics.items():
-                    ensemble[basin][freq][metric] = val
-
-            ensemble[basin][freq]['xr'] = ensemble_xr
-
-    return dict(ensemble)
+                target_metrics = calculate_multi_basin_metrics(obs, sim, metrics, resolution=freq, dates=dates)
+                for i, basin in enumerate(basins):
+                    if metrics and (np.isnan(obs[i]).all() or np.isnan(sim[i]).all()):
+                        msg = f'Basin {basin} ' \
+                            + (f'{target_var} ' if len(target_vars) > 1 else '') \
+                            + (f'{freq} ' if len(frequencies) > 1 else '') \
+                            + f'All {"observed" if np.isnan(obs[i]).all() else "simulated"} values are NaN, ' \
+                            + 'thus metrics will be NaN, too.'
+                        print(msg)
+                    basin_metrics = {metric: value[i] for metric, value in target_metrics.items()}
+
+                    # add variable identifier to metrics if needed
+                    if len(target_vars) > 1:
+                        basin_metrics = {f'{target_var}_{key}': val for key, val in basin_metrics.items()}
+                    # add frequency identifier to metrics if needed
+                    if len(frequencies) > 1:
+                        basin_metrics = {f'{key}_{freq}': val for key, val in basin_metrics.items()}
+                    values[basin].update(basin_metrics)
+
+            for basin in basins:
+                # keep the result xarray as the last entry, as in the results of the tester
+                results[basin][freq] = {**values[basin], 'xr': results[basin][freq]['xr']}
 
 
 def _get_medians(results: dict, metric='NSE') -> dict:
@@ -178,7 +342,10 @@ def _get_best_validation_runs(run_dirs: List[Path], k: int, epoch: int = None) -
     # get validation medians
     median_sums = {}
     for run_dir, val_file in val_files:
-        val_results = pickle.load(open(val_file, 'rb'))
+        val_results = load_results(val_file)
+        if isinstance(val_results, ResultsStore):
+            # the medians only need the metrics, which the store can return without reading the time series
+            val_results = val_results.metrics
         val_medians = _get_medians(val_results)
         print('validation', val_file, val_medians)
         median_sums[run_dir] = sum(val_medians.values())
@@ -189,11 +356,12 @@ def _get_best_validation_runs(run_dirs: List[Path], k: int, epoch: int = None) -
 
 
 def _get_results_file(run_dir: Path, period: str = 'test', epoch: int = None) -> Path:
-    """Returns the path of the results file in the given run directory. """
-    if epoch is not None:
-        dir_results_files = list(Path(run_dir).glob(f'{period}/model_epoch{str(epoch).zfill(3)}/{period}_results.p'))
-    else:
-        dir_results_files = list(Path(run_dir).glob(f'{period}/model_epoch*/{period}_results.p'))
+    """Returns the path of the results file (or results store) in the given run directory. """
+    epoch_dir = 'model_epoch*' if epoch is None else f'model_epoch{str(epoch).zfill(3)}'
+    dir_results_files = [
+        f for f in Path(run_dir).glob(f'{period}/{epoch_dir}/{period}_results*')
+        if f.name == f'{period}_results.p' or (f / MANIFEST_FILE).is_file()
+    ]
     if len(dir_results_files) == 0:
         raise ValueError(f'{run_dir} is missing {period} results.')
     return sorted(dir_results_files)[-1]
@@ -217,14 +385,41 @@ def _main():
                         type=int,
                         required=False,
                         help='If provided, will return results of this specific epoch otherwise of the last epoch')
+    parser.add_argument('--aggregation',
+                        type=str,
+                        choices=['mean', 'median'],
+                        default='mean',
+                        help='How the predictions of the runs are combined.')
+    parser.add_argument('--weights',
+                        type=float,
+                        nargs='+',
+                        required=False,
+                        help='Weight of each run for the weighted mean, in the order of --run-dirs.')
+    parser.add_argument('--quantiles',
+                        type=float,
+                        nargs='+',
+                        required=False,
+                        help='If provided, the quantiles of the predictions of the runs are stored, too.')
+    parser.add_argument('--num-workers',
+                        type=int,
+                        default=1,
+                        help='Number of processes that read and combine the results in parallel.')
+    parser.add_argument('--stream-results',
+                        action='store_true',
+                        help='If provided, the results are written basin by basin to a results store (a folder), '
+                        'instead of being collected in memory and stored as a pickle file.')
     args = vars(parser.parse_args())
 
     run_dirs = [Path(f) for f in args['run_dirs']]
-    ensemble_results = create_results_ensemble(run_dirs,
-                                               args['best_k'],
-                                               metrics=args['metrics'],
-                                               period=args['period'],
-                                               epoch=args['epoch'])
+    ensemble_results = iterate_results_ensemble(run_dirs,
+                                                args['best_k'],
+                                                metrics=args['metrics'],
+                                                period=args['period'],
+                                                epoch=args['epoch'],
+                                                aggregation=args['aggregation'],
+                                                weights=args['weights'],
+                                                quantiles=args['quantiles'],
+                                                num_workers=args['num_workers'])
     output_dir = Path(args['output_dir']).absolute()
 
     metrics = args['metrics']
@@ -235,11 +430,25 @@ def _main():
             metrics = list(set(metrics.values()))
     if 'all' in metrics:
         metrics = get_available_metrics()
+    metrics_file = output_dir / f"{args['period']}_ensemble_metrics.csv"
+
+    if args['stream_results']:
+        writer = ResultsWriter(output_dir / f"{args['period']}_ensemble_results",
+                               metrics_file=metrics_file if metrics else None,
+                               metrics=metrics,
+                               targets=cfg.target_variables)
+        for basin, basin_results in ensemble_results:
+            writer.add_results(basin, basin_results)
+        if metrics:
+            print(f"Stored metrics of ensemble run to {metrics_file}")
+        print(f'Successfully written results to {writer.store_dir}')
+        return
+
+    ensemble_results = dict(ensemble_results)
     try:
         df = metrics_to_dataframe(ensemble_results, metrics, cfg.target_variables)
-        file_name = output_dir / f"{args['period']}_ensemble_metrics.csv"
-        df.to_csv(file_name)
-        print(f"Stored metrics of ensemble run to {file_name}")
+        df.to_csv(metrics_file)
+        print(f"Stored metrics of ensemble run to {metrics_file}")
     except RuntimeError as err:
         # in case no metrics were computed
         pass
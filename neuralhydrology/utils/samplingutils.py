@@ -656,8 +656,8 @@ def umal_extend_batch(data: Dict[str, torch.Tensor], cfg: Config, n_taus: int =
         data[f'y_extended{freq_suffix}'] = data[f'y{freq_suffix}'].repeat(n_taus, 1, 1)
         if f'x_s{freq_suffix}' in data:
             data[f'x_s{freq_suffix}'] = data[f'x_s{freq_suffix}'].repeat(n_taus, 1)
-        if f'x_one_hot{freq_suffix}' in data:
-            data[f'x_one_hot{freq_suffix}'] = data[f'x_one_hot{freq_suffix}'].repeat(n_taus, 1)
+        if f'x_basin_id{freq_suffix}' in data:
+            data[f'x_basin_id{freq_suffix}'] = data[f'x_basin_id{freq_suffix}'].repeat(n_taus)
 
     return data
 
@@ -31,7 +31,8 @@ setup(name='neuralhydrology',
       entry_points={
           'console_scripts': [
               'nh-schedule-runs=neuralhydrology.nh_run_scheduler:_main', 'nh-run=neuralhydrology.nh_run:_main',
-              'nh-results-ensemble=neuralhydrology.utils.nh_results_ensemble:_main'
+              'nh-results-ensemble=neuralhydrology.utils.nh_results_ensemble:_main',
+              'nh-convert-timeseries=neuralhydrology.utils.nh_convert_timeseries:_main'
           ]
       },
       python_requires='>=3.8',
@@ -0,0 +1,97 @@
+"""Unit tests for the NaN-streak augmentation of training batches. """
+import pytest
+import torch
+
+from neuralhydrology.training.augmentation import add_nan_streaks, add_nan_streaks_to_batch
+from neuralhydrology.utils.config import Config
+
+
+def _get_inputs(features: list, batch_size: int, seq_length: int) -> dict:
+    return {feature: torch.ones((batch_size, seq_length, 1)) for feature in features}
+
+
+@pytest.mark.parametrize('nan_sequence_probability', [0.3, 0.9])
+def test_nan_streak_rates(nan_sequence_probability: float):
+    """Test the marginal drop rates of time steps and sequences, which match the original per-sample augmentation.
+
+    Per sample, the sequence of each group is dropped with probability `p`, but if the sequences of all `G` groups
+    would be dropped, one random group is kept. The marginal sequence drop rate of a group is thus p - p**G / G.
+
+    Parameters
+    ----------
+    nan_sequence_probability : float
+        Probability to drop the whole sequence of a feature group.
+    """
+    groups = [['a', 'b'], ['c'], ['d']]
+    batch_size, seq_length, nan_step_probability = 20000, 50, 0.1
+    x_d = add_nan_streaks(_get_inputs(['a', 'b', 'c', 'd'], batch_size, seq_length),
+                          groups=groups,
+                          nan_step_probability=nan_step_probability,
+                          nan_sequence_probability=nan_sequence_probability,
+                          generator=torch.Generator().manual_seed(0))
+
+    # the features of a group are dropped together
+    assert torch.equal(x_d['a'].isnan(), x_d['b'].isnan())
+    masks = torch.stack([x_d[group[0]].isnan()[..., 0] for group in groups], dim=1)
+    dropped_sequences = masks.all(dim=2)
+    # the sequences of all groups of a sample are never dropped at the same time
+    assert not dropped_sequences.all(dim=1).any()
+
+    expected_sequence_rate = nan_sequence_probability - nan_sequence_probability**len(groups) / len(groups)
+    # with 50 time steps, a sequence is dropped by chance through the step dropout only with probability 0.1**50
+    assert dropped_sequences.float().mean().item() == pytest.approx(expected_sequence_rate, abs=0.01)
+    step_rate = masks[~dropped_sequences].float().mean().item()
+    assert step_rate == pytest.approx(nan_step_probability, abs=0.005)
+
+
+def test_nan_streaks_seed():
+    """Test that the same generator seed gives identical drop masks, and a different seed different masks."""
+
+    def _get_mask(seed: int) -> torch.Tensor:
+        x_d = add_nan_streaks(_get_inputs(['a', 'b'], 64, 30),
+                              groups=[['a'], ['b']],
+                              nan_step_probability=0.2,
+                              nan_sequence_probability=0.3,
+                              generator=torch.Generator().manual_seed(seed))
+        return torch.cat([x_d['a'].isnan(), x_d['b'].isnan()], dim=-1)
+
+    assert torch.equal(_get_mask(1), _get_mask(1))
+    assert not torch.equal(_get_mask(1), _get_mask(2))
+
+
+def test_nan_streaks_groups_must_be_lists():
+    """Test that feature groups have to be given as a list of lists."""
+    with pytest.raises(ValueError):
+        add_nan_streaks(_get_inputs(['a'], 4, 10), groups=['a'], nan_step_probability=0.1, nan_sequence_probability=0.1)
+
+
+@pytest.mark.parametrize('hindcast', [False, True])
+def test_nan_streaks_to_batch(hindcast: bool):
+    """Test that the batch keys are augmented with the feature groups of the dynamic or hindcast and forecast inputs.
+
+    Parameters
+    ----------
+    hindcast : bool
+        Whether the run uses hindcast and forecast inputs.
+    """
+    cfg = {'nan_step_probability': 1.0, 'nan_sequence_probability': 0.0}
+    if hindcast:
+        cfg.update({'hindcast_inputs': [['h1'], ['h2']], 'forecast_inputs': [['f1'], ['f2']]})
+    else:
+        cfg['dynamic_inputs'] = [['d1'], ['d2']]
+    cfg = Config(cfg, dev_mode=True)
+    data = {
+        'x_d': _get_inputs(['d1', 'd2'], 4, 10),
+        'x_d_hindcast': _get_inputs(['h1', 'h2'], 4, 10),
+        'x_d_forecast': _get_inputs(['f1', 'f2'], 4, 5),
+        'y': torch.ones((4, 10, 1))
+    }
+
+    data = add_nan_streaks_to_batch(data, cfg, generator=torch.Generator().manual_seed(0))
+
+    # every time step is dropped in the augmented inputs, and none in the others
+    augmented_keys = ['x_d_hindcast', 'x_d_forecast'] if hindcast else ['x_d']
+    for key in ['x_d', 'x_d_hindcast', 'x_d_forecast']:
+        for values in data[key].values():
+            assert values.isnan().all() if key in augmented_keys else not values.isnan().any()
+    assert not data['y'].isnan().any()
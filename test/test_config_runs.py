@@ -1,5 +1,6 @@
 """Integration tests that perform full runs. """
 import pickle
+from collections import defaultdict
 from pathlib import Path
 from typing import Dict, Tuple, Callable
 
@@ -9,7 +10,9 @@ import pytest
 from pytest import approx
 
 from neuralhydrology.datasetzoo import camelsus, hourlycamelsus
+from neuralhydrology.evaluation import get_tester, metrics
 from neuralhydrology.evaluation.evaluate import start_evaluation
+from neuralhydrology.evaluation.resultsstore import load_results
 from neuralhydrology.training.train import start_training
 from neuralhydrology.utils.config import Config
 from test import Fixture
@@ -192,6 +195,222 @@ def test_daily_regression_nan_targets(get_config: Fixture[Callable[[str], dict]]
     _check_results(config, '01022500', discharge=discharge)
 
 
+def test_daily_regression_lazy_loading(get_config: Fixture[Callable[[str], dict]]):
+    """Test training with lazily loaded basin data and a basin cache that holds fewer basins than the training set.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], dict]]
+        Method that returns a run configuration
+    """
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'lazy_loading': True,
+        'lazy_loading_cache_mb': 0.05
+    })
+
+    start_training(config)
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+
+    _check_results(config, '01022500')
+
+
+def test_daily_regression_dataset_cache(get_config: Fixture[Callable[[str], dict]]):
+    """Test that evaluating on a cached prepared data set gives the same results as on the freshly prepared data set.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], dict]]
+        Method that returns a run configuration
+    """
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'dataset_cache_dir': config.run_dir / 'dataset_cache'
+    })
+
+    start_training(config)
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    results = get_basin_results(config.run_dir, 1)['01022500']['1D']['xr']
+
+    # the second evaluation attaches to the cached test data set
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    cached_results = get_basin_results(config.run_dir, 1)['01022500']['1D']['xr']
+
+    assert results.identical(cached_results)
+    _check_results(config, '01022500')
+
+
+def test_daily_regression_multi_basin_evaluation(get_config: Fixture[Callable[[str], dict]]):
+    """Test that evaluating all basins with a single data set gives the same results as evaluating basin by basin.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], dict]]
+        Method that returns a run configuration
+    """
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'multi_basin_evaluation': True
+    })
+
+    start_training(config)
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    results = get_basin_results(config.run_dir, 1)
+
+    config.update_config({'multi_basin_evaluation': False})
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    basin_results = get_basin_results(config.run_dir, 1)
+
+    assert results.keys() == basin_results.keys()
+    for basin, freq_results in basin_results.items():
+        assert results[basin]['1D']['xr'].identical(freq_results['1D']['xr'])
+        assert results[basin]['1D']['NSE'] == approx(freq_results['1D']['NSE'])
+    _check_results(config, '01022500')
+
+
+def test_daily_regression_seq2seq_evaluation(get_config: Fixture[Callable[[str], dict]]):
+    """Test that evaluating on long sequences gives the same results as evaluating window by window.
+
+    With chunks of one sample, both modes are equivalent. With one sequence per period, only the first prediction of
+    each sequence is computed from the same inputs, while later predictions see a longer history. With a realistic
+    sequence length, this longer history must only change the NSE of the period slightly.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], dict]]
+        Method that returns a run configuration
+    """
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'seq_length': 365
+    })
+
+    start_training(config)
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    window_results = get_basin_results(config.run_dir, 1)
+
+    for chunk_length in [1, None]:
+        config.update_config({'seq2seq_evaluation': True, 'seq2seq_chunk_length': chunk_length})
+        start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+        results = get_basin_results(config.run_dir, 1)
+
+        assert results.keys() == window_results.keys()
+        for basin, freq_results in window_results.items():
+            sim, window_sim = results[basin]['1D']['xr']['QObs(mm/d)_sim'], freq_results['1D']['xr']['QObs(mm/d)_sim']
+            obs = results[basin]['1D']['xr']['QObs(mm/d)_obs']
+            assert obs.identical(freq_results['1D']['xr']['QObs(mm/d)_obs'])
+            assert (sim.isnull() == window_sim.isnull()).all()
+            compared = slice(None) if chunk_length == 1 else slice(0, 1)
+            assert sim.values[compared] == approx(window_sim.values[compared], abs=1e-5, nan_ok=True)
+            # over all dates of the period
+            nse, window_nse = metrics.nse(obs[:, -1], sim[:, -1]), metrics.nse(obs[:, -1], window_sim[:, -1])
+            assert nse == approx(window_nse, abs=1e-5 if chunk_length == 1 else 0.05)
+
+
+def test_daily_regression_stream_results(get_config: Fixture[Callable[[str], dict]]):
+    """Test that results streamed to a results store are the same as the pickled results.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], dict]]
+        Method that returns a run configuration
+    """
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'metrics': ['NSE', 'KGE'],
+        'save_all_output': True
+    })
+
+    start_training(config)
+    results_dir = config.run_dir / 'test' / 'model_epoch001'
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    pickled_results = get_basin_results(config.run_dir, 1)
+    pickled_metrics = pd.read_csv(results_dir / 'test_metrics.csv', dtype={'basin': str})
+    with (results_dir / 'test_all_output.p').open('rb') as fp:
+        pickled_output = pickle.load(fp)
+
+    config.update_config({'stream_results': True})
+    start_evaluation(cfg=config, run_dir=config.run_dir, epoch=1, period='test')
+    results = load_results(results_dir / 'test_results')
+
+    assert list(results.keys()) == list(pickled_results.keys())
+    for basin, freq_results in pickled_results.items():
+        assert results[basin]['1D'].keys() == freq_results['1D'].keys()
+        assert results[basin]['1D']['xr'].identical(freq_results['1D']['xr'])
+        assert results[basin]['1D']['NSE'] == approx(freq_results['1D']['NSE'])
+        assert results.all_output[basin].keys() == pickled_output[basin].keys()
+        for key, values in pickled_output[basin].items():
+            assert (results.all_output[basin][key] == values).all()
+    pd.testing.assert_frame_equal(pd.read_csv(results_dir / 'test_metrics.csv', dtype={'basin': str}), pickled_metrics)
+
+
+def test_daily_regression_streaming_validation_metrics(get_config: Fixture[Callable[[str], dict]]):
+    """Test that the streaming validation logs the same losses and metrics as the regular validation.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], dict]]
+        Method that returns a run configuration
+    """
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'metrics': ['NSE', 'KGE', 'RMSE', 'Pearson-r'],
+        'log_n_figures': 0
+    })
+    start_training(config)
+
+    for multi_basin_evaluation in [False, True]:
+        logged = {}
+        for streaming in [False, True]:
+            config.update_config({
+                'multi_basin_evaluation': multi_basin_evaluation,
+                'streaming_validation_metrics': streaming
+            })
+            tester = get_tester(cfg=config, run_dir=config.run_dir, period='validation', init_model=True)
+            logger = _StepRecorder()
+            tester.evaluate(epoch=1, save_results=False, metrics=config.metrics, experiment_logger=logger)
+            logged[streaming] = logger.steps
+
+        assert logged[True].keys() == logged[False].keys()
+        for key, values in logged[False].items():
+            assert logged[True][key] == approx(values, rel=1e-12)
+
+
+class _StepRecorder(object):
+    """Records the values that the tester logs, like the validation logger."""
+
+    def __init__(self):
+        self.steps = defaultdict(list)
+
+    def log_step(self, **kwargs):
+        for key, value in kwargs.items():
+            self.steps[key].append(value)
+
+
 def _check_results(config: Config, basin: str, discharge: pd.Series = None):
     """Perform basic sanity checks of model predictions.
 
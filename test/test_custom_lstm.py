@@ -4,7 +4,7 @@ from typing import Callable
 import torch
 
 from neuralhydrology.modelzoo import get_model
-from neuralhydrology.modelzoo.customlstm import CustomLSTM
+from neuralhydrology.modelzoo.customlstm import CustomLSTM, _LSTMCell
 from test import Fixture
 
 
@@ -43,3 +43,18 @@ def test_model_equality(get_config: Fixture[Callable[[str], dict]], custom_lstm_
 
     # check for consistency in model outputs
     assert torch.allclose(pred_custom["y_hat"], pred_optimized["y_hat"], atol=1e-6)
+
+
+def test_lstm_cell_static_gates():
+    torch.manual_seed(111)
+    cell = _LSTMCell(input_size=5, hidden_size=8, initial_forget_bias=3)
+
+    # the static inputs are the last inputs of the cell
+    x_d, x_s = torch.rand((4, 2)), torch.rand((4, 3))
+    h_0, c_0 = torch.rand((4, 8)), torch.rand((4, 8))
+
+    output = cell(x_t=torch.cat([x_d, x_s], dim=-1), h_0=h_0, c_0=c_0)
+    split_output = cell(x_t=x_d, h_0=h_0, c_0=c_0, static_gates=cell.get_static_gates(x_s))
+
+    for key, value in output.items():
+        assert torch.allclose(split_output[key], value, atol=1e-6)
@@ -0,0 +1,337 @@
+"""Unit tests for the data set classes. """
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+import xarray
+from torch.utils.data import DataLoader
+
+from neuralhydrology.datasetzoo.basedataset import BaseDataset
+from neuralhydrology.datasetzoo.camelsus import (CamelsUS, load_camels_us_attributes, load_camels_us_discharge,
+                                                  load_camels_us_forcings)
+from neuralhydrology.datasetzoo.genericdataset import GenericDataset
+from neuralhydrology.datasetzoo.hourlycamelsus import get_hourly_us_netcdf, rechunk_hourly_us_netcdf
+from neuralhydrology.datautils import datasetcache
+from neuralhydrology.datautils.utils import decode_dates, load_hydroatlas_attributes
+from neuralhydrology.utils.config import Config
+from neuralhydrology.utils.lrucache import get_nbytes
+from neuralhydrology.utils.nh_convert_timeseries import convert_timeseries
+from test import Fixture
+
+
+def _get_camels_us_config(get_config: Callable[[str], Config], end_date: str) -> Config:
+    config = get_config('daily_regression')
+    config.update_config({
+        'dataset': 'camels_us',
+        'data_dir': config.data_dir / 'camels_us',
+        'forcings': 'daymet',
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'test_end_date': end_date
+    })
+    config.train_dir = config.run_dir / 'train_data'
+    return config
+
+
+@pytest.mark.parametrize('native_freq,freq,start', [('1h', '1D', '2000-01-01'), ('1h', '3h', '2000-01-01 03:00'),
+                                                    ('1D', '2D', '2000-01-05'), ('1h', '1D', '2000-01-01 05:00'),
+                                                    ('15min', '1h', '2000-01-01')])
+def test_resample(native_freq: str, freq: str, start: str):
+    """Test that resampling time series with NaNs gives the same result as pandas.
+
+    Parameters
+    ----------
+    native_freq : str
+        Frequency of the time series.
+    freq : str
+        Frequency to resample to.
+    start : str
+        First date of the time series.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(start, periods=480, freq=native_freq)
+    values = rng.random((len(dates), 3)).astype(np.float32)
+    values[rng.random(values.shape) < 0.3] = np.nan
+    values[:30] = np.nan
+
+    resampled_dates, resampled_values = BaseDataset._resample(dates, values, freq)
+    expected = pd.DataFrame(values, index=dates).resample(freq).mean()
+
+    np.testing.assert_array_equal(resampled_dates.to_numpy(), expected.index.to_numpy())
+    np.testing.assert_array_equal(resampled_values, expected.values)
+
+
+def test_shared_memory_dataset(get_config: Fixture[Callable[[str], Config]]):
+    """Test that a data set in shared memory gives the same samples, also through data loader worker processes.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    """
+    cfg = _get_camels_us_config(get_config, '31/12/2002')
+    data = CamelsUS(cfg, is_train=True, period='train', scaler={})
+    cfg.update_config({'shared_memory_dataset': True})
+    shared_data = CamelsUS(cfg, is_train=True, period='train', scaler=data.scaler)
+
+    tensors = [*shared_data._x_d.values(), *shared_data._y.values(), shared_data._attributes]
+    assert all(tensor.is_shared() for tensor in tensors)
+    assert not any(tensor.is_shared() for tensor in [*data._x_d.values(), *data._y.values(), data._attributes])
+
+    assert len(shared_data) == len(data)
+    loader = DataLoader(shared_data, batch_size=256, num_workers=2, collate_fn=shared_data.collate_fn)
+    for i, batch in enumerate(loader):
+        expected = data.collate_fn([data[j] for j in range(i * 256, min((i + 1) * 256, len(data)))])
+        np.testing.assert_array_equal(batch['date'], expected['date'])
+        for key in ['y', 'x_s']:
+            assert torch.equal(batch[key].nan_to_num(), expected[key].nan_to_num())
+        for feature, values in expected['x_d'].items():
+            assert torch.equal(batch['x_d'][feature].nan_to_num(), values.nan_to_num())
+
+
+@pytest.mark.parametrize('is_train', [False, True])
+def test_append_data(get_config: Fixture[Callable[[str], Config]], is_train: bool):
+    """Test that appending time steps to a data set gives the same samples as loading the full period.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    is_train : bool
+        Whether the data sets are training data sets, whose new samples are validated.
+    """
+    period, end_date = ('train', '31/12/2001') if is_train else ('test', '31/12/2002')
+    train_data = CamelsUS(_get_camels_us_config(get_config, '31/12/2002'), is_train=True, period='train', scaler={})
+
+    def _get_data(end: str) -> CamelsUS:
+        cfg = _get_camels_us_config(get_config, '31/12/2002')
+        cfg.update_config({f'{period}_end_date': end, 'dataset_cache_dir': cfg.run_dir / 'dataset_cache'})
+        return CamelsUS(cfg, is_train=is_train, period=period, scaler=train_data.scaler)
+
+    full_data = _get_data(end_date)
+    data = _get_data(end_date.replace('31/12', '10/12'))
+    n_samples = len(data)
+
+    new_data = {}
+    for basin in data._sample_basins.tolist():
+        df = full_data._load_basin_dataframe(basin, full_data._get_keep_cols())
+        new_data[basin] = df.loc[pd.Timestamp(f'{end_date[-4:]}-12-11'):]
+    data.append_data(new_data)
+    # the appended time steps are persisted in the cache entry
+    attached_data = _get_data(end_date.replace('31/12', '10/12'))
+
+    assert len(data) > n_samples
+    for appended_data in [data, attached_data]:
+        assert len(appended_data) == len(full_data)
+        np.testing.assert_array_equal(appended_data._lookup_basins, full_data._lookup_basins)
+        for i in list(range(0, len(appended_data), 50)) + [len(appended_data) - 1]:
+            sample, full_sample = appended_data[i], full_data[i]
+            np.testing.assert_array_equal(sample['date'], full_sample['date'])
+            assert torch.equal(sample['y'].nan_to_num(), full_sample['y'].nan_to_num())
+            for feature, values in full_sample['x_d'].items():
+                assert torch.equal(sample['x_d'][feature], values)
+
+
+def test_append_data_shared_memory(get_config: Fixture[Callable[[str], Config]]):
+    """Test that appending to a data set attached to a cache entry only moves the new time steps into shared memory.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    """
+    cfg = _get_camels_us_config(get_config, '31/12/2002')
+    cfg.update_config({
+        'train_end_date': '10/12/2001',
+        'dataset_cache_dir': cfg.run_dir / 'dataset_cache',
+        'shared_memory_dataset': True
+    })
+    CamelsUS(cfg, is_train=True, period='train', scaler={})
+    data = CamelsUS(cfg, is_train=True, period='train', scaler={})
+    # the attached data set uses the memory-mapped arrays of the cache entry instead of copies in shared memory
+    history = [*data._x_d.values(), *data._y.values()]
+    data_ptrs = [tensor.data_ptr() for tensor in history]
+    assert not any(tensor.is_shared() for tensor in history)
+
+    full_cfg = _get_camels_us_config(get_config, '31/12/2002')
+    full_cfg.update_config({'train_end_date': '31/12/2001'})
+    full_data = CamelsUS(full_cfg, is_train=True, period='train', scaler=data.scaler)
+    new_data = {}
+    for basin in data._sample_basins.tolist():
+        df = full_data._load_basin_dataframe(basin, full_data._get_keep_cols())
+        new_data[basin] = df.loc[pd.Timestamp('2001-12-11'):]
+    data.append_data(new_data)
+
+    assert [tensor.data_ptr() for tensor in history] == data_ptrs
+    assert not any(tensor.is_shared() for tensor in history)
+    assert len(data._segments) == 1
+    for segment_data in data._segments[0].values():
+        assert segment_data['x_d'].is_shared() and segment_data['y'].is_shared()
+    assert len(data) == len(full_data)
+
+
+def test_generic_dataset_columnar_timeseries(get_config: Fixture[Callable[[str], Config]]):
+    """Test that the GenericDataset gives the same samples from netCDF files and from their columnar binary copy.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    """
+    config = _get_camels_us_config(get_config, '31/12/2002')
+    generic_dir = config.run_dir / 'generic'
+    (generic_dir / 'time_series').mkdir(parents=True)
+    for basin in ['01022500', '01547700']:
+        forcings, area = load_camels_us_forcings(config.data_dir, basin, 'daymet')
+        df = pd.DataFrame({
+            'prcp': forcings['prcp(mm/day)'],
+            'tmax': forcings['tmax(C)'],
+            'qobs': load_camels_us_discharge(config.data_dir, basin, area)
+        })
+        df.index.name = 'date'
+        df.to_xarray().to_netcdf(generic_dir / 'time_series' / f'{basin}.nc')
+    config.update_config({
+        'dataset': 'generic',
+        'data_dir': generic_dir,
+        'dynamic_inputs': ['prcp', 'tmax'],
+        'target_variables': ['qobs'],
+        'static_attributes': []
+    })
+
+    netcdf_data = GenericDataset(config, is_train=True, period='train', basin='01022500', scaler={})
+    assert convert_timeseries(generic_dir, 'generic') == [generic_dir / 'time_series_npy' / b for b in
+                                                          ['01022500', '01547700']]
+    columnar_data = GenericDataset(config, is_train=True, period='train', basin='01022500', scaler={})
+
+    assert len(netcdf_data) == len(columnar_data)
+    for i in range(0, len(netcdf_data), 50):
+        sample, columnar_sample = netcdf_data[i], columnar_data[i]
+        np.testing.assert_array_equal(sample['date'], columnar_sample['date'])
+        assert torch.equal(sample['y'], columnar_sample['y'])
+        for feature, values in sample['x_d'].items():
+            assert torch.equal(columnar_sample['x_d'][feature], values)
+
+
+def test_hourly_us_netcdf(tmpdir: Fixture[str]):
+    """Test reading single basins from the hourly CAMELS US netCDF file and from its rechunked copy.
+
+    Parameters
+    ----------
+    tmpdir : Fixture[str]
+        Name of the tmp directory.
+    """
+    data_dir = Path(tmpdir)
+    (data_dir / 'hourly').mkdir()
+    dates = pd.date_range('2000-01-01', periods=100, freq='1h')
+    rng = np.random.default_rng(0)
+    xr = xarray.Dataset(
+        {
+            'total_precipitation': (('basin', 'date'), rng.random((3, 100))),
+            'qobs_mm_per_hour': (('date', 'basin'), rng.random((100, 3)))
+        },
+        coords={
+            'basin': ['01022500', '01031500', '01047000'],
+            'date': dates
+        })
+    xr.to_netcdf(data_dir / 'hourly' / 'usgs-streamflow-nldas_hourly.nc')
+
+    expected = xr.sel(basin='01031500', date=slice(dates[10], dates[50])).to_dataframe()
+    netcdf = get_hourly_us_netcdf(data_dir, 'nldas_hourly')
+    assert get_hourly_us_netcdf(data_dir, 'nldas_hourly') is netcdf
+    pd.testing.assert_frame_equal(netcdf.load_basin('01031500', start_date=dates[10], end_date=dates[50]),
+                                  expected,
+                                  check_freq=False)
+    df = netcdf.load_basin('01031500', columns=['qobs_mm_per_hour'])
+    assert 'total_precipitation' not in df.columns and 'qobs_mm_per_hour' in df.columns
+    pytest.raises(KeyError, netcdf.load_basin, '01013500')
+
+    rechunk_hourly_us_netcdf(data_dir, 'nldas_hourly')
+    rechunked = get_hourly_us_netcdf(data_dir, 'nldas_hourly')
+    assert rechunked.path.name == 'usgs-streamflow-nldas_hourly-per-basin.nc'
+    pd.testing.assert_frame_equal(rechunked.load_basin('01031500', start_date=dates[10], end_date=dates[50]),
+                                  expected,
+                                  check_freq=False)
+
+
+@pytest.mark.parametrize('storage_dtype', ['float16', 'bfloat16'])
+def test_compact_storage(get_config: Fixture[Callable[[str], Config]], storage_dtype: str):
+    """Test that a data set stored in a compact data type gives the same samples up to the quantization error.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    storage_dtype : str
+        Data type in which the inputs are stored.
+    """
+    data = CamelsUS(_get_camels_us_config(get_config, '31/12/2002'), is_train=True, period='train', scaler={})
+    config = _get_camels_us_config(get_config, '31/12/2002')
+    config.update_config({'storage_dtype': storage_dtype})
+    compact_data = CamelsUS(config, is_train=True, period='train', scaler={})
+
+    assert len(data) == len(compact_data)
+    assert 0 < compact_data.max_quantization_error < 0.05
+    for i in range(0, len(data), 50):
+        sample, compact_sample = data[i], compact_data[i]
+        np.testing.assert_array_equal(sample['date'], decode_dates(compact_sample['date']))
+        assert torch.equal(sample['y'], compact_sample['y'])
+        inputs = [(sample['x_s'], compact_sample['x_s'])]
+        inputs += [(values, compact_sample['x_d'][feature]) for feature, values in sample['x_d'].items()]
+        for values, compact_values in inputs:
+            assert compact_values.dtype == getattr(torch, storage_dtype)
+            assert torch.allclose(compact_values.float(), values, rtol=0, atol=compact_data.max_quantization_error)
+
+
+def test_cached_attribute_table(get_config: Fixture[Callable[[str], Config]], tmpdir: Fixture[str]):
+    """Test that the cached attribute table gives the same attributes as reading the attribute files.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    tmpdir : Fixture[str]
+        Name of the tmp directory.
+    """
+    data_dir = get_config('daily_regression').data_dir / 'camels_us'
+    cache_dir = Path(tmpdir)
+    basins = ['01547700', '01022500']
+    expected = load_camels_us_attributes.__wrapped__(data_dir, basins=basins)
+
+    datasetcache._ATTRIBUTE_TABLES.clear()
+    pd.testing.assert_frame_equal(load_camels_us_attributes(data_dir, basins=basins, cache_dir=cache_dir), expected)
+    pd.testing.assert_frame_equal(load_camels_us_attributes(data_dir, basins=basins[:1]), expected.loc[basins[:1]])
+    assert len(list((cache_dir / 'attributes').glob('*.p'))) == 1
+
+    # a new process reads the attribute table from the cache directory
+    datasetcache._ATTRIBUTE_TABLES.clear()
+    pd.testing.assert_frame_equal(load_camels_us_attributes(data_dir, cache_dir=cache_dir),
+                                  load_camels_us_attributes.__wrapped__(data_dir))
+    pytest.raises(ValueError, load_camels_us_attributes, data_dir, basins=['00000000'])
+
+    # HydroATLAS attributes of basins that are missing in the attribute file are dropped
+    hydroatlas_dir = cache_dir / 'data' / 'hydroatlas_attributes'
+    hydroatlas_dir.mkdir(parents=True)
+    pd.DataFrame({'basin_id': basins, 'ele_mt_sav': [1.0, 2.0]}).to_csv(hydroatlas_dir / 'attributes.csv', index=False)
+    df = load_hydroatlas_attributes(cache_dir / 'data', basins=['01022500', '00000000'])
+    assert df.index.tolist() == ['01022500']
+
+
+def test_dataset_nbytes(get_config: Fixture[Callable[[str], Config]]):
+    """Test that a data set attached to the prepared-data-set cache reports no private memory.
+
+    Parameters
+    ----------
+    get_config : Fixture[Callable[[str], Config]]
+        Method that returns a run configuration
+    """
+    config = _get_camels_us_config(get_config, '31/12/2002')
+    config.update_config({'dataset_cache_dir': config.run_dir / 'dataset_cache'})
+    train_data = CamelsUS(config, is_train=True, period='train', scaler={})
+    data = CamelsUS(config, is_train=False, period='test', scaler=train_data.scaler)
+    attached_data = CamelsUS(config, is_train=False, period='test', scaler=train_data.scaler)
+
+    assert data.nbytes == get_nbytes(data) >= sum(values.nbytes for values in data._x_d.values()) > 0
+    assert attached_data.nbytes == 0
+    assert len(attached_data) == len(data)
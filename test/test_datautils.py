@@ -1,7 +1,11 @@
 """Unit tests for datautils functions. """
+import numpy as np
 import pandas as pd
 import pytest
 
+from neuralhydrology.datautils.climateindices import calculate_dyn_climate_indices
+from neuralhydrology.datautils.pet import get_priestley_taylor_pet, get_priestley_taylor_pet_batch
+from neuralhydrology.datautils.streamingstats import P2Quantile, RunningMoments
 from neuralhydrology.datautils.utils import (get_frequency_factor, infer_frequency, sort_frequencies, _ME_FREQ,
                                              _QE_FREQ, _YE_FREQ)
 
@@ -58,3 +62,103 @@ def test_get_frequency_factor():
     pytest.raises(ValueError, get_frequency_factor, '1' + _ME_FREQ,
                   '1D')  # disallowed because to_timedelta('1M') is deprecated
     pytest.raises(NotImplementedError, get_frequency_factor, '-1D', '1h')  # we should never need negative frequencies
+
+
+def test_running_moments():
+    """Test that the streaming moments match the moments of the full data. """
+    rng = np.random.default_rng(0)
+    chunks = [rng.gamma(2, 3, size=n) for n in [1, 10, 1000, 5000]]
+    chunks[2][::7] = np.nan
+    data = np.concatenate(chunks)
+
+    moments = RunningMoments()
+    for chunk in chunks[:2]:
+        moments.update(chunk)
+    other = RunningMoments()
+    for chunk in chunks[2:]:
+        other.update(chunk)
+    moments.merge(other)
+
+    assert moments.count == np.sum(~np.isnan(data))
+    assert moments.mean == pytest.approx(np.nanmean(data), rel=1e-12)
+    assert moments.std == pytest.approx(np.nanstd(data), rel=1e-12)
+    assert moments.min == np.nanmin(data)
+    assert moments.max == np.nanmax(data)
+
+    # all-NaN data streams yield NaN statistics
+    moments = RunningMoments()
+    moments.update(np.full(5, np.nan))
+    assert np.isnan(moments.mean) and np.isnan(moments.std)
+
+
+def test_p2_quantile():
+    """Test the streaming quantile approximation. """
+    rng = np.random.default_rng(0)
+    data = rng.gamma(2, 3, size=20000)
+
+    median = P2Quantile(0.5)
+    for chunk in np.array_split(data, 17):
+        median.update(chunk)
+    assert median.value == pytest.approx(np.median(data), rel=1e-2)
+
+    # with less than five values, the exact quantile is returned
+    median = P2Quantile(0.5)
+    median.update(np.array([3., np.nan, 1., 2.]))
+    assert median.value == 2.
+
+
+@pytest.mark.parametrize('window_length', [1, 30, 200])
+def test_dyn_climate_indices(window_length: int):
+    """Test the incrementally updated climate indices against a re-computation of each window.
+
+    Parameters
+    ----------
+    window_length : int
+        Look-back period to use to compute the climate indices.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2000-01-01', periods=500, freq='D')
+    prcp = np.where(rng.random(500) < 0.6, 0.0, rng.gamma(0.7, 5, 500))
+    prcp[100:250] = 0
+    tmax, tmin, pet = rng.normal(5, 10, 500), rng.normal(-2, 10, 500), rng.random(500) * 4
+
+    df = calculate_dyn_climate_indices(pd.Series(prcp, index=dates),
+                                       pd.Series(tmax, index=dates),
+                                       pd.Series(tmin, index=dates),
+                                       pd.Series(pet, index=dates),
+                                       window_length=window_length)
+
+    def mean_run_length(mask: np.ndarray) -> float:
+        runs = np.sum(mask & ~np.concatenate([[False], mask[:-1]]))
+        return mask.sum() / runs if runs > 0 else np.nan
+
+    expected = []
+    for end in range(window_length, 501):
+        p, t_mean = prcp[end - window_length:end], (tmax + tmin)[end - window_length:end] / 2
+        p_mean, pet_mean = p.mean(), pet[end - window_length:end].mean()
+        expected.append([
+            p_mean, pet_mean, pet_mean / p_mean if p_mean > 0 else np.nan, t_mean.mean(),
+            p[t_mean <= 0].sum() / p.sum() if p.sum() > 0 else 0.0,
+            np.mean(p >= 5 * p_mean),
+            mean_run_length(p >= 5 * p_mean),
+            np.mean(p < 1),
+            mean_run_length(p < 1)
+        ])
+
+    assert df.index[0] == dates[window_length - 1]
+    np.testing.assert_allclose(df.values, np.array(expected), rtol=1e-9, atol=1e-12)
+
+
+def test_priestley_taylor_pet_batch():
+    """Test that the multi-basin PET calculation gives the same result as the calculation per basin. """
+    rng = np.random.default_rng(0)
+    t_min = rng.normal(0, 8, (3, 400))
+    t_max = t_min + rng.random((3, 400)) * 12
+    s_rad = rng.random((3, 400)) * 300
+    lat, elev = np.array([32.5, 45.1, 61.0]), np.array([120.0, 1800.0, 350.0])
+    doy = pd.date_range('2000-10-01', periods=400, freq='D').dayofyear.values
+
+    batch_pet = get_priestley_taylor_pet_batch(t_min, t_max, s_rad, lat, elev, doy)
+    for i in range(3):
+        np.testing.assert_array_equal(batch_pet[i],
+                                      get_priestley_taylor_pet(t_min[i], t_max[i], s_rad[i], lat[i], elev[i], doy))
@@ -0,0 +1,42 @@
+"""Tests for the input layer of the models. """
+import pytest
+import torch
+
+from neuralhydrology.modelzoo.inputlayer import InputLayer
+from neuralhydrology.utils.config import Config
+
+
+@pytest.mark.parametrize('static_attributes', [[], ['area', 'elev_mean']])
+@pytest.mark.parametrize('statics_embedding',
+                         [None, {'type': 'fc', 'hiddens': [8, 4], 'activation': 'tanh', 'dropout': 0.0}])
+def test_basin_id_encoding(static_attributes: list, statics_embedding: dict):
+    """Test that integer basin ids give the same statics embedding as the concatenated one-hot encoding.
+
+    Parameters
+    ----------
+    static_attributes : list
+        Static attributes in addition to the basin ids.
+    statics_embedding : dict
+        Specification of the statics embedding network.
+    """
+    torch.manual_seed(111)
+    config = Config({
+        'dynamic_inputs': ['prcp(mm/day)', 'tmax(C)'],
+        'static_attributes': static_attributes,
+        'statics_embedding': statics_embedding,
+        'head': 'regression',
+        'model': 'embcudalstm',
+        'use_basin_id_encoding': True,
+        'number_of_basins': 20
+    })
+    input_layer = InputLayer(config)
+
+    basin_ids = torch.randint(0, config.number_of_basins, (16,))
+    data = {'x_d': {k: torch.rand((16, 10, 1)) for k in config.dynamic_inputs}, 'x_basin_id': basin_ids}
+    x_one_hot = torch.nn.functional.one_hot(basin_ids, num_classes=config.number_of_basins).to(torch.float32)
+    if static_attributes:
+        data['x_s'] = torch.rand((16, len(static_attributes)))
+        x_one_hot = torch.cat([data['x_s'], x_one_hot], dim=-1)
+
+    _, statics_out = input_layer(data, concatenate_output=False)
+    assert torch.allclose(statics_out, input_layer.statics_embedding(x_one_hot), rtol=0, atol=1e-6)
@@ -0,0 +1,140 @@
+"""Unit tests for the evaluation metrics. """
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from xarray import DataArray
+
+from neuralhydrology.evaluation import metrics
+
+
+@pytest.mark.parametrize('as_tensor', [False, True])
+def test_multi_basin_metrics(as_tensor: bool):
+    """Test that the vectorized multi-basin metrics match the metrics computed basin by basin.
+
+    Parameters
+    ----------
+    as_tensor : bool
+        Whether to pass the time series as torch tensors.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2000-01-01', periods=400, freq='1D')
+    obs = rng.gamma(0.5, 2, (6, len(dates)))
+    sim = obs * rng.normal(1, 0.3, obs.shape) - 0.1
+    obs[rng.random(obs.shape) < 0.1] = np.nan
+    sim[rng.random(sim.shape) < 0.05] = np.nan
+    obs[1, 150:] = np.nan  # fewer valid time steps than the other basins
+    obs[2, :] = 0  # zero flows
+    obs[3, :-1] = np.nan  # a single valid time step
+    mask = np.ones(obs.shape, dtype=bool)
+    mask[4, ::2] = False
+
+    inputs = [torch.from_numpy(obs), torch.from_numpy(sim), torch.from_numpy(mask)] if as_tensor else [obs, sim, mask]
+    values = metrics.calculate_multi_basin_metrics(inputs[0],
+                                                   inputs[1],
+                                                   metrics.get_available_metrics(),
+                                                   mask=inputs[2],
+                                                   dates=dates.values)
+
+    for i in range(obs.shape[0]):
+        basin_obs = DataArray(np.where(mask[i], obs[i], np.nan), dims=['date'], coords={'date': dates})
+        basin_sim = DataArray(np.where(mask[i], sim[i], np.nan), dims=['date'], coords={'date': dates})
+        with np.errstate(all='ignore'):
+            expected = {
+                'NSE': metrics.nse(basin_obs, basin_sim),
+                'MSE': metrics.mse(basin_obs, basin_sim),
+                'RMSE': metrics.rmse(basin_obs, basin_sim),
+                'KGE': metrics.kge(basin_obs, basin_sim),
+                'Alpha-NSE': metrics.alpha_nse(basin_obs, basin_sim),
+                'Beta-KGE': metrics.beta_kge(basin_obs, basin_sim),
+                'Beta-NSE': metrics.beta_nse(basin_obs, basin_sim),
+                'Pearson-r': metrics.pearsonr(basin_obs, basin_sim),
+                'FHV': metrics.fdc_fhv(basin_obs, basin_sim),
+                'FLV': metrics.fdc_flv(basin_obs, basin_sim),
+                'Peak-Timing': metrics.mean_peak_timing(basin_obs, basin_sim),
+                'Missed-Peaks': metrics.missed_peaks(basin_obs, basin_sim),
+                'Peak-MAPE': metrics.mean_absolute_percentage_peak_error(basin_obs, basin_sim)
+            }
+            if i != 3:  # the original FMS fails with an IndexError for a single valid time step
+                expected['FMS'] = metrics.fdc_fms(basin_obs, basin_sim)
+        for metric, value in expected.items():
+            np.testing.assert_allclose(values[metric][i], value, rtol=1e-9, atol=1e-12, err_msg=f'{metric} {i}')
+
+
+
+@pytest.mark.parametrize('freq,expected', [
+    ('1D', [0.9230769230769231, 0.9166666666666666, 0.2765957446808511, 0.2857142857142857]),
+    ('3h', [0.9166666666666666, 0.9166666666666666, 0.23404255319148937, 0.2857142857142857]),
+    ('1h', [0.9090909090909091, 0.9166666666666666, 0.14893617021276595, 0.2857142857142857]),
+])
+def test_peak_metrics_with_date_gaps(freq: str, expected: list):
+    """Test the peak metrics on time series with missing dates against values of the original implementation.
+
+    The original implementation checked each peak window for gaps with a ``pd.date_range`` and searched the simulated
+    peaks with xarray indexing. Peaks whose window spans a gap are skipped.
+
+    Parameters
+    ----------
+    freq : str
+        Frequency of the time series.
+    expected : list
+        Peak timing with the default and a 5-step window, and missed peaks with the default and a 2-step window and
+        the 50th percentile, as computed by the original implementation.
+    """
+    rng = np.random.default_rng(1)
+    n = 2000
+    obs = rng.gamma(0.5, 2, n)
+    sim = np.roll(obs, 1) * rng.normal(1, 0.2, n) + rng.gamma(0.3, 0.5, n)
+    starts = np.sort(rng.choice(np.arange(10, n - 10), 25, replace=False))
+    # gaps of 1 to 3 time steps
+    all_dates = pd.date_range('2000-01-01', periods=n + 3 * len(starts), freq=freq)
+    drop = np.concatenate([start + 3 * i + np.arange(rng.integers(1, 4)) for i, start in enumerate(starts)])
+    dates = all_dates.delete(drop)[:n]
+    obs = DataArray(obs, dims=['date'], coords={'date': dates})
+    sim = DataArray(sim, dims=['date'], coords={'date': dates})
+
+    assert metrics.mean_peak_timing(obs, sim, resolution=freq) == pytest.approx(expected[0], rel=1e-12)
+    assert metrics.mean_peak_timing(obs, sim, window=5, resolution=freq) == pytest.approx(expected[1], rel=1e-12)
+    assert metrics.missed_peaks(obs, sim, resolution=freq) == pytest.approx(expected[2], rel=1e-12)
+    assert metrics.missed_peaks(obs, sim, window=2, resolution=freq, percentile=50) == pytest.approx(expected[3],
+                                                                                                     rel=1e-12)
+    assert metrics.mean_absolute_percentage_peak_error(obs, sim) == pytest.approx(83.10587571075746, rel=1e-12)
+
+    values = metrics.calculate_multi_basin_metrics(obs.values[None],
+                                                   sim.values[None],
+                                                   ['Peak-Timing', 'Missed-Peaks', 'Peak-MAPE'],
+                                                   resolution=freq,
+                                                   dates=dates.values)
+    assert values['Peak-Timing'][0] == pytest.approx(expected[0], rel=1e-12)
+    assert values['Missed-Peaks'][0] == pytest.approx(expected[2], rel=1e-12)
+    assert values['Peak-MAPE'][0] == pytest.approx(83.10587571075746, rel=1e-12)
+
+def test_streaming_metrics_large_values():
+    """Test that the streaming metrics of batches with large values match the metrics of the full time series."""
+    rng = np.random.default_rng(0)
+    obs = rng.gamma(0.5, 2, (4, 600, 2)) + 1e6
+    sim = obs + rng.normal(0, 0.5, obs.shape)
+    obs[rng.random(obs.shape) < 0.1] = np.nan
+    obs[2] = np.nan
+
+    streaming = metrics.StreamingMetrics(obs.shape[0], obs.shape[2], torch.device('cpu'))
+    # batches of 30 samples with 20 time steps each, shuffled across basins
+    samples = [(i, t) for i in range(obs.shape[0]) for t in range(0, obs.shape[1], 20)]
+    order = rng.permutation(len(samples))
+    for start in range(0, len(order), 30):
+        batch = [samples[k] for k in order[start:start + 30]]
+        basin_index = torch.tensor([i for i, _ in batch])
+        batch_obs = torch.from_numpy(np.stack([obs[i, t:t + 20] for i, t in batch]))
+        batch_sim = torch.from_numpy(np.stack([sim[i, t:t + 20] for i, t in batch]))
+        streaming.update(batch_obs, batch_sim, basin_index)
+    values = streaming.compute(metrics.StreamingMetrics.METRICS)
+
+    np.testing.assert_array_equal(streaming.has_observations(), [[True, True], [True, True], [False, False],
+                                                                 [True, True]])
+    for target in range(obs.shape[2]):
+        with np.errstate(all='ignore'):
+            expected = metrics.calculate_multi_basin_metrics(obs[..., target], sim[..., target],
+                                                             metrics.StreamingMetrics.METRICS)
+        for metric, value in expected.items():
+            assert np.isnan(values[metric][2, target])
+            np.testing.assert_allclose(values[metric][:, target], value, rtol=1e-6, err_msg=metric)
@@ -0,0 +1,66 @@
+"""Unit tests for the ensembling of the results of several runs. """
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+from xarray import DataArray
+
+from neuralhydrology.evaluation import metrics
+from neuralhydrology.evaluation.resultsstore import ResultsWriter
+from neuralhydrology.utils.nh_results_ensemble import create_results_ensemble
+from test import Fixture
+
+
+@pytest.mark.parametrize('num_workers', [1, 2])
+def test_results_ensemble(tmpdir: Fixture[str], num_workers: int):
+    """Test the (weighted) mean and median ensemble of runs that stored their results as pickle file or results store.
+
+    Parameters
+    ----------
+    tmpdir : Fixture[str]
+        Name of the tmp directory.
+    num_workers : int
+        Number of processes that combine the results.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2000-01-01', periods=300, freq='1D')
+    obs = rng.gamma(0.5, 2, (3, len(dates), 1)).astype(np.float32)
+    obs[:, 100:120] = np.nan
+    sims = [(obs * rng.normal(1, 0.3, obs.shape) - 0.1).astype(np.float32) for _ in range(3)]
+
+    run_dirs = []
+    for i, sim in enumerate(sims):
+        run_dir = Path(tmpdir) / f'run{i}'
+        (run_dir / 'test' / 'model_epoch001').mkdir(parents=True)
+        (run_dir / 'config.yml').write_text('target_variables:\n- q\nmetrics:\n- NSE\n- Peak-Timing\n')
+        results = {}
+        for j in range(obs.shape[0]):
+            data_vars = {'q_obs': (('date', 'time_step'), obs[j]), 'q_sim': (('date', 'time_step'), sim[j])}
+            results[f'basin{j}'] = {'1D': {'xr': xarray.Dataset(data_vars, coords={'date': dates, 'time_step': [0]})}}
+        if i == 0:
+            with (run_dir / 'test' / 'model_epoch001' / 'test_results.p').open('wb') as fp:
+                pickle.dump(results, fp)
+        else:
+            writer = ResultsWriter(run_dir / 'test' / 'model_epoch001' / 'test_results')
+            for basin, basin_results in results.items():
+                writer.add_results(basin, basin_results)
+        run_dirs.append(run_dir)
+
+    sims = np.stack(sims).astype(np.float64)
+    for kwargs, expected in [({}, sims.mean(axis=0)), ({'weights': [1, 0, 3]}, (sims[0] + 3 * sims[2]) / 4),
+                             ({'aggregation': 'median', 'quantiles': [0.5]}, np.median(sims, axis=0))]:
+        ensemble = create_results_ensemble(run_dirs, num_workers=num_workers, **kwargs)
+        assert list(ensemble.keys()) == ['basin0', 'basin1', 'basin2']
+        for j, (basin, basin_results) in enumerate(ensemble.items()):
+            xr = basin_results['1D']['xr']
+            np.testing.assert_array_equal(xr['datetime'].values, dates.values)
+            np.testing.assert_allclose(xr['q_sim'].values, expected[j, :, 0], rtol=1e-5, atol=1e-6)
+            if 'quantiles' in kwargs:
+                np.testing.assert_array_equal(xr['q_sim_quantiles'].values[0], xr['q_sim'].values)
+            basin_obs = DataArray(obs[j, :, 0], dims=['date'], coords={'date': dates})
+            basin_sim = DataArray(xr['q_sim'].values, dims=['date'], coords={'date': dates})
+            assert basin_results['1D']['NSE'] == pytest.approx(metrics.nse(basin_obs, basin_sim), rel=1e-6)
+            assert basin_results['1D']['Peak-Timing'] == pytest.approx(metrics.mean_peak_timing(basin_obs, basin_sim))
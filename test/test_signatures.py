@@ -0,0 +1,42 @@
+"""Unit tests for the hydrological signatures. """
+import numpy as np
+import pandas as pd
+import pytest
+from xarray import DataArray
+
+from neuralhydrology.evaluation import signatures
+
+
+@pytest.mark.parametrize('freq,start,periods', [('1D', '1999-03-15', 2500), ('1h', '2000-09-20 05:00', 24 * 400)])
+def test_multi_basin_signatures(freq: str, start: str, periods: int):
+    """Test that the signatures of many basins at once match the signatures computed basin by basin.
+
+    Parameters
+    ----------
+    freq : str
+        Frequency of the time series.
+    start : str
+        First date of the time series.
+    periods : int
+        Number of time steps.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(start, periods=periods, freq=freq)
+    flow = np.stack([np.convolve(rng.gamma(0.3, 3, periods), np.ones(3) / 3, 'same') for _ in range(4)])
+    flow[rng.random(flow.shape) < 0.02] = np.nan
+    flow[1, rng.random(periods) < 0.3] = 0  # zero flows
+    flow[2, 200:700] = np.nan  # long gap
+    flow[3, 5] = -0.5  # negative flow
+    prcp = rng.gamma(0.5, 4, flow.shape)
+
+    values = signatures.calculate_multi_basin_signatures(flow,
+                                                         dates.values,
+                                                         signatures.get_available_signatures(),
+                                                         prcp=prcp)
+
+    for i in range(flow.shape[0]):
+        da = DataArray(flow[i], dims=['date'], coords={'date': dates})
+        with np.errstate(all='ignore'):
+            expected = signatures.calculate_all_signatures(da, DataArray(prcp[i], coords={'date': dates}), 'date')
+        for signature, value in expected.items():
+            np.testing.assert_allclose(values[signature][i], value, rtol=1e-9, err_msg=f'{signature} {i}')